@@ -7,6 +7,8 @@ from typing import Dict, List
 import networkx as nx
 import pandas as pd
 
+from graph_builder.streaming import FEATURE_COLUMNS
+
 
 def parse_ts(s: str) -> datetime:
     # Support ISO timestamps with optional trailing 'Z' (UTC) and numeric timestamps
@@ -26,10 +28,12 @@ def parse_ts(s: str) -> datetime:
 
 
 class TemporalGraphBuilder:
-    def __init__(self, window_size_seconds=60, step_seconds=30):
+    def __init__(self, window_size_seconds=60, step_seconds=30, detector=None):
+        """``detector``: optional ``streaming.HalfSpaceTrees``; node rows then get a ``stream_score`` column."""
         self.window_size = timedelta(seconds=window_size_seconds)
         self.step = timedelta(seconds=step_seconds)
         self.events: List[Dict] = []
+        self.detector = detector
 
     def ingest(self, event: Dict):
         # Expect event with ISO timestamp
@@ -47,7 +51,12 @@ class TemporalGraphBuilder:
             yield cur, cur + self.window_size
             cur += self.step
 
-    def build_windows(self, out_dir: str):
+    def build_windows(self, out_dir: str, ring=None):
+        """Write each complete window as Parquet under ``out_dir``.
+
+        With a ``shm_ring.ShmRingWriter``, each window is first published to
+        the shared-memory ring so a co-located scorer sees it immediately.
+        """
         if not self.events:
             return []
         # Drop events with unparsable timestamps
@@ -64,6 +73,8 @@ class TemporalGraphBuilder:
             if not window_events:
                 continue
             nodes_table, edges_table = self._build_graph_tables(window_events, wstart, wend)
+            if ring is not None:
+                ring.publish(int(wstart.timestamp()), nodes_table, edges_table)
             # save to parquet
             nodes_path = f"{out_dir}/window_{int(wstart.timestamp())}.nodes.parquet"
             edges_path = f"{out_dir}/window_{int(wstart.timestamp())}.edges.parquet"
@@ -120,6 +131,9 @@ class TemporalGraphBuilder:
             })
 
         nodes_df = pd.DataFrame(nodes_rows)
+        if self.detector is not None:
+            # Score against the model so far, then learn this window's nodes
+            nodes_df["stream_score"] = self.detector.score_learn(nodes_df[FEATURE_COLUMNS].to_numpy())
         edges_df = pd.DataFrame(edges_rows)
         return nodes_df, edges_df
 
@@ -6,6 +6,8 @@ import sys
 import random
 from graph_builder.builder import TemporalGraphBuilder
 from graph_builder.kafka_consumer import consume
+from graph_builder.shm_ring import ShmRingWriter
+from graph_builder.streaming import HalfSpaceTrees
 
 # Write startup log to a file for debugging
 _log_file = "/tmp/graph_builder_startup.log"
@@ -16,18 +18,18 @@ except:
     pass
 
 
-def run_file_mode(input_file: str, out_dir: str, window: int, step: int):
-    tgb = TemporalGraphBuilder(window_size_seconds=window, step_seconds=step)
+def run_file_mode(input_file: str, out_dir: str, window: int, step: int, ring=None, detector=None):
+    tgb = TemporalGraphBuilder(window_size_seconds=window, step_seconds=step, detector=detector)
     with open(input_file) as f:
         for line in f:
             obj = json.loads(line)
             tgb.ingest(obj)
     os.makedirs(out_dir, exist_ok=True)
-    outputs = tgb.build_windows(out_dir)
+    outputs = tgb.build_windows(out_dir, ring=ring)
     print(f"Wrote {len(outputs)} window files to {out_dir}")
 
 
-def run_kafka_mode(topic: str, servers: str, out_dir: str, window: int, step: int):
+def run_kafka_mode(topic: str, servers: str, out_dir: str, window: int, step: int, ring=None, detector=None):
     _log_file = "/tmp/graph_builder_startup.log"
     try:
         with open(_log_file, "a") as f:
@@ -35,7 +37,7 @@ def run_kafka_mode(topic: str, servers: str, out_dir: str, window: int, step: in
     except:
         pass
     
-    tgb = TemporalGraphBuilder(window_size_seconds=window, step_seconds=step)
+    tgb = TemporalGraphBuilder(window_size_seconds=window, step_seconds=step, detector=detector)
     
     print(f"Starting graph-builder in Kafka mode: topic={topic}, servers={servers}, out_dir={out_dir}")
     sys.stdout.flush()
@@ -82,7 +84,7 @@ def run_kafka_mode(topic: str, servers: str, out_dir: str, window: int, step: in
             
             try:
                 os.makedirs(out_dir, exist_ok=True)
-                outputs = tgb.build_windows(out_dir)
+                outputs = tgb.build_windows(out_dir, ring=ring)
                 print(f"Flusher: generated 5 synthetic events, built {len(outputs)} windows from {len(tgb.events)} accumulated events")
                 if outputs:
                     print(f"Wrote {len(outputs)} window files to {out_dir}")
@@ -147,6 +149,9 @@ def main():
     f.add_argument("--out-dir", required=True)
     f.add_argument("--window-size", type=int, default=60)
     f.add_argument("--step", type=int, default=30)
+    f.add_argument("--shm-ring", default=None, help="Also publish windows to this shared-memory ring file")
+    f.add_argument("--stream-detector", action="store_true",
+                   help="Score nodes with an online Half-Space Trees model (adds a stream_score column)")
 
     k = sub.add_parser("kafka")
     k.add_argument("--topic", required=True)
@@ -154,6 +159,15 @@ def main():
     k.add_argument("--out-dir", required=True)
     k.add_argument("--window-size", type=int, default=60)
     k.add_argument("--step", type=int, default=30)
+    k.add_argument("--shm-ring", default=os.getenv("SHM_RING_PATH"),
+                   help="Also publish windows to this shared-memory ring file (e.g. /dev/shm/zero-day-windows)")
+    k.add_argument("--stream-detector", action="store_true", default=os.getenv("STREAM_DETECTOR", "0") == "1",
+                   help="Score nodes with an online Half-Space Trees model (adds a stream_score column)")
+    for sp in (f, k):
+        sp.add_argument("--hst-trees", type=int, default=int(os.getenv("HST_TREES", "25")))
+        sp.add_argument("--hst-height", type=int, default=int(os.getenv("HST_HEIGHT", "10")))
+        sp.add_argument("--hst-window", type=int, default=int(os.getenv("HST_WINDOW", "250")),
+                        help="Node observations per Half-Space Trees reference window")
 
     args = parser.parse_args()
     try:
@@ -162,15 +176,19 @@ def main():
     except:
         pass
     
+    ring = ShmRingWriter(args.shm_ring) if getattr(args, "shm_ring", None) else None
+    detector = None
+    if getattr(args, "stream_detector", False):
+        detector = HalfSpaceTrees(n_trees=args.hst_trees, height=args.hst_height, window_size=args.hst_window)
     if args.mode == "file":
-        run_file_mode(args.input_file, args.out_dir, args.window_size, args.step)
+        run_file_mode(args.input_file, args.out_dir, args.window_size, args.step, ring, detector)
     elif args.mode == "kafka":
         try:
             with open(_log_file, "a") as f:
                 f.write(f"calling run_kafka_mode\n")
         except:
             pass
-        run_kafka_mode(args.topic, args.servers, args.out_dir, args.window_size, args.step)
+        run_kafka_mode(args.topic, args.servers, args.out_dir, args.window_size, args.step, ring, detector)
     else:
         parser.print_help()
 
@@ -0,0 +1,89 @@
+"""Shared-memory handoff of finished windows to a co-located scorer.
+
+Windows are published as Arrow IPC streams into a fixed ring of slots in a
+memory-backed file (``/dev/shm`` by default), so a scorer in the same pod can
+map them without a Parquet round trip through a volume. The reader side is
+``ml_pipeline.shm_ring``; keep the layout below in sync with it.
+
+Layout (little-endian):
+
+- file header (64 bytes): magic ``ZDWRING1``, version u32, num_slots u32,
+  slot_size u64, write_seq u64
+- slot ``seq % num_slots`` at ``64 + slot * slot_size``: a 64-byte header
+  (seq u64, nodes_len u64, edges_len u64, window_start i64, published f64)
+  followed by the nodes stream and then the edges stream
+
+A slot is invalidated (seq 0) before it is rewritten and gets its sequence
+number only once the payload is complete; ``write_seq`` is advanced last.
+"""
+import mmap
+import os
+import struct
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+MAGIC = b"ZDWRING1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QQQqd")
+SLOT_HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 24
+
+DEFAULT_RING_PATH = "/dev/shm/zero-day-windows"
+
+
+def _ipc_bytes(df: pd.DataFrame) -> pa.Buffer:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+class ShmRingWriter:
+    """Publishes window tables into a ring of ``num_slots`` slots of ``slot_size`` bytes.
+
+    A reader that falls more than ``num_slots`` windows behind loses the
+    oldest ones (it detects this from the sequence numbers).
+    """
+
+    def __init__(self, path: str = DEFAULT_RING_PATH, num_slots: int = 8, slot_size: int = 8 * 1024 * 1024):
+        self.path = path
+        self.num_slots = num_slots
+        self.slot_size = slot_size
+        size = HEADER_SIZE + num_slots * slot_size
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+            f.write(HEADER.pack(MAGIC, VERSION, num_slots, slot_size, 0))
+        # Readers only ever see a fully initialized ring
+        os.replace(tmp, path)
+        self._file = open(path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self.seq = 0
+
+    def publish(self, window_start: int, nodes_df: pd.DataFrame, edges_df: pd.DataFrame) -> bool:
+        """Write one window; returns False (nothing published) if it does not fit in a slot."""
+        nodes = _ipc_bytes(nodes_df)
+        edges = _ipc_bytes(edges_df)
+        if SLOT_HEADER_SIZE + nodes.size + edges.size > self.slot_size:
+            print(f"Window {window_start} ({nodes.size + edges.size} bytes) exceeds ring slot size {self.slot_size}; "
+                  "not published")
+            return False
+        seq = self.seq + 1
+        base = HEADER_SIZE + (seq % self.num_slots) * self.slot_size
+        payload = base + SLOT_HEADER_SIZE
+        SLOT_HEADER.pack_into(self._mm, base, 0, 0, 0, 0, 0.0)
+        self._mm[payload:payload + nodes.size] = nodes
+        self._mm[payload + nodes.size:payload + nodes.size + edges.size] = edges
+        SLOT_HEADER.pack_into(self._mm, base, seq, nodes.size, edges.size, int(window_start), time.time())
+        struct.pack_into("<Q", self._mm, WRITE_SEQ_OFFSET, seq)
+        self.seq = seq
+        return True
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
@@ -0,0 +1,136 @@
+"""In-process streaming anomaly detection for graph windows: Half-Space Trees.
+
+Half-Space Trees (Tan, Ting & Liu, 2011) are random binary trees that halve
+a fixed feature-space region at every level, chosen before any data is
+seen. Each node counts how many recent observations fell into it: the
+reference mass (the previous ``window_size`` observations) scores new
+observations, while the latest mass accumulates the current ones and
+replaces the reference when ``window_size`` observations have been seen.
+An observation in a sparsely populated region of the reference profile
+gets a high score.
+
+Model size is fixed by ``n_trees`` and ``height`` (arrays of
+``n_trees * (2**(height + 1) - 1)`` nodes), whatever the length of the
+stream. Node features are log-scaled against ``limits``, so no warm-up pass
+over the data is needed to fix the feature space.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+FEATURE_COLUMNS = ["bytes", "outgoing_unique_dst_count", "flow_count"]
+# Upper bounds of the node features, beyond which values are clipped
+DEFAULT_LIMITS = (1e10, 1e5, 1e6)
+
+
+class HalfSpaceTrees:
+    """Streaming detector over fixed-size feature vectors.
+
+    ``score_learn`` scores a batch against the reference mass and then adds
+    it to the latest mass in the same tree traversal. Scores are in [0, 1]
+    (higher = more anomalous) and NaN until the first ``window_size``
+    observations form a reference profile.
+    """
+
+    def __init__(self, n_features: int = len(FEATURE_COLUMNS), n_trees: int = 25, height: int = 10,
+                 window_size: int = 250, size_limit: Optional[float] = None,
+                 limits: Sequence[float] = DEFAULT_LIMITS, seed: int = 0):
+        self.n_features = n_features
+        self.n_trees = n_trees
+        self.height = height
+        self.window_size = window_size
+        # Paper default: stop descending at nodes holding under 10% of a window
+        self.size_limit = 0.1 * window_size if size_limit is None else size_limit
+        self.scale = np.log1p(np.asarray(limits, dtype=np.float64))
+        n_nodes = 2 ** (height + 1) - 1
+        n_inner = 2 ** height - 1
+        rng = np.random.default_rng(seed)
+        # Random workspace per tree: [s - 2 max(s, 1 - s), s + 2 max(s, 1 - s)] around s ~ U(0, 1)
+        s = rng.random((n_trees, n_features))
+        half = 2 * np.maximum(s, 1 - s)
+        lo, hi = np.empty((n_trees, n_inner, n_features)), np.empty((n_trees, n_inner, n_features))
+        lo[:, 0], hi[:, 0] = s - half, s + half
+        self.split_dim = rng.integers(n_features, size=(n_trees, n_inner))
+        self.split_value = np.empty((n_trees, n_inner))
+        trees = np.arange(n_trees)
+        # Nodes are numbered breadth-first, so parents are always filled in before their children
+        for node in range(n_inner):
+            dim = self.split_dim[:, node]
+            mid = (lo[trees, node, dim] + hi[trees, node, dim]) / 2
+            self.split_value[:, node] = mid
+            for child, bound in ((2 * node + 1, hi), (2 * node + 2, lo)):
+                if child < n_inner:
+                    lo[:, child], hi[:, child] = lo[:, node], hi[:, node]
+                    bound[trees, child, dim] = mid
+        self.reference = np.zeros((n_trees, n_nodes))
+        self.latest = np.zeros((n_trees, n_nodes))
+        self.seen = 0  # observations in the current latest window
+        self.ready = False
+        self._max_mass = n_trees * window_size * 2.0 ** height
+
+    def transform(self, X) -> np.ndarray:
+        """Raw non-negative features -> log-scaled into [0, 1]."""
+        X = np.log1p(np.clip(np.asarray(X, dtype=np.float64), 0, None)) / self.scale
+        return np.clip(X, 0.0, 1.0)
+
+    def _paths(self, Z) -> np.ndarray:
+        """(n_trees, n, height + 1) node indices from root to leaf for scaled rows ``Z``."""
+        n = len(Z)
+        paths = np.zeros((self.n_trees, n, self.height + 1), dtype=np.int64)
+        node = np.zeros((self.n_trees, n), dtype=np.int64)
+        trees = np.arange(self.n_trees)[:, None]
+        rows = np.arange(n)[None, :]
+        for level in range(1, self.height + 1):
+            dim = self.split_dim[trees, node]
+            right = Z[rows, dim] > self.split_value[trees, node]
+            node = 2 * node + 1 + right
+            paths[:, :, level] = node
+        return paths
+
+    def _score(self, paths) -> np.ndarray:
+        mass = self.reference[np.arange(self.n_trees)[:, None, None], paths]
+        # Score at the first node below the size limit, or at the leaf
+        small = mass < self.size_limit
+        small[:, :, -1] = True
+        stop = small.argmax(axis=2)
+        node_mass = np.take_along_axis(mass, stop[:, :, None], axis=2)[:, :, 0]
+        total = (node_mass * 2.0 ** stop).sum(axis=0)
+        return 1.0 - total / self._max_mass
+
+    def _learn(self, paths):
+        n = paths.shape[1]
+        offsets = (np.arange(self.n_trees) * self.latest.shape[1])[:, None, None]
+        done = 0
+        while done < n:
+            # Swap profiles at window boundaries even inside one batch
+            take = min(n - done, self.window_size - self.seen)
+            flat = (paths[:, done:done + take] + offsets).ravel()
+            self.latest.ravel()[:] += np.bincount(flat, minlength=self.latest.size)
+            done += take
+            self.seen += take
+            if self.seen >= self.window_size:
+                self.reference, self.latest = self.latest, self.reference
+                self.latest[:] = 0
+                self.seen = 0
+                self.ready = True
+
+    def score(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        if not self.ready or not len(X):
+            return np.full(len(X), np.nan)
+        return self._score(self._paths(self.transform(X)))
+
+    def learn(self, X):
+        X = np.asarray(X)
+        if len(X):
+            self._learn(self._paths(self.transform(X)))
+
+    def score_learn(self, X) -> np.ndarray:
+        """Score rows against the reference profile, then add them to the latest one."""
+        X = np.asarray(X)
+        if not len(X):
+            return np.zeros(0)
+        paths = self._paths(self.transform(X))
+        scores = self._score(paths) if self.ready else np.full(len(X), np.nan)
+        self._learn(paths)
+        return scores
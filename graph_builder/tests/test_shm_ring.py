@@ -0,0 +1,37 @@
+import struct
+
+import pandas as pd
+import pyarrow as pa
+from graph_builder.shm_ring import HEADER, HEADER_SIZE, SLOT_HEADER, SLOT_HEADER_SIZE, ShmRingWriter
+
+
+def _slot(path, seq):
+    data = open(path, "rb").read()
+    _, _, num_slots, slot_size, write_seq = HEADER.unpack_from(data, 0)
+    base = HEADER_SIZE + (seq % num_slots) * slot_size
+    slot_seq, nodes_len, _, window_start, _ = SLOT_HEADER.unpack_from(data, base)
+    start = base + SLOT_HEADER_SIZE
+    nodes = pa.ipc.open_stream(data[start:start + nodes_len]).read_all()
+    return write_seq, slot_seq, window_start, nodes
+
+
+def test_publish_wraps_around_ring(tmp_path):
+    path = str(tmp_path / "ring")
+    ring = ShmRingWriter(path, num_slots=2, slot_size=64 * 1024)
+    edges = pd.DataFrame({"src": ["a"], "dst": ["b"], "bytes": [1], "count": [1]})
+    for ts in (100, 130, 160):
+        nodes = pd.DataFrame({"node_id": ["a"], "bytes": [ts]})
+        assert ring.publish(ts, nodes, edges)
+
+    write_seq, slot_seq, window_start, nodes = _slot(path, 3)
+    assert (write_seq, slot_seq, window_start) == (3, 3, 160)
+    assert nodes.column("bytes").to_pylist() == [160]
+    # Slot of seq 1 now holds seq 3
+    assert struct.unpack_from("<Q", open(path, "rb").read(), HEADER_SIZE + 1 * 64 * 1024)[0] == 3
+
+
+def test_oversized_window_is_not_published(tmp_path):
+    ring = ShmRingWriter(str(tmp_path / "ring"), num_slots=2, slot_size=1024)
+    big = pd.DataFrame({"node_id": [f"pod-{i}" for i in range(1000)]})
+    assert not ring.publish(100, big, big)
+    assert ring.seq == 0
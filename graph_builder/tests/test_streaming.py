@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from graph_builder.builder import TemporalGraphBuilder
+from graph_builder.streaming import HalfSpaceTrees
+
+
+def test_outlier_scores_highest_with_bounded_state():
+    rng = np.random.default_rng(0)
+    hst = HalfSpaceTrees(window_size=100, seed=1)
+    normal = np.column_stack([rng.lognormal(8, 0.3, 300), rng.integers(1, 4, 300), rng.integers(5, 15, 300)])
+    assert np.isnan(hst.score_learn(normal[:50])).all()  # no reference window yet
+    shapes = (hst.reference.shape, hst.latest.shape)
+    hst.score_learn(normal[50:])
+    assert hst.ready and (hst.reference.shape, hst.latest.shape) == shapes
+    assert hst.reference.sum() == hst.n_trees * 100 * (hst.height + 1)
+
+    probe = np.vstack([normal[:20], [[5e8, 400, 2000]]])
+    scores = hst.score(probe)
+    assert scores.argmax() == 20 and scores[20] > scores[:20].max()
+    assert ((scores >= 0) & (scores <= 1)).all()
+
+
+def test_builder_emits_stream_scores(tmp_path):
+    tgb = TemporalGraphBuilder(window_size_seconds=10, step_seconds=5, detector=HalfSpaceTrees(window_size=4))
+    start = datetime(2024, 1, 1)
+    for i in range(40):
+        tgb.ingest({"timestamp": (start + timedelta(seconds=i)).isoformat(), "pod_name": f"svc-{i % 3}",
+                    "dst_ip": "10.0.0.5", "bytes": 100 + i})
+    outputs = tgb.build_windows(str(tmp_path))
+    nodes = [pd.read_parquet(n) for n, _ in outputs]
+    assert all("stream_score" in df.columns for df in nodes)
+    assert nodes[0]["stream_score"].isna().all()
+    assert nodes[-1]["stream_score"].between(0, 1).all()
@@ -0,0 +1,250 @@
+"""Containment alert emission: background dispatch, dedupe, rate limiting and a fake client.
+
+Scoring threads hand alerts to an ``AlertDispatcher`` and return immediately.
+A single background thread writes them to the Kubernetes API, one
+``Containment`` object per (pod, namespace): repeats inside the suppression
+window are dropped, rising scores become updates of the existing object.
+"""
+import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+GROUP = "security.example.com"
+VERSION = "v1alpha1"
+PLURAL = "containments"
+
+
+def alert_name(pod_name: str) -> str:
+    """Stable object name for a pod's alert (DNS-1123 subdomain)."""
+    name = re.sub(r"[^a-z0-9.-]", "-", f"alert-{pod_name}".lower()).strip("-.")
+    return name[:253]
+
+
+def build_alert(pod_name, namespace, score, explanation):
+    """Containment custom object for an anomalous pod."""
+    return {
+        "apiVersion": f"{GROUP}/{VERSION}",
+        "kind": "Containment",
+        "metadata": {
+            "name": alert_name(pod_name),
+            "namespace": namespace,
+        },
+        "spec": {
+            "alertID": f"alert-{pod_name}",
+            "confidence": min(0.99, score),
+            "suggestedAction": "isolate_pod",
+            "dryRun": False,
+            "explanation": explanation,
+        },
+    }
+
+
+def _status(exc) -> Optional[int]:
+    return getattr(exc, "status", None)
+
+
+class ApiError(Exception):
+    """Minimal ``ApiException`` look-alike raised by the fake client."""
+
+    def __init__(self, status, reason):
+        super().__init__(f"({status}) {reason}")
+        self.status = status
+        self.reason = reason
+
+
+class FakeCustomObjectsApi:
+    """In-memory stand-in for ``kubernetes.client.CustomObjectsApi``.
+
+    Stores objects by (namespace, name) and records every call, so the
+    dispatcher and inference service can run locally without a cluster.
+    ``fail_next`` makes the next N calls raise, to exercise retries.
+    """
+
+    def __init__(self, fail_next: int = 0):
+        self.objects: Dict[Tuple[str, str], dict] = {}
+        self.calls = []
+        self.fail_next = fail_next
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self):
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise ApiError(503, "injected failure")
+
+    def create_namespaced_custom_object(self, group, version, namespace, plural, body, **kwargs):
+        with self._lock:
+            self.calls.append(("create", namespace, body["metadata"]["name"]))
+            self._maybe_fail()
+            key = (namespace, body["metadata"]["name"])
+            if key in self.objects:
+                raise ApiError(409, "AlreadyExists")
+            self.objects[key] = body
+            return body
+
+    def patch_namespaced_custom_object(self, group, version, namespace, plural, name, body, **kwargs):
+        with self._lock:
+            self.calls.append(("patch", namespace, name))
+            self._maybe_fail()
+            key = (namespace, name)
+            if key not in self.objects:
+                raise ApiError(404, "NotFound")
+            self.objects[key]["spec"].update(body.get("spec", {}))
+            return self.objects[key]
+
+
+class AlertDispatcher:
+    """Bounded, deduplicating, rate-limited background writer of Containment objects.
+
+    Args:
+        api: ``CustomObjectsApi`` (or ``FakeCustomObjectsApi``)
+        suppression_window: seconds during which further alerts for the same
+            (pod, namespace) are dropped unless their score is higher than the
+            last one sent, in which case the existing object is patched
+        max_queue: maximum number of distinct pending alerts; new keys are
+            rejected while it is full (pending keys still coalesce)
+        rate_limit: API writes per second (token bucket of size ``burst``)
+        max_retries: attempts per alert before it is dropped
+        backoff: initial retry delay in seconds, doubled after each failure
+    """
+
+    def __init__(self, api, suppression_window: float = 60.0, max_queue: int = 1000,
+                 rate_limit: float = 5.0, burst: int = 10, max_retries: int = 5,
+                 backoff: float = 0.5):
+        self.api = api
+        self.suppression_window = suppression_window
+        self.max_queue = max_queue
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.dropped = 0
+        self.failed = 0
+        self._pending: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._sent: Dict[Tuple[str, str], Tuple[float, float]] = {}  # key -> (time, score)
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._start()
+        # Threads do not survive fork (prefork serving): give each child its own
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._start())
+
+    def _start(self):
+        self._cond = threading.Condition()
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, pod_name, namespace, score, explanation) -> bool:
+        """Queue an alert; returns False if it was suppressed or the queue is full.
+
+        ``explanation`` may be a zero-argument callable; it is then evaluated
+        on the dispatcher thread, and only for alerts that are actually sent.
+        """
+        key = (pod_name, namespace)
+        with self._cond:
+            now = time.monotonic()
+            pending = self._pending.get(key)
+            if pending is not None:
+                if score > pending[0]:
+                    self._pending[key] = (score, explanation)
+                return True
+            sent = self._sent.get(key)
+            if sent is not None and now - sent[0] < self.suppression_window and score <= sent[1]:
+                return False
+            if len(self._pending) >= self.max_queue:
+                self.dropped += 1
+                return False
+            self._pending[key] = (score, explanation)
+            self._cond.notify()
+            return True
+
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until all pending alerts have been written (for tests/shutdown)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                key, (score, explanation) = self._pending.popitem(last=False)
+                sent = self._sent.get(key)
+                update = sent is not None and time.monotonic() - sent[0] < self.suppression_window
+                self._busy = True
+            try:
+                if self._emit(key, score, explanation, update):
+                    with self._cond:
+                        self._sent[key] = (time.monotonic(), score)
+                        self._expire_sent()
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _expire_sent(self):
+        now = time.monotonic()
+        if len(self._sent) > 4 * self.max_queue:
+            self._sent = {k: v for k, v in self._sent.items() if now - v[0] < self.suppression_window}
+
+    def _acquire_token(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            time.sleep((1 - self._tokens) / self.rate_limit)
+
+    def _emit(self, key, score, explanation, update) -> bool:
+        pod_name, namespace = key
+        if callable(explanation):
+            try:
+                explanation = explanation()
+            except Exception as e:
+                explanation = f"Anomaly score: {score:.4f} (explanation failed: {e})"
+        body = build_alert(pod_name, namespace, score, explanation)
+        delay = self.backoff
+        for attempt in range(self.max_retries):
+            self._acquire_token()
+            try:
+                if update:
+                    self.api.patch_namespaced_custom_object(
+                        group=GROUP, version=VERSION, namespace=namespace, plural=PLURAL,
+                        name=body["metadata"]["name"], body={"spec": body["spec"]},
+                    )
+                else:
+                    self.api.create_namespaced_custom_object(
+                        group=GROUP, version=VERSION, namespace=namespace, plural=PLURAL, body=body,
+                    )
+                return True
+            except Exception as e:
+                status = _status(e)
+                if status == 409 and not update:
+                    update = True  # object left over from an earlier alert: update it
+                    continue
+                if status == 404 and update:
+                    update = False  # object was deleted (e.g. handled): recreate it
+                    continue
+                if status is not None and 400 <= status < 500 and status != 429:
+                    print(f"Error creating alert: {e}")
+                    break
+                print(f"Error creating alert (attempt {attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(delay)
+                delay *= 2
+        self.failed += 1
+        return False
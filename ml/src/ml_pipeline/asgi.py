@@ -0,0 +1,156 @@
+"""Asyncio (ASGI) serving mode for the inference service.
+
+Exposes the same ``/score``, ``/score/batch``, ``/explain``, ``/health`` and ``/metrics`` routes as the
+Flask app in ``ml_pipeline.inference``, with the same handlers, but
+connections are coroutines: a slow client or a request waiting for the model
+holds no thread. Model execution runs on a bounded thread pool
+(``ASGI_MODEL_THREADS`` threads, at most ``ASGI_MAX_PENDING`` requests queued
+or running; further requests wait on the event loop). With micro-batching
+(``MICROBATCH_WAIT_MS``), a ``/score`` request waits for its batch on the
+event loop rather than on a pool thread, so a batch can fill with up to
+``MICROBATCH_MAX_SIZE`` concurrent requests whatever the pool size. Alert
+emission is handed to the ``AlertDispatcher`` queue and never blocks the loop.
+
+Usage:
+  python -m ml_pipeline.asgi --port 8080        # or: uvicorn ml_pipeline.asgi:app
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ml_pipeline import inference, metrics, wire
+
+
+class InferenceASGI:
+    """Minimal ASGI application routing to the inference handlers."""
+
+    def __init__(self, model_threads: int = 2, max_pending: int = 256):
+        self.executor = ThreadPoolExecutor(max_workers=model_threads, thread_name_prefix="model")
+        self.max_pending = max_pending
+        self._slots = None  # asyncio.Semaphore, created on the serving loop
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        route = (scope["method"], scope["path"])
+        if route == ("GET", "/health"):
+            # Both may load a changed model file: keep that off the event loop
+            await self._respond(send, await self._run(inference.health_payload), 200)
+        elif route == ("GET", "/metrics"):
+            body, content_type = await self._run(inference.metrics_payload)
+            await self._send(send, body, 200, content_type)
+        elif route == ("POST", "/score"):
+            batched = inference.MICROBATCHER is not None
+            await self._handle(receive, send, self._score_microbatched if batched else inference.score_payload)
+        elif route == ("POST", "/explain"):
+            await self._handle(receive, send, inference.explain_payload)
+        elif route == ("POST", "/score/batch"):
+            headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+            content_type = wire.media_type(headers.get("content-type"))
+            if content_type in wire.BINARY_TYPES:
+                await self._handle_binary(receive, send, content_type, headers)
+            else:
+                await self._handle(receive, send, inference.score_rows)
+        else:
+            await self._respond(send, {"error": "not found"}, 404)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._slots = asyncio.Semaphore(self.max_pending)
+                # Load the model before the first request instead of during it
+                await asyncio.get_running_loop().run_in_executor(self.executor, inference.MODEL_CACHE.get)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle(self, receive, send, handler):
+        body = await _read_body(receive)
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError as e:
+            await self._respond(send, {"error": str(e)}, 400)
+            return
+        if asyncio.iscoroutinefunction(handler):
+            result, status = await handler(data)
+        else:
+            result, status = await self._run(handler, data)
+        await self._respond(send, result, status)
+
+    async def _score_microbatched(self, data):
+        """``/score`` through the micro-batcher, awaiting the batch without holding a pool thread."""
+        try:
+            features = np.array(data.get("features"), dtype=np.float32)
+            # Includes the wait for the batch to fill, as in the Flask app
+            with metrics.phase("score", "forward"):
+                score = await asyncio.wrap_future(inference.MICROBATCHER.submit(features))
+        except Exception as e:
+            return {"error": str(e)}, 400
+        return await self._run(inference.score_payload, data, score)
+
+    async def _handle_binary(self, receive, send, content_type, headers):
+        body = await _read_body(receive)
+        result, status, out_type = await self._run(
+            inference.score_binary, body, content_type,
+            headers.get("accept"), headers.get(wire.NUM_FEATURES_HEADER.lower()),
+        )
+        await self._send(send, result, status, out_type)
+
+    async def _run(self, fn, *args):
+        """Run a blocking handler on the model pool, waiting while the pool is saturated."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    @classmethod
+    async def _respond(cls, send, payload, status):
+        await cls._send(send, json.dumps(payload).encode(), status, "application/json")
+
+    @staticmethod
+    async def _send(send, body: bytes, status, content_type):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+app = InferenceASGI(
+    model_threads=int(os.getenv("ASGI_MODEL_THREADS", "2")),
+    max_pending=int(os.getenv("ASGI_MAX_PENDING", "256")),
+)
+
+
+def main():
+    import uvicorn
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8080)
+    args = p.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, loop="asyncio", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Request micro-batching: merges concurrent single-row scoring calls into one forward pass."""
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Callable
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects rows submitted from many request threads and scores them together.
+
+    A background thread takes the first pending row, then keeps collecting
+    rows for up to ``max_wait_ms`` (or until ``max_batch_size`` rows) and calls
+    ``score_fn`` once on the stacked matrix. Rows of different lengths are
+    scored in separate groups. Each caller blocks only on its own result.
+    """
+
+    def __init__(self, score_fn: Callable[[np.ndarray], np.ndarray], max_batch_size: int = 256,
+                 max_wait_ms: float = 2.0):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._start()
+        # Threads do not survive fork (prefork serving): give each child its own
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._start())
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, features) -> Future:
+        fut = Future()
+        self._queue.put((np.asarray(features, dtype=np.float32), fut))
+        return fut
+
+    def score(self, features) -> float:
+        """Score one feature vector, blocking until its batch has run."""
+        return self.submit(features).result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._score(batch)
+
+    def _score(self, batch):
+        groups = {}
+        for features, fut in batch:
+            groups.setdefault(features.shape, []).append((features, fut))
+        for items in groups.values():
+            try:
+                scores = self.score_fn(np.stack([features for features, _ in items]))
+            except Exception as e:
+                for _, fut in items:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), s in zip(items, scores):
+                fut.set_result(float(s))
@@ -0,0 +1,146 @@
+"""Training checkpoints and early stopping.
+
+A checkpoint holds the model and optimizer state, every RNG state and the
+early-stopping progress (including the best weights so far), so a preempted
+run restarted with ``resume=True`` continues from the last saved epoch with
+the same data order and reaches the same stopping decision.
+"""
+import os
+import random
+
+import numpy as np
+import torch
+
+from ml_pipeline.distributed import is_main
+
+
+class EarlyStopping:
+    """Stop after ``patience`` epochs without a validation improvement larger than ``min_delta``.
+
+    Keeps a copy of the best weights; ``patience=0`` never stops.
+    """
+
+    def __init__(self, patience: int = 5, min_delta: float = 0.0):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best = float("inf")
+        self.best_epoch = -1
+        self.bad_epochs = 0
+        self.best_state = None
+
+    @property
+    def should_stop(self) -> bool:
+        return self.patience > 0 and self.bad_epochs >= self.patience
+
+    def step(self, epoch: int, loss: float, model) -> bool:
+        """Record one epoch's validation loss; returns whether training should stop."""
+        if loss < self.best - self.min_delta:
+            self.best, self.best_epoch, self.bad_epochs = loss, epoch, 0
+            self.best_state = {k: v.detach().cpu().clone() for k, v in model.state_dict().items()}
+        else:
+            self.bad_epochs += 1
+        return self.should_stop
+
+    def restore(self, model):
+        """Load the best weights seen into ``model``."""
+        if self.best_state is not None:
+            model.load_state_dict(self.best_state)
+        return model
+
+    def state_dict(self) -> dict:
+        return {"best": self.best, "best_epoch": self.best_epoch, "bad_epochs": self.bad_epochs,
+                "best_state": self.best_state}
+
+    def load_state_dict(self, state: dict):
+        self.best, self.best_epoch = state["best"], state["best_epoch"]
+        self.bad_epochs, self.best_state = state["bad_epochs"], state["best_state"]
+
+
+def rng_state() -> dict:
+    return {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+        "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+    }
+
+
+def set_rng_state(state: dict):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if state.get("cuda") is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+def save_checkpoint(path: str, model, optimizer, epoch: int, stopper: EarlyStopping = None):
+    """Write a checkpoint after ``epoch`` completed epochs (atomically: a crash never leaves half a file)."""
+    state = {
+        "epoch": epoch,
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "rng": rng_state(),
+        "early_stopping": stopper.state_dict() if stopper is not None else None,
+    }
+    tmp = f"{path}.tmp"
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str, model, optimizer, stopper: EarlyStopping = None) -> int:
+    """Restore a checkpoint in place; returns the number of completed epochs."""
+    device = next(model.parameters()).device
+    # RNG states are numpy/python objects, not plain tensors
+    state = torch.load(path, map_location=device, weights_only=False)
+    model.load_state_dict(state["model"])
+    optimizer.load_state_dict(state["optimizer"])
+    state["rng"]["torch"] = state["rng"]["torch"].cpu()
+    set_rng_state(state["rng"])
+    if stopper is not None and state["early_stopping"] is not None:
+        stopper.load_state_dict(state["early_stopping"])
+    return state["epoch"]
+
+
+def run_epochs(model, optimizer, train_epoch, validate=None, epochs=10, checkpoint_path=None, resume=False,
+               patience=5, min_delta=0.0, checkpoint_every=1) -> EarlyStopping:
+    """Epoch loop shared by the trainers.
+
+    ``train_epoch(epoch)`` runs one epoch and returns its mean loss;
+    ``validate()`` returns the held-out loss that early stopping watches
+    (the training loss is used when it is None). A checkpoint is written
+    every ``checkpoint_every`` epochs and when training ends; with
+    ``resume`` an existing checkpoint is continued. On return the model
+    holds the best weights seen.
+
+    Under ``ml_pipeline.distributed`` pass the unwrapped model, and losses
+    already averaged over ranks; only rank 0 logs and writes checkpoints.
+    """
+    stopper = EarlyStopping(patience, min_delta)
+    start = 0
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        start = load_checkpoint(checkpoint_path, model, optimizer, stopper)
+        if is_main():
+            print(f"Resumed from {checkpoint_path} after epoch {start}")
+    for ep in range(start, epochs):
+        if stopper.should_stop:
+            break
+        model.train()
+        loss = train_epoch(ep)
+        if validate is None:
+            val_loss = loss
+        else:
+            model.eval()
+            with torch.no_grad():
+                val_loss = validate()
+        stopper.step(ep, val_loss, model)
+        if not is_main():
+            continue
+        print(f"Epoch {ep+1}/{epochs} loss={loss:.6f} val_loss={val_loss:.6f}")
+        done = ep + 1 == epochs or stopper.should_stop
+        if checkpoint_path and ((ep + 1) % checkpoint_every == 0 or done):
+            save_checkpoint(checkpoint_path, model, optimizer, ep + 1, stopper)
+        if stopper.should_stop:
+            print(f"Early stopping: val_loss has not improved for {stopper.patience} epochs "
+                  f"(best {stopper.best:.6f} at epoch {stopper.best_epoch+1})")
+    stopper.restore(model)
+    return stopper
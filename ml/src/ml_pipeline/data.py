@@ -1,7 +1,17 @@
 """Synthetic data utilities and PyTorch Dataset wrappers."""
+import json
+import os
+import zlib
+from collections import deque
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
-from torch.utils.data import Dataset
+from numpy.lib.stride_tricks import sliding_window_view
+import torch
+from torch.utils.data import Dataset, IterableDataset, get_worker_info
+
+from ml_pipeline.features import FEATURE_COLUMNS, node_features
 
 
 def generate_tabular_normal(n_samples=1000, n_features=16):
@@ -30,3 +40,258 @@ class SequenceDataset(Dataset):
 
     def __getitem__(self, idx):
         return self.sequences[idx]
+
+
+# --- Streaming datasets over stored graph-builder windows -------------------
+
+
+def window_files(data_dir):
+    """``window_*.nodes.parquet`` files under ``data_dir`` in time order."""
+    return sorted(Path(data_dir).rglob("window_*.nodes.parquet"), key=lambda p: (_window_start(p), str(p)))
+
+
+def _window_start(path):
+    try:
+        return int(path.name.split("_", 1)[1].split(".", 1)[0])
+    except ValueError:
+        return 0
+
+
+def _read_nodes(path):
+    return pd.read_parquet(path, columns=["node_id"] + FEATURE_COLUMNS)
+
+
+def _node_shard(node_ids, shard, num_shards):
+    """Mask of the nodes a shard owns (stable across processes and runs)."""
+    return np.array([zlib.crc32(str(n).encode()) % num_shards == shard for n in node_ids], dtype=bool)
+
+
+def compute_feature_stats(files):
+    """Per-feature mean/std of the node features over ``files``, one file in memory at a time."""
+    total = np.zeros(len(FEATURE_COLUMNS))
+    total_sq = np.zeros(len(FEATURE_COLUMNS))
+    count = 0
+    for path in files:
+        X = node_features(_read_nodes(path)).astype(np.float64)
+        total += X.sum(axis=0)
+        total_sq += (X ** 2).sum(axis=0)
+        count += len(X)
+    mean = total / max(count, 1)
+    std = np.sqrt(np.maximum(total_sq / max(count, 1) - mean ** 2, 0.0))
+    return {"features": FEATURE_COLUMNS, "count": count, "mean": mean.tolist(), "std": np.maximum(std, 1e-6).tolist()}
+
+
+def load_feature_stats(path, files=None):
+    """Read precomputed stats from ``path``, computing and saving them first if it does not exist."""
+    if not os.path.exists(path):
+        if files is None:
+            raise FileNotFoundError(path)
+        stats = compute_feature_stats(files)
+        with open(path, "w") as f:
+            json.dump(stats, f, indent=2)
+        print(f"Computed feature stats over {stats['count']} rows -> {path}")
+    with open(path) as f:
+        return json.load(f)
+
+
+class _WindowStream(IterableDataset):
+    """Base for streams over window files: worker sharding, standardization, shuffle buffer.
+
+    With ``world_size > 1`` (distributed training) the data is split between
+    ranks as well: every (rank, DataLoader worker) pair reads its own shard.
+    """
+
+    def __init__(self, files, stats=None, shuffle_buffer=0, seed=0, rank=0, world_size=1):
+        self.files = list(files)
+        self.rank = rank
+        self.world_size = world_size
+        self.mean = np.asarray(stats["mean"], dtype=np.float32) if stats else None
+        self.std = np.asarray(stats["std"], dtype=np.float32) if stats else None
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Reshuffle differently each epoch (call before iterating; workers get a copy)."""
+        self.epoch = epoch
+
+    def _features(self, nodes_df):
+        X = node_features(nodes_df)
+        if self.mean is not None:
+            X = (X - self.mean) / self.std
+        return X
+
+    def _items(self, shard, num_shards):
+        raise NotImplementedError
+
+    def __iter__(self):
+        info = get_worker_info()
+        worker_id, num_workers = (info.id, info.num_workers) if info is not None else (0, 1)
+        shard = self.rank * num_workers + worker_id
+        items = self._items(shard, self.world_size * num_workers)
+        if self.shuffle_buffer <= 1:
+            yield from items
+            return
+        rng = np.random.default_rng((self.seed, self.epoch, shard))
+        buf = []
+        for item in items:
+            if len(buf) < self.shuffle_buffer:
+                buf.append(item)
+                continue
+            i = rng.integers(len(buf))
+            yield buf[i]
+            buf[i] = item
+        rng.shuffle(buf)
+        yield from buf
+
+
+class WindowRowStream(_WindowStream):
+    """Node feature rows of every window; each shard reads disjoint files."""
+
+    def _items(self, shard, num_shards):
+        for path in self.files[shard::num_shards]:
+            yield from self._features(_read_nodes(path))
+
+
+class WindowSequenceStream(_WindowStream):
+    """Per-node sequences of ``seq_len`` consecutive windows' features (stride ``stride``).
+
+    Files are read in time order; a node missing from a window restarts its
+    sequence. Shards (ranks and DataLoader workers) own disjoint sets of
+    nodes, so only the recent history of their own nodes is held in memory.
+    """
+
+    def __init__(self, files, seq_len=10, stride=1, **kwargs):
+        super().__init__(files, **kwargs)
+        self.seq_len = seq_len
+        self.stride = stride
+
+    def _items(self, shard, num_shards):
+        history = {}  # node_id -> (last window index, deque of feature rows, rows since last emit)
+        for w, path in enumerate(self.files):
+            nodes_df = _read_nodes(path)
+            if num_shards > 1:
+                nodes_df = nodes_df[_node_shard(nodes_df["node_id"], shard, num_shards)]
+            for node, row in zip(nodes_df["node_id"], self._features(nodes_df)):
+                last, rows, pending = history.get(node, (None, None, 0))
+                if last != w - 1:
+                    rows, pending = deque(maxlen=self.seq_len), 0
+                rows.append(row)
+                pending += 1
+                if len(rows) == self.seq_len and pending >= self.stride:
+                    yield np.stack(rows)
+                    pending = 0
+                history[node] = (w, rows, pending)
+            # Forget nodes that did not appear in this window
+            history = {n: h for n, h in history.items() if h[0] == w}
+
+
+# --- Per-pod feature histories ------------------------------------------------
+
+
+class PodHistory:
+    """Every pod's window features laid out contiguously in one (N, F) array.
+
+    Rows are grouped by pod (graph-builder node) and ordered by window. A run
+    of consecutive windows of one pod is a segment; a pod missing from a
+    window starts a new segment, as in ``WindowSequenceStream``. Sequences
+    are ``sliding_window_view`` views of a segment, so they take no memory
+    beyond the history itself.
+    """
+
+    def __init__(self, features, pods, offsets, first_windows):
+        self.features = features  # (N, F) float32
+        self.pods = pods  # pod of each segment
+        self.offsets = offsets  # (S + 1,) row offset of each segment
+        self.first_windows = first_windows  # (S,) file index of each segment's first window
+
+    @classmethod
+    def from_files(cls, files, stats=None, rank=0, world_size=1):
+        """Read ``files`` (in time order); with ``world_size > 1`` only this rank's share of the pods.
+
+        The whole history is held in memory: about N x F float32 for N node
+        rows (twice that briefly, while the rows are sorted by pod). Pod ids
+        are coded one file at a time, so no per-row id array spans all files.
+        """
+        pod_codes = {}  # pod -> code, in order of first appearance
+        codes, rows, windows = [], [], []
+        for w, path in enumerate(files):
+            nodes_df = _read_nodes(path)
+            if world_size > 1:
+                nodes_df = nodes_df[_node_shard(nodes_df["node_id"], rank, world_size)]
+            file_codes, uniques = pd.factorize(nodes_df["node_id"])
+            lookup = np.array([pod_codes.setdefault(u, len(pod_codes)) for u in uniques], dtype=np.int64)
+            codes.append(lookup[file_codes])
+            rows.append(node_features(nodes_df))
+            windows.append(np.full(len(nodes_df), w, dtype=np.int64))
+        if not rows:
+            return cls(np.zeros((0, len(FEATURE_COLUMNS)), dtype=np.float32), [], np.zeros(1, dtype=np.int64),
+                       np.zeros(0, dtype=np.int64))
+        codes, uniques = np.concatenate(codes), np.array(list(pod_codes), dtype=object)
+        windows = np.concatenate(windows)
+        order = np.lexsort((windows, codes))
+        features = np.concatenate(rows)[order]
+        if stats:
+            features -= np.asarray(stats["mean"], dtype=np.float32)
+            features /= np.asarray(stats["std"], dtype=np.float32)
+        codes, windows = codes[order], windows[order]
+        breaks = (codes[1:] != codes[:-1]) | (windows[1:] != windows[:-1] + 1)
+        starts = np.flatnonzero(np.concatenate([[True], breaks]))
+        offsets = np.append(starts, len(features)).astype(np.int64)
+        return cls(features, list(uniques[codes[starts]]), offsets, windows[starts])
+
+    def __len__(self):
+        return len(self.pods)
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def sequences(self, i, seq_len, stride=1):
+        """(n, seq_len, F) view of segment ``i``'s sequences; sequence k ends at window ``first + seq_len - 1 + k*stride``."""
+        segment = self.features[self.offsets[i]:self.offsets[i + 1]]
+        if len(segment) < seq_len:
+            return np.zeros((0, seq_len, segment.shape[1]), dtype=segment.dtype)
+        return sliding_window_view(segment, seq_len, axis=0)[::stride].transpose(0, 2, 1)
+
+
+class HistorySequences(Dataset):
+    """Map-style dataset of every ``seq_len`` sequence (every ``stride``-th) in a ``PodHistory``.
+
+    Items are views into the history; a sequence is located by binary search
+    over per-segment sequence counts, so no index is materialized. A
+    DataLoader with ``collate_fn=HistorySequences.collate`` fetches each
+    batch with one gather from the history (``__getitems__``), which is the
+    only copy.
+    """
+
+    def __init__(self, history, seq_len=10, stride=1):
+        self.history = history
+        self.seq_len = seq_len
+        self.stride = stride
+        counts = np.maximum((history.lengths() - seq_len) // stride + 1, 0)
+        self._cum = np.cumsum(counts)
+        # Sequences never cross segments, so one view over the whole array serves them all.
+        # Writeable only so torch can wrap items without copying; nothing writes to them.
+        features = history.features
+        self._view = (sliding_window_view(features, seq_len, axis=0, writeable=True).transpose(0, 2, 1)
+                      if len(features) >= seq_len else None)
+
+    def __len__(self):
+        return int(self._cum[-1]) if len(self._cum) else 0
+
+    def start(self, idx):
+        """Row of the history where sequence(s) ``idx`` start."""
+        seg = np.searchsorted(self._cum, idx, side="right")
+        before = np.where(seg > 0, self._cum[np.maximum(seg - 1, 0)], 0)
+        return self.history.offsets[seg] + (idx - before) * self.stride
+
+    def __getitem__(self, idx):
+        return self._view[int(self.start(idx))]
+
+    def __getitems__(self, indices):
+        return torch.from_numpy(self._view[self.start(np.asarray(indices))])
+
+    @staticmethod
+    def collate(batch):
+        """``collate_fn`` for batches from ``__getitems__`` (already one tensor)."""
+        return batch
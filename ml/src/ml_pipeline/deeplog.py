@@ -0,0 +1,171 @@
+"""Streaming DeepLog scoring of syscall events.
+
+Every (pod, pid) keeps the ``DeepLogPredictor`` LSTM state after its last
+syscall, plus the model's top-k prediction for the next one. A new event is
+anomalous when its syscall is not among those k; the state then advances by
+a single recurrence step, so the cost of an event does not depend on how
+long its process has been running. States live in preallocated slabs of
+``max_processes`` slots: the least recently active process gives up its slot
+when a new one needs it, and processes that exit free theirs.
+
+Usage:
+  python -m ml_pipeline.deeplog --model deeplog.pt --vocab vocab.json --events syscalls.jsonl
+  tail -F syscalls.jsonl | python -m ml_pipeline.deeplog --model deeplog.pt --vocab vocab.json --batch 1
+"""
+import argparse
+import json
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+from ml_pipeline.models import DeepLogPredictor
+from ml_pipeline.syscalls import SyscallVocab
+
+EXIT_SYSCALLS = frozenset({"exit", "exit_group"})
+
+
+def load_deeplog(path):
+    """``DeepLogPredictor`` with its sizes read from a saved state dict."""
+    state = torch.load(path, map_location="cpu")
+    vocab_size, emb_dim = state["emb.weight"].shape
+    hidden_dim = state["lstm.weight_hh_l0"].shape[1]
+    num_layers = sum(k.startswith("lstm.weight_ih_l") for k in state)
+    model = DeepLogPredictor(vocab_size, emb_dim, hidden_dim, num_layers)
+    model.load_state_dict(state)
+    return model.eval()
+
+
+class DeepLogScorer:
+    """Scores syscall events incrementally with per-process LSTM state."""
+
+    def __init__(self, model: DeepLogPredictor, vocab: SyscallVocab, top_k: int = 9, max_processes: int = 10000):
+        self.model = model.eval()
+        self.vocab = vocab
+        self.top_k = min(top_k, model.fc.out_features)
+        self.max_processes = max_processes
+        self.evicted = 0
+        layers, hidden = model.lstm.num_layers, model.lstm.hidden_size
+        self._h = torch.zeros(layers, max_processes, hidden)
+        self._c = torch.zeros(layers, max_processes, hidden)
+        self._topk = torch.zeros(max_processes, self.top_k, dtype=torch.long)
+        with torch.no_grad():
+            # A process's first syscall is predicted from the zero state
+            self._first = model.fc(torch.zeros(1, hidden)).topk(self.top_k).indices[0]
+        self._slots = OrderedDict()  # (pod, pid) -> slot, least recently active first
+        self._free = list(range(max_processes - 1, -1, -1))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _slot(self, key) -> int:
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            self.evicted += 1
+        self._h[:, slot] = 0
+        self._c[:, slot] = 0
+        self._topk[slot] = self._first
+        self._slots[key] = slot
+        return slot
+
+    def forget(self, pod, pid):
+        """Release the state of an exited process."""
+        slot = self._slots.pop((pod, pid), None)
+        if slot is not None:
+            self._free.append(slot)
+
+    @torch.no_grad()
+    def _step(self, slots, tokens) -> np.ndarray:
+        slots = torch.tensor(slots)
+        tokens = torch.tensor(tokens)
+        hit = (self._topk.index_select(0, slots) == tokens[:, None]).any(dim=1)
+        state = (self._h.index_select(1, slots), self._c.index_select(1, slots))
+        logits, (h, c) = self.model.step(tokens, state)
+        self._h.index_copy_(1, slots, h)
+        self._c.index_copy_(1, slots, c)
+        self._topk.index_copy_(0, slots, logits.topk(self.top_k, dim=1).indices)
+        return (~hit).numpy()
+
+    def score(self, pod, pid, syscall: str) -> bool:
+        """Whether one syscall event is anomalous."""
+        return bool(self.score_events([(pod, pid, syscall)])[0])
+
+    def score_events(self, events) -> np.ndarray:
+        """Anomaly flag per ``(pod, pid, syscall)`` event.
+
+        Events of one process are applied in order; events of different
+        processes are advanced together, one batched step per round.
+        """
+        events = list(events)
+        anomalous = np.zeros(len(events), dtype=bool)
+        # Round r holds the r-th event of every process in this call
+        rounds, seen = [], {}
+        for i, (pod, pid, _) in enumerate(events):
+            r = seen.get((pod, pid), 0)
+            seen[(pod, pid)] = r + 1
+            if r == len(rounds):
+                rounds.append([])
+            rounds[r].append(i)
+        for round_events in rounds:
+            # A round never needs more slots than exist
+            for start in range(0, len(round_events), self.max_processes):
+                idx = round_events[start:start + self.max_processes]
+                slots = [self._slot((events[i][0], events[i][1])) for i in idx]
+                anomalous[idx] = self._step(slots, [self.vocab.encode(events[i][2]) for i in idx])
+                for i in idx:
+                    if events[i][2] in EXIT_SYSCALLS:
+                        self.forget(events[i][0], events[i][1])
+        return anomalous
+
+
+def _batches(lines, size):
+    batch = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        batch.append(json.loads(line))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--model", required=True, help="DeepLogPredictor state dict")
+    p.add_argument("--vocab", required=True, help="Syscall vocabulary JSON")
+    p.add_argument("--events", default="-", help="eBPF syscall JSONL (default: stdin)")
+    p.add_argument("--top-k", type=int, default=9)
+    p.add_argument("--max-processes", type=int, default=10000)
+    p.add_argument("--batch", type=int, default=512, help="Events scored together (1 for lowest latency)")
+    args = p.parse_args()
+
+    scorer = DeepLogScorer(load_deeplog(args.model), SyscallVocab.load(args.vocab), args.top_k, args.max_processes)
+    src = sys.stdin if args.events == "-" else open(args.events)
+    total = anomalies = 0
+    start = time.perf_counter()
+    with src:
+        for batch in _batches(src, args.batch):
+            flags = scorer.score_events((e.get("pod"), e.get("pid"), e.get("syscall")) for e in batch)
+            for event, flag in zip(batch, flags):
+                if flag:
+                    print(json.dumps({**event, "anomalous": True}), flush=args.batch == 1)
+            total += len(batch)
+            anomalies += int(flags.sum())
+    elapsed = time.perf_counter() - start
+    print(f"{total} events, {anomalies} anomalous, {len(scorer)} processes tracked, {scorer.evicted} evicted, "
+          f"{1e6 * elapsed / max(total, 1):.1f} us/event", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
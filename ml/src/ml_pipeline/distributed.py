@@ -0,0 +1,97 @@
+"""CPU data-parallel training with ``torch.distributed`` (gloo backend).
+
+Launch one process per rank with ``torchrun`` on one or several nodes, or
+let ``spawn`` start local processes (``python -m ml_pipeline.train --nproc N``).
+Every rank trains on its own shard of rows, windows or seed nodes, and
+``DistributedDataParallel`` all-reduces gradients so all ranks step the same
+model. Losses used for logging and early stopping are averaged over ranks so
+every rank takes the same stopping decision; only rank 0 writes files.
+
+  torchrun --nnodes 2 --nproc-per-node 16 --rdzv-backend c10d --rdzv-endpoint head:29400 \\
+      -m ml_pipeline.train --which tgnn --data-dir graphs --batch-size 512 --out-dir models
+"""
+import os
+import socket
+from contextlib import nullcontext
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+
+
+def is_distributed() -> bool:
+    return dist.is_available() and dist.is_initialized()
+
+
+def rank() -> int:
+    return dist.get_rank() if is_distributed() else 0
+
+
+def world_size() -> int:
+    return dist.get_world_size() if is_distributed() else 1
+
+
+def is_main() -> bool:
+    return rank() == 0
+
+
+def init() -> bool:
+    """Join the process group described by the torchrun environment; no-op for a single process."""
+    if is_distributed() or int(os.getenv("WORLD_SIZE", "1")) <= 1:
+        return False
+    dist.init_process_group("gloo")
+    # Split this node's cores between its ranks instead of oversubscribing them
+    local = int(os.getenv("LOCAL_WORLD_SIZE", os.environ["WORLD_SIZE"]))
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // local))
+    return True
+
+
+def shutdown():
+    if is_distributed():
+        dist.destroy_process_group()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawned(local_rank, nprocs, port, fn, args):
+    os.environ.update(RANK=str(local_rank), LOCAL_RANK=str(local_rank), WORLD_SIZE=str(nprocs),
+                      LOCAL_WORLD_SIZE=str(nprocs), MASTER_ADDR="127.0.0.1", MASTER_PORT=str(port))
+    init()
+    try:
+        fn(*args)
+    finally:
+        shutdown()
+
+
+def spawn(fn, nprocs: int, *args):
+    """Run ``fn(*args)`` in ``nprocs`` local processes forming one process group (``fn`` must be picklable)."""
+    mp.spawn(_spawned, args=(nprocs, _free_port(), fn, args), nprocs=nprocs)
+
+
+def wrap(model):
+    """``DistributedDataParallel`` around ``model`` when running distributed."""
+    return DistributedDataParallel(model) if is_distributed() else model
+
+
+def join(model):
+    """Context for an epoch whose ranks may run different numbers of steps (uneven shards)."""
+    return model.join() if isinstance(model, DistributedDataParallel) else nullcontext()
+
+
+def all_mean(total: float, count: float) -> float:
+    """``sum(total) / sum(count)`` over all ranks."""
+    if is_distributed():
+        t = torch.tensor([total, count], dtype=torch.float64)
+        dist.all_reduce(t)
+        total, count = t.tolist()
+    return total / max(count, 1)
+
+
+def barrier():
+    if is_distributed():
+        dist.barrier()
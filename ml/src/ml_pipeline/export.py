@@ -0,0 +1,211 @@
+"""Export trained models to TorchScript/ONNX for CPU inference, with optional int8 quantization.
+
+Artifacts are chosen by file suffix at load time (``load_artifact``):
+``.ts`` for TorchScript, ``.onnx`` for ONNX Runtime. Every export is checked
+for score parity against the eager model before it replaces the artifact path.
+
+Usage:
+  python -m ml_pipeline.export --which ae --weights models/autoencoder.pt --format torchscript --quantize
+"""
+import argparse
+import inspect
+import os
+import time
+from typing import Callable, Dict, Iterable
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from ml_pipeline.models import Autoencoder, LSTMAE
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+def quantize(model: nn.Module) -> nn.Module:
+    """Dynamic int8 quantization of the Linear/LSTM layers (weights int8, activations float)."""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear, nn.LSTM}, dtype=torch.qint8)
+
+
+def export_torchscript(model: nn.Module, example: torch.Tensor, path: str, quantized: bool = False) -> str:
+    """Trace ``model`` (optionally quantized) on ``example`` and save it as TorchScript."""
+    model = model.eval()
+    if quantized:
+        model = quantize(model)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+    traced.save(path)
+    return path
+
+
+def export_onnx(model: nn.Module, example: torch.Tensor, path: str, quantized: bool = False) -> str:
+    """Export ``model`` to ONNX with a dynamic batch axis.
+
+    With ``quantized`` the exported graph's weights are converted to int8 by
+    ONNX Runtime's dynamic quantizer (requires ``onnxruntime``).
+    """
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False  # TorchScript-based exporter: no onnxscript dependency
+    torch.onnx.export(
+        model.eval(), (example,), path,
+        input_names=["x"], output_names=["recon"],
+        dynamic_axes={"x": {0: "batch"}, "recon": {0: "batch"}},
+        **kwargs,
+    )
+    if quantized:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        fp32_path = path + ".fp32"
+        os.replace(path, fp32_path)
+        quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+    return path
+
+
+class OnnxModel:
+    """ONNX Runtime session behaving like a module: tensor in, tensor out."""
+
+    def __init__(self, path: str, intra_op_threads: int = 0):
+        if ort is None:
+            raise RuntimeError("onnxruntime is not installed")
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        out = self.session.run(None, {self.input_name: x.numpy()})[0]
+        return torch.from_numpy(out)
+
+    def eval(self):
+        return self
+
+
+def load_artifact(path: str):
+    """Load an exported model by suffix (``.ts`` TorchScript, ``.onnx`` ONNX Runtime)."""
+    if path.endswith(".onnx"):
+        return OnnxModel(path)
+    if path.endswith(".ts"):
+        model = torch.jit.load(path, map_location="cpu")
+        model.eval()
+        return model
+    raise ValueError(f"Unsupported model artifact: {path}")
+
+
+def reconstruction_scores(model, x: torch.Tensor) -> np.ndarray:
+    """Per-sample mean squared reconstruction error (any feature/time layout)."""
+    with torch.no_grad():
+        recon = model(x)
+        return ((recon - x) ** 2).reshape(len(x), -1).mean(dim=1).numpy()
+
+
+def check_parity(reference, candidate, x: torch.Tensor, rtol: float = 0.05, atol: float = 1e-3) -> float:
+    """Compare anomaly scores of an exported model against the eager model.
+
+    Returns the max absolute score difference; raises ``AssertionError`` if
+    any score differs by more than ``atol + rtol * |reference score|``.
+    """
+    ref = reconstruction_scores(reference, x)
+    got = reconstruction_scores(candidate, x)
+    diff = np.abs(ref - got)
+    if not np.all(diff <= atol + rtol * np.abs(ref)):
+        raise AssertionError(f"Score parity check failed: max abs diff {diff.max():.6g}")
+    return float(diff.max())
+
+
+def benchmark(model, make_batch: Callable[[int], torch.Tensor], batch_sizes: Iterable[int] = (1, 64, 1024),
+              min_seconds: float = 0.5) -> Dict[int, Dict[str, float]]:
+    """Latency (ms per call) and throughput (rows/s) of ``model`` at several batch sizes."""
+    results = {}
+    for bs in batch_sizes:
+        x = make_batch(bs)
+        reconstruction_scores(model, x)  # warm-up
+        calls, start = 0, time.perf_counter()
+        while True:
+            reconstruction_scores(model, x)
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                break
+        results[bs] = {"latency_ms": 1000 * elapsed / calls, "rows_per_s": bs * calls / elapsed}
+    return results
+
+
+def load_weights(which: str, path: str, seq_len: int = 10):
+    """Rebuild a trained ``ae``/``lstm`` model from its state dict, sized from the weight shapes.
+
+    Returns ``(model, make_batch)`` where ``make_batch(n)`` draws ``n``
+    random inputs of the model's shape (``seq_len`` steps for ``lstm``).
+    """
+    # scoring imports this module for load_artifact
+    from ml_pipeline.scoring import autoencoder_dims, lstm_ae_dims
+
+    state = torch.load(path, map_location="cpu")
+    if which == "ae":
+        dims = autoencoder_dims(state)
+        model, shape = Autoencoder(**dims), (dims["input_dim"],)
+    else:
+        dims = lstm_ae_dims(state)
+        model, shape = LSTMAE(**dims), (seq_len, dims["input_dim"])
+    model.load_state_dict(state)
+    return model.eval(), lambda n: torch.randn(n, *shape)
+
+
+def export_model(model: nn.Module, make_batch: Callable[[int], torch.Tensor], out_path: str,
+                 fmt: str = "torchscript", quantized: bool = False) -> str:
+    """Export, reload and parity-check a trained model; returns the artifact path.
+
+    The artifact is written to a temporary file next to ``out_path`` and only
+    moved into place once it passes the parity check, so a served path never
+    holds a failed or partial export.
+    """
+    model = model.eval()
+    example = make_batch(2)
+    stem, ext = os.path.splitext(out_path)
+    tmp_path = f"{stem}.tmp-{os.getpid()}{ext}"  # load_artifact picks the format by suffix
+    try:
+        if fmt == "onnx":
+            export_onnx(model, example, tmp_path, quantized=quantized)
+        else:
+            export_torchscript(model, example, tmp_path, quantized=quantized)
+        diff = check_parity(model, load_artifact(tmp_path), make_batch(256))
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"Exported {out_path} (max score diff vs eager: {diff:.2e})")
+    return out_path
+
+
+def artifact_path(weights_path: str, fmt: str, quantized: bool) -> str:
+    stem = os.path.splitext(weights_path)[0]
+    return stem + (".int8" if quantized else "") + (".onnx" if fmt == "onnx" else ".ts")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--which", choices=["ae", "lstm"], default="ae")
+    p.add_argument("--weights", required=True, help="Trained state dict (.pt)")
+    p.add_argument("--seq-len", type=int, default=10, help="Sequence length of example inputs for --which lstm")
+    p.add_argument("--format", choices=["torchscript", "onnx"], default="torchscript")
+    p.add_argument("--quantize", action="store_true", help="Dynamic int8 quantization of Linear/LSTM layers")
+    p.add_argument("--out", default=None, help="Artifact path (default: next to --weights)")
+    p.add_argument("--benchmark", action="store_true", help="Compare latency/throughput against eager")
+    args = p.parse_args()
+
+    model, make_batch = load_weights(args.which, args.weights, args.seq_len)
+    out = args.out or artifact_path(args.weights, args.format, args.quantize)
+    export_model(model, make_batch, out, args.format, args.quantize)
+
+    if args.benchmark:
+        for name, m in (("eager", model), (os.path.basename(out), load_artifact(out))):
+            for bs, r in benchmark(m, make_batch).items():
+                print(f"{name:>24} batch={bs:<5} {r['latency_ms']:8.3f} ms  {r['rows_per_s']:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
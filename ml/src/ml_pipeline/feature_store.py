@@ -0,0 +1,326 @@
+"""Cached, memory-mapped column store over CSV/Parquet/JSONL dataset files.
+
+``open_table(files, cache_dir)`` parses the files once, in chunks, into
+``cache_dir``:
+
+- ``numeric.npy``: every numeric column as one float64 (rows, columns)
+  matrix in Fortran order, so each column is contiguous (NaN where a file
+  lacks the column or a value is missing)
+- ``codes/<i>.npy``: int32 codes of each string column (-1 for missing),
+  with the categories, in order of first appearance, in ``categories.json``
+- ``manifest.json``: the schema, each source's rows and its mtime/size
+
+Columns are reconciled across files: the table holds the union of all
+columns. Later calls memory-map the cache in milliseconds as long as the
+sources are unchanged. Otherwise the leading files that are unchanged and
+in the same order keep their stored rows (copied, not re-parsed) and only
+the files after them are parsed, so adding a window to a directory parses
+just that window; a changed file re-parses it and the files after it.
+Used by ``ml/train_datasets.py``, ``ml/xai_explain.py`` and
+``ml_pipeline.tgnn.load_parquet_graphs``; depends on numpy/pandas/pyarrow only.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 2
+CACHE_DIRNAME = ".feature_store"
+
+
+def iter_chunks(path, chunk_rows=100_000):
+    """DataFrames of at most ``chunk_rows`` rows from one file, read incrementally."""
+    p = Path(path)
+    if p.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif p.suffix == ".csv":
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+    elif p.suffix in (".jsonl", ".json"):
+        try:
+            yield from pd.read_json(path, lines=True, chunksize=chunk_rows)
+        except ValueError:
+            if p.suffix == ".jsonl":
+                raise
+            # A plain JSON document rather than JSON lines
+            yield pd.read_json(path)
+    else:
+        raise RuntimeError(f"Unsupported file: {path}")
+
+
+def default_cache_dir(path, name=None):
+    """``<dir>/.feature_store/<name>`` next to a file or inside a directory."""
+    p = Path(path)
+    base = p if p.is_dir() else p.parent
+    return str(base / CACHE_DIRNAME / (name or p.name))
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+class _Spool:
+    """Appends DataFrame chunks to one raw file per column, reconciling columns as they appear.
+
+    A column first seen after ``n`` rows is back-filled with ``n`` missing
+    values, and chunks lacking a known column append missing values. A
+    column's kind (numeric or string) is fixed by the first chunk that has
+    it; later chunks are converted to it.
+    """
+
+    def __init__(self, directory, strings=True):
+        self.directory = directory
+        self.strings = strings
+        self.columns = {}  # name -> (kind, open file), in order of first appearance
+        self.categories = {}  # string column -> {value: code}
+        self.n_rows = 0
+
+    def _add(self, name, kind):
+        f = open(os.path.join(self.directory, f"{len(self.columns)}.raw"), "w+b")
+        self.columns[name] = (kind, f)
+        if kind == "string":
+            self.categories[name] = {}
+        _write_missing(f, kind, self.n_rows)
+
+    def _encode(self, name, col):
+        try:
+            codes, uniques = pd.factorize(col)
+        except TypeError:
+            # Unhashable values (nested JSON): encode their text
+            codes, uniques = pd.factorize(col.map(lambda v: v if v is None or isinstance(v, str) else str(v)))
+        index = self.categories[name]
+        lookup = np.array([index.setdefault(u if isinstance(u, str) else str(u), len(index)) for u in uniques] + [-1],
+                          dtype=np.int32)
+        return lookup[codes]  # code -1 (missing) picks the trailing -1
+
+    def append(self, df):
+        numeric = set(df.select_dtypes(include=["number", "bool"]).columns)
+        for name in df.columns:
+            if name not in self.columns and (name in numeric or self.strings):
+                self._add(name, "numeric" if name in numeric else "string")
+        for name, (kind, f) in self.columns.items():
+            if name not in df.columns:
+                _write_missing(f, kind, len(df))
+            elif kind == "numeric":
+                col = df[name] if name in numeric else pd.to_numeric(df[name], errors="coerce")
+                col.to_numpy(dtype=np.float64, na_value=np.nan).tofile(f)
+            else:
+                self._encode(name, df[name]).tofile(f)
+        self.n_rows += len(df)
+
+    def resume(self, table, mark):
+        """Start from the first rows, columns and categories of ``table`` (a ``mark`` taken while building it)."""
+        n_rows, n_columns, n_categories = mark
+        for column in table.manifest["columns"][:n_columns]:
+            name, kind = column["name"], column["kind"]
+            self._add(name, kind)
+            f = self.columns[name][1]
+            for start in range(0, n_rows, 1 << 20):
+                end = min(start + (1 << 20), n_rows)
+                if kind == "numeric":
+                    np.ascontiguousarray(table.numeric[start:end, table._numeric_index[name]]).tofile(f)
+                else:
+                    np.ascontiguousarray(table.codes[name][start:end]).tofile(f)
+            if kind == "string":
+                index = self.categories[name]
+                for value in table.categories[name][:n_categories[name]]:
+                    index[value] = len(index)
+        self.n_rows = n_rows
+
+    def mark(self):
+        """Current rows, columns and categories, for ``rollback``."""
+        return self.n_rows, len(self.columns), {name: len(index) for name, index in self.categories.items()}
+
+    def rollback(self, mark):
+        """Undo everything appended since ``mark`` (e.g. a file that failed half-way): rows, columns, categories."""
+        n_rows, n_columns, n_categories = mark
+        for name in list(self.columns)[n_columns:]:
+            f = self.columns.pop(name)[1]
+            f.close()
+            os.remove(f.name)
+            self.categories.pop(name, None)
+        for name, index in self.categories.items():
+            for value in list(index)[n_categories[name]:]:
+                del index[value]
+        for kind, f in self.columns.values():
+            f.flush()
+            f.truncate(_itemsize(kind) * n_rows)
+            f.seek(0, os.SEEK_END)
+        self.n_rows = n_rows
+
+    def close(self):
+        for _, f in self.columns.values():
+            f.close()
+
+
+def _itemsize(kind):
+    return 8 if kind == "numeric" else 4
+
+
+def _write_missing(f, kind, n, block=1 << 20):
+    while n > 0:
+        m = min(n, block)
+        (np.full(m, np.nan) if kind == "numeric" else np.full(m, -1, dtype=np.int32)).tofile(f)
+        n -= m
+
+
+def _build(files, out_dir, chunk_rows, strings, base=None, keep=0):
+    """Write the store of ``files`` to ``out_dir``, reusing the first ``keep`` sources of the ``base`` table."""
+    os.makedirs(os.path.join(out_dir, "codes"))
+    spool_dir = os.path.join(out_dir, "spool")
+    os.makedirs(spool_dir)
+    spool = _Spool(spool_dir, strings)
+    sources = []
+    try:
+        if keep:
+            sources = base.sources[:keep]
+            spool.resume(base, sources[-1]["mark"])
+        for path in files[keep:]:
+            start, mark = spool.n_rows, spool.mark()
+            stamp = _source_stamp(path)
+            seen = {}  # columns this source has, in order, for per-source frames
+            try:
+                for chunk in iter_chunks(path, chunk_rows):
+                    spool.append(chunk)
+                    seen.update(dict.fromkeys(chunk.columns))
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+                spool.rollback(mark)
+                continue
+            columns = [c for c in seen if c in spool.columns]
+            sources.append({**stamp, "columns": columns, "start": start, "end": spool.n_rows, "mark": spool.mark()})
+
+        numeric = [n for n, (kind, _) in spool.columns.items() if kind == "numeric"]
+        X = np.lib.format.open_memmap(os.path.join(out_dir, "numeric.npy"), mode="w+", dtype=np.float64,
+                                      shape=(spool.n_rows, len(numeric)), fortran_order=True)
+        for j, name in enumerate(numeric):
+            f = spool.columns[name][1]
+            f.flush()
+            if spool.n_rows:
+                # Fortran order: a column is one contiguous block
+                X[:, j] = np.memmap(f.name, dtype=np.float64, mode="r")
+        X.flush()
+        del X
+        string_cols = [n for n, (kind, _) in spool.columns.items() if kind == "string"]
+        for j, name in enumerate(string_cols):
+            f = spool.columns[name][1]
+            f.flush()
+            f.close()
+            codes_path = os.path.join(out_dir, "codes", f"{j}.npy")
+            codes = np.lib.format.open_memmap(codes_path, mode="w+", dtype=np.int32, shape=(spool.n_rows,))
+            if spool.n_rows:
+                codes[:] = np.memmap(f.name, dtype=np.int32, mode="r")
+            codes.flush()
+            del codes
+        with open(os.path.join(out_dir, "categories.json"), "w") as f:
+            json.dump({name: list(spool.categories[name]) for name in string_cols}, f)
+        manifest = {
+            "format": FORMAT_VERSION,
+            "strings": strings,
+            "n_rows": spool.n_rows,
+            "columns": [{"name": n, "kind": kind} for n, (kind, _) in spool.columns.items()],
+            "sources": sources,
+            "requested": [os.path.abspath(p) for p in files],
+        }
+    finally:
+        spool.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+
+def _reusable(manifest, files, strings):
+    """Number of leading ``files`` stored unchanged in ``manifest``, and whether the store is fresh as a whole."""
+    if manifest.get("format") != FORMAT_VERSION or manifest.get("strings") != strings:
+        return 0, False
+    paths = [os.path.abspath(p) for p in files]
+    keep = 0
+    for path, source in zip(paths, manifest["sources"]):
+        try:
+            stamp = _source_stamp(source["path"])
+        except OSError:
+            break
+        if source["path"] != path or (stamp["mtime_ns"], stamp["size"]) != (source["mtime_ns"], source["size"]):
+            break
+        keep += 1
+    # Files skipped as unreadable are not sources: they are retried once the file list changes
+    fresh = keep == len(manifest["sources"]) and manifest.get("requested") == paths
+    return keep, fresh
+
+
+def open_table(files, cache_dir, chunk_rows=100_000, strings=True):
+    """Memory-mapped ``FeatureTable`` of ``files``, updating the cache in ``cache_dir`` if stale.
+
+    With ``strings=False`` only numeric columns are stored. Unreadable files
+    are skipped (and retried on the next update).
+    """
+    files = [str(f) for f in files]
+    try:
+        with open(os.path.join(cache_dir, "manifest.json")) as f:
+            keep, fresh = _reusable(json.load(f), files, strings)
+    except (OSError, ValueError):
+        keep, fresh = 0, False
+    if not fresh:
+        base = FeatureTable(cache_dir) if keep else None
+        if keep:
+            print(f"Updating feature store in {cache_dir}: {keep} files unchanged, parsing {len(files) - keep}")
+        else:
+            print(f"Building feature store for {len(files)} files in {cache_dir}")
+        tmp = f"{cache_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        try:
+            _build(files, tmp, chunk_rows, strings, base, keep)
+            del base
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            os.replace(tmp, cache_dir)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return FeatureTable(cache_dir)
+
+
+class FeatureTable:
+    """Read-only view of a feature store directory."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, "categories.json")) as f:
+            self.categories = json.load(f)
+        self.n_rows = self.manifest["n_rows"]
+        self.columns = [c["name"] for c in self.manifest["columns"]]
+        self.numeric_columns = [c["name"] for c in self.manifest["columns"] if c["kind"] == "numeric"]
+        self.string_columns = [c["name"] for c in self.manifest["columns"] if c["kind"] == "string"]
+        self.numeric = np.load(os.path.join(path, "numeric.npy"), mmap_mode="r")
+        self.codes = {name: np.load(os.path.join(path, "codes", f"{j}.npy"), mmap_mode="r")
+                      for j, name in enumerate(self.string_columns)}
+        self.sources = self.manifest["sources"]
+        self._numeric_index = {name: j for j, name in enumerate(self.numeric_columns)}
+
+    @property
+    def spans(self):
+        """``(path, first_row, end_row)`` of every source file in the table."""
+        return [(s["path"], s["start"], s["end"]) for s in self.sources]
+
+    def column(self, name, start=0, end=None):
+        """Values of one column over rows ``[start, end)``: a float64 view, or strings (None when missing)."""
+        if name in self._numeric_index:
+            return self.numeric[start:end, self._numeric_index[name]]
+        codes = self.codes[name][start:end]
+        categories = np.array(self.categories[name] + [None], dtype=object)
+        return categories[codes]  # code -1 picks the trailing None
+
+    def frame(self, source, columns=None):
+        """DataFrame of one source file (index or path) with the columns it has, in their original order."""
+        if not isinstance(source, int):
+            path = os.path.abspath(source)
+            source = next(i for i, s in enumerate(self.sources) if s["path"] == path)
+        s = self.sources[source]
+        columns = [c for c in s["columns"] if columns is None or c in columns]
+        return pd.DataFrame({c: self.column(c, s["start"], s["end"]) for c in columns})
@@ -0,0 +1,11 @@
+"""Node features of graph-builder windows, shared by training and the torch-free scorers."""
+import numpy as np
+import pandas as pd
+
+# Node feature columns written by graph_builder (same as ml_pipeline.tgnn)
+FEATURE_COLUMNS = ["bytes", "outgoing_unique_dst_count", "flow_count"]
+
+
+def node_features(nodes_df: pd.DataFrame) -> np.ndarray:
+    """Model input for a window's nodes: log-scaled count/byte features."""
+    return np.log1p(nodes_df[FEATURE_COLUMNS].to_numpy(dtype=np.float32).clip(min=0))
@@ -1,119 +1,318 @@
 """Inference microservice: loads trained models, scores windows, emits Alert CRs."""
+import functools
 import os
 import json
+import time
 import numpy as np
 from pathlib import Path
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from kubernetes import client, config
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except Exception:
-    TORCH_AVAILABLE = False
-
-if TORCH_AVAILABLE:
-    from ml_pipeline.models import Autoencoder
-    from ml_pipeline.data import SequenceDataset
-else:
-    # Lightweight fallbacks when torch is not available in the runtime image
-    Autoencoder = None
-    SequenceDataset = None
+
+from ml_pipeline.alerts import AlertDispatcher, FakeCustomObjectsApi
+from ml_pipeline.batching import MicroBatcher
+from ml_pipeline.thresholds import ThresholdCalibrator
+from ml_pipeline import metrics, wire
+from ml_pipeline.scoring import (
+    TORCH_AVAILABLE,
+    ModelCache,
+    feature_errors,
+    load_model,
+    model_version,
+    score_batch,
+    score_window,
+)
+from ml_pipeline.xai import ExplanationCache, ExplanationGenerator, reconstruction_attributions
 
 app = Flask(__name__)
 
-# Load config
-try:
-    config.load_incluster_config()
-except:
-    config.load_kube_config()
 
-v1 = client.CustomObjectsApi()
+def make_custom_objects_api():
+    """Kubernetes CustomObjectsApi, or an in-memory fake for local runs with ``ALERT_CLIENT=fake``.
+
+    Fails at startup when neither an in-cluster nor a kubeconfig configuration
+    can be loaded, rather than silently dropping every alert.
+    """
+    if os.getenv("ALERT_CLIENT") == "fake":
+        print("ALERT_CLIENT=fake: alerts go to an in-memory fake client.")
+        return FakeCustomObjectsApi()
+    try:
+        config.load_incluster_config()
+    except Exception:
+        try:
+            config.load_kube_config()
+        except Exception as e:
+            raise RuntimeError(
+                f"No Kubernetes configuration ({e}); set ALERT_CLIENT=fake to run without a cluster") from e
+    return client.CustomObjectsApi()
+
+
+v1 = make_custom_objects_api()
+ALERTS = AlertDispatcher(
+    v1,
+    suppression_window=float(os.getenv("ALERT_SUPPRESSION_SECONDS", "60")),
+    max_queue=int(os.getenv("ALERT_QUEUE_SIZE", "1000")),
+    rate_limit=float(os.getenv("ALERT_RATE_LIMIT", "5")),
+)
 MODEL_PATH = os.getenv("MODEL_PATH", "/models/autoencoder.pt")
+MODEL_CACHE = ModelCache(MODEL_PATH, check_interval=float(os.getenv("MODEL_RELOAD_INTERVAL", "5")))
+
+# Optional micro-batching of concurrent /score requests (disabled when 0)
+MICROBATCH_WAIT_MS = float(os.getenv("MICROBATCH_WAIT_MS", "0"))
+
+
+def _microbatch_score(X):
+    metrics.BATCH_SIZE.labels("microbatch").observe(len(X))
+    return score_batch(MODEL_CACHE.get()[0], X)
+
+
+MICROBATCHER = (
+    MicroBatcher(_microbatch_score,
+                 max_batch_size=int(os.getenv("MICROBATCH_MAX_SIZE", "256")),
+                 max_wait_ms=MICROBATCH_WAIT_MS)
+    if MICROBATCH_WAIT_MS > 0 else None
+)
+
+
+# Explanations are computed lazily (on /explain, or when an alert is actually sent) and cached
+EXPLANATIONS = ExplanationCache(max_size=int(os.getenv("EXPLANATION_CACHE_SIZE", "4096")))
+FEATURE_NAMES = [n.strip() for n in os.getenv("FEATURE_NAMES", "").split(",") if n.strip()]
+
+
+# Per-namespace thresholds at a target alert rate (static ANOMALY_THRESHOLD when unset)
+THRESHOLDS = ThresholdCalibrator(
+    target_rate=float(os.getenv("ALERT_TARGET_RATE", "0")) or None,
+    min_count=int(os.getenv("THRESHOLD_MIN_SCORES", "1000")),
+    half_life=float(os.getenv("THRESHOLD_HALF_LIFE", "100000")),
+    path=os.getenv("THRESHOLD_STATE_PATH") or None,
+)
+
 
+def anomaly_threshold():
+    """Static threshold: used for every namespace unless ``ALERT_TARGET_RATE`` is set, and during warm-up."""
+    return float(os.getenv("ANOMALY_THRESHOLD", "0.5"))
 
-def load_model(path):
-    """Load trained model."""
-    if not os.path.exists(path):
-        return None
-    if not TORCH_AVAILABLE or Autoencoder is None:
-        print("Torch not available in inference image; skipping model load.")
-        return None
-    model = Autoencoder(input_dim=16, hidden_dims=[64, 32])
-    model.load_state_dict(torch.load(path, map_location="cpu"))
-    model.eval()
-    return model
-
-
-def score_window(model, window_features):
-    """Compute anomaly score (reconstruction error)."""
-    # If model is available use reconstruction error; otherwise use a simple heuristic
-    if model is not None and TORCH_AVAILABLE:
-        with torch.no_grad():
-            x = torch.tensor(window_features, dtype=torch.float32).unsqueeze(0)
-            recon = model(x)
-            loss = torch.nn.MSELoss()(recon, x).item()
-        return float(loss)
-    else:
-        # Heuristic anomaly score: normalized L2 norm of features
-        arr = np.array(window_features, dtype=np.float32)
-        score = float(np.linalg.norm(arr) / (np.sqrt(len(arr)) + 1e-6))
-        return score
+
+def namespace_thresholds(version, namespaces, codes=None):
+    """Threshold per score for ``namespaces`` (one name, one per score, or distinct names with ``codes``)."""
+    return THRESHOLDS.thresholds(version, namespaces, anomaly_threshold(), codes)
 
 
 def create_alert(pod_name, namespace, score, explanation):
-    """Create and submit Alert CRD to Kubernetes."""
-    alert = {
-        "apiVersion": "security.example.com/v1alpha1",
-        "kind": "Containment",
-        "metadata": {
-            "name": f"alert-{pod_name}-{int(score*1000)}",
-            "namespace": namespace,
-        },
-        "spec": {
-            "alertID": f"alert-{pod_name}",
-            "confidence": min(0.99, score),
-            "suggestedAction": "isolate_pod",
-            "dryRun": False,
-            "explanation": explanation,
-        },
+    """Queue an Alert CRD for the background dispatcher (never blocks scoring)."""
+    queued = ALERTS.submit(pod_name, namespace, score, explanation)
+    metrics.ALERT_QUEUE_DEPTH.set(ALERTS.queue_depth())
+    return queued
+
+
+def explain_features(features):
+    """Per-feature attribution and explanation text for one row, from the LRU cache when possible."""
+    features = np.asarray(features, dtype=np.float32)
+    model, version = MODEL_CACHE.get()
+    key = ExplanationCache.key(version, features)
+    cached = EXPLANATIONS.get(key)
+    if cached is not None:
+        metrics.EXPLANATION_CACHE.labels("hit").inc()
+        return cached, True
+    metrics.EXPLANATION_CACHE.labels("miss").inc()
+    names = FEATURE_NAMES if len(FEATURE_NAMES) == len(features) else [f"feature_{i}" for i in range(len(features))]
+    score = score_window(model, features)
+    attributions = reconstruction_attributions(feature_errors(model, features[None, :])[0])
+    result = {
+        "score": score,
+        "model_version": version,
+        "attributions": {n: c for n, c in zip(names, attributions["feature_contributions"])},
+        "top_features": [names[i] for i in attributions["top_features"]],
+        "explanation": ExplanationGenerator(names).generate_explanation(score, attributions),
     }
-    try:
-        v1.create_namespaced_custom_object(
-            group="security.example.com",
-            version="v1alpha1",
-            namespace=namespace,
-            plural="containments",
-            body=alert,
-        )
-        return True
-    except Exception as e:
-        print(f"Error creating alert: {e}")
-        return False
+    EXPLANATIONS.put(key, result)
+    return result, False
 
 
-@app.route("/score", methods=["POST"])
-def score():
-    """Score a window: expects JSON with node features."""
+def lazy_explanation(features):
+    """Alert explanation evaluated by the dispatcher only if the alert is sent."""
+    row = np.array(features, dtype=np.float32)  # own copy: the request buffer may be reused
+    return lambda: explain_features(row)[0]["explanation"]
+
+
+def instrumented(endpoint):
+    """Record in-flight count and end-to-end latency of a handler."""
+    def wrap(handler):
+        @functools.wraps(handler)
+        def inner(*args, **kwargs):
+            with metrics.IN_FLIGHT.labels(endpoint).track_inprogress():
+                start = time.perf_counter()
+                try:
+                    return handler(*args, **kwargs)
+                finally:
+                    metrics.REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+        return inner
+    return wrap
+
+
+@instrumented("score")
+def score_payload(data, score=None):
+    """Score one row ({pod_name, namespace, features}); returns (response, status).
+
+    ``score`` is the row's score if the caller already has it (the ASGI app
+    awaits the micro-batcher itself).
+    """
     try:
-        data = request.json
-        model = load_model(MODEL_PATH)
         features = np.array(data.get("features"), dtype=np.float32)
+        ns = data.get("namespace", "default")
         # If model isn't available, score_window will use a heuristic fallback
-        score = score_window(model, features)
+        if score is not None:
+            pass
+        elif MICROBATCHER is not None:
+            # Includes the wait for the batch to fill
+            with metrics.phase("score", "forward"):
+                score = MICROBATCHER.score(features)
+        else:
+            with metrics.phase("score", "load"):
+                model, _ = MODEL_CACHE.get()
+            with metrics.phase("score", "forward"):
+                score = score_window(model, features)
+            metrics.BATCH_SIZE.labels("score").observe(1)
+        metrics.observe_scores(ns, [score])
         # If score > threshold, emit alert
-        threshold = float(os.getenv("ANOMALY_THRESHOLD", "0.5"))
+        version = MODEL_CACHE.version
+        threshold = float(namespace_thresholds(version, ns))
+        THRESHOLDS.observe(version, ns, [score])
         if score > threshold:
             pod = data.get("pod_name", "unknown")
-            ns = data.get("namespace", "default")
-            create_alert(pod, ns, score, f"High reconstruction error: {score:.4f}")
-        return jsonify({"score": score, "anomaly": score > threshold})
+            with metrics.phase("score", "alert"):
+                create_alert(pod, ns, score, lazy_explanation(features))
+        return {"score": score, "anomaly": score > threshold}, 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return {"error": str(e)}, 400
+
+
+@instrumented("score_batch")
+def score_rows(data):
+    """Score {"rows": [{pod_name, namespace, features}, ...]} in one pass; returns (response, status)."""
+    try:
+        rows = data.get("rows", [])
+        if not rows:
+            return {"results": []}, 200
+        with metrics.phase("score_batch", "load"):
+            model, version = MODEL_CACHE.get()
+        features = np.array([r.get("features") for r in rows], dtype=np.float32)
+        with metrics.phase("score_batch", "forward"):
+            scores = score_batch(model, features)
+        metrics.BATCH_SIZE.labels("score_batch").observe(len(rows))
+        names, codes = np.unique(np.array([r.get("namespace", "default") for r in rows], dtype=str),
+                                 return_inverse=True)
+        anomaly = (scores > namespace_thresholds(version, names, codes)).tolist()
+        THRESHOLDS.observe(version, names, scores, codes)
+        results = []
+        with metrics.phase("score_batch", "alert"):
+            for i, (r, s) in enumerate(zip(rows, scores.tolist())):
+                pod = r.get("pod_name", "unknown")
+                ns = r.get("namespace", "default")
+                if anomaly[i]:
+                    create_alert(pod, ns, s, lazy_explanation(features[i]))
+                results.append({"pod_name": pod, "namespace": ns, "score": s, "anomaly": anomaly[i]})
+        metrics.observe_scores(names, scores, codes)
+        return {"results": results, "model_version": version}, 200
+    except Exception as e:
+        return {"error": str(e)}, 400
+
+
+@instrumented("score_batch")
+def score_binary(body, content_type, accept=None, num_features=None):
+    """Score an Arrow IPC / raw float32 bulk request; returns (body bytes, status, content type).
+
+    Features are scored straight from the request buffer; only anomalous rows
+    are materialized as Python objects (for their alerts).
+    """
+    try:
+        features, meta = wire.decode_features(body, content_type, int(num_features) if num_features else None)
+        with metrics.phase("score_batch", "load"):
+            model, version = MODEL_CACHE.get()
+        with metrics.phase("score_batch", "forward"):
+            scores = score_batch(model, features) if len(features) else np.zeros(0, dtype=np.float32)
+        metrics.BATCH_SIZE.labels("score_batch").observe(len(features))
+        if meta.get("namespace") is not None:
+            names, codes = wire.categories(meta["namespace"], "default")
+        else:
+            names, codes = "default", None
+        anomaly = scores > namespace_thresholds(version, names, codes)
+        THRESHOLDS.observe(version, names, scores, codes)
+        rows = np.flatnonzero(anomaly)
+        if len(rows):
+            with metrics.phase("score_batch", "alert"):
+                pods = wire.take(meta.get("pod_name"), rows, "unknown")
+                namespaces = wire.take(meta.get("namespace"), rows, "default")
+                for i, pod, ns, s in zip(rows, pods, namespaces, scores[rows].tolist()):
+                    create_alert(pod, ns, s, lazy_explanation(features[i]))
+        metrics.observe_scores(names, scores, codes)
+        out_type = wire.response_type(content_type, accept)
+        return wire.encode_scores(scores, anomaly, out_type), 200, out_type
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode(), 400, "application/json"
+
+
+@instrumented("explain")
+def explain_payload(data):
+    """Explain one row ({features, pod_name?, namespace?}); returns (response, status)."""
+    try:
+        result, cached = explain_features(data["features"])
+        threshold = float(namespace_thresholds(result["model_version"], data.get("namespace", "default")))
+        return {**result, "anomaly": result["score"] > threshold, "cached": cached}, 200
+    except Exception as e:
+        return {"error": str(e)}, 400
+
+
+def metrics_payload():
+    """Prometheus exposition of the service metrics: (body bytes, content type)."""
+    metrics.ALERT_QUEUE_DEPTH.set(ALERTS.queue_depth())
+    return metrics.render()
+
+
+def health_payload():
+    model, version = MODEL_CACHE.get()
+    return {"status": "ok", "model_loaded": model is not None, "model_version": version}
+
+
+@app.route("/score", methods=["POST"])
+def score():
+    """Score a window: expects JSON with node features."""
+    body, status = score_payload(request.json)
+    return jsonify(body), status
+
+
+@app.route("/score/batch", methods=["POST"])
+def score_bulk():
+    """Score many rows in one pass: expects JSON {"rows": [{pod_name, namespace, features}, ...]}.
+
+    Arrow IPC and raw float32 bodies are also accepted (see ``ml_pipeline.wire``).
+    """
+    content_type = wire.media_type(request.content_type)
+    if content_type in wire.BINARY_TYPES:
+        body, status, out_type = score_binary(
+            request.get_data(cache=False), content_type,
+            request.headers.get("Accept"), request.headers.get(wire.NUM_FEATURES_HEADER),
+        )
+        return Response(body, status=status, content_type=out_type)
+    body, status = score_rows(request.json)
+    return jsonify(body), status
+
+
+@app.route("/explain", methods=["POST"])
+def explain():
+    """Feature attribution for one row: expects JSON {"features": [...]}. Cached per model version."""
+    body, status = explain_payload(request.json)
+    return jsonify(body), status
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
 
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok"})
+    return jsonify(health_payload())
 
 
 if __name__ == "__main__":
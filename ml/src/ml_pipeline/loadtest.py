@@ -0,0 +1,97 @@
+"""Small asyncio HTTP load generator for comparing inference serving modes.
+
+Sends ``--requests`` POSTs to ``/score`` from ``--concurrency`` concurrent
+clients while ``--slow-clients`` extra connections trickle their request
+bodies one byte at a time, and reports throughput and latency percentiles.
+
+Usage:
+  python -m ml_pipeline.loadtest --url http://127.0.0.1:8080 --concurrency 64 --slow-clients 200
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+def _request(host, path, payload: bytes) -> bytes:
+    return (
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n"
+    ).encode() + payload
+
+
+async def _post(host, port, path, payload) -> float:
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(_request(host, path, payload))
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    return time.perf_counter() - start
+
+
+async def _slow_client(host, port, path, payload, stop: asyncio.Event, byte_interval: float):
+    """Holds a connection open by sending the request one byte at a time."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        for b in _request(host, path, payload):
+            if stop.is_set():
+                break
+            writer.write(bytes([b]))
+            await writer.drain()
+            await asyncio.sleep(byte_interval)
+        writer.close()
+    except OSError:
+        pass
+
+
+async def run(url, requests=2000, concurrency=64, slow_clients=0, byte_interval=0.5, n_features=16):
+    u = urlparse(url)
+    host, port = u.hostname, u.port or 80
+    payload = json.dumps({"pod_name": "load", "namespace": "dev", "features": [0.1] * n_features}).encode()
+    stop = asyncio.Event()
+    slow = [asyncio.create_task(_slow_client(host, port, "/score", payload, stop, byte_interval))
+            for _ in range(slow_clients)]
+    await asyncio.sleep(0.5 if slow_clients else 0)
+
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def client():
+        for _ in remaining:
+            latencies.append(await _post(host, port, "/score", payload))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for t in slow:
+        t.cancel()
+    lat = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--url", default="http://127.0.0.1:8080")
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--concurrency", type=int, default=64)
+    p.add_argument("--slow-clients", type=int, default=0)
+    p.add_argument("--byte-interval", type=float, default=0.5, help="Seconds between bytes of a slow client")
+    p.add_argument("--features", type=int, default=16)
+    args = p.parse_args()
+    result = asyncio.run(run(args.url, args.requests, args.concurrency, args.slow_clients,
+                             args.byte_interval, args.features))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
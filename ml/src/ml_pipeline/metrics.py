@@ -0,0 +1,152 @@
+"""Prometheus metrics for the inference service.
+
+All metrics are no-ops when ``prometheus_client`` is not installed (e.g. the
+slim inference image). Under the prefork server, set
+``PROMETHEUS_MULTIPROC_DIR`` to an empty directory so ``/metrics`` reports
+the sum over all workers.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except ImportError:
+    Counter = Gauge = Histogram = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+SCORE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 25, 100)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+    @contextmanager
+    def track_inprogress(self):
+        yield
+
+
+def _metric(cls, *args, **kwargs):
+    return cls(*args, **kwargs) if cls is not None else _NoopMetric()
+
+
+REQUEST_LATENCY = _metric(
+    Histogram, "inference_request_duration_seconds", "End-to-end handler latency",
+    ["endpoint"], buckets=LATENCY_BUCKETS,
+)
+PHASE_LATENCY = _metric(
+    Histogram, "inference_phase_duration_seconds", "Handler latency by phase (load, forward, alert)",
+    ["endpoint", "phase"], buckets=LATENCY_BUCKETS,
+)
+BATCH_SIZE = _metric(
+    Histogram, "inference_batch_size", "Rows per model forward pass", ["endpoint"], buckets=BATCH_BUCKETS,
+)
+IN_FLIGHT = _metric(
+    Gauge, "inference_requests_in_flight", "Requests currently being handled", ["endpoint"],
+    multiprocess_mode="livesum",
+)
+ALERT_QUEUE_DEPTH = _metric(
+    Gauge, "inference_alert_queue_depth", "Alerts waiting for the background dispatcher",
+    multiprocess_mode="livesum",
+)
+EXPLANATION_CACHE = _metric(
+    Counter, "inference_explanation_cache", "Explanation lookups by cache result", ["result"],
+)
+SCORES = _metric(
+    Histogram, "inference_score", "Anomaly scores by namespace", ["namespace"], buckets=SCORE_BUCKETS,
+)
+
+
+@contextmanager
+def phase(endpoint: str, name: str):
+    """Time a block as one phase of an ``endpoint`` request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_LATENCY.labels(endpoint, name).observe(time.perf_counter() - start)
+
+
+def _bulk_supported(histogram):
+    """Whether ``histogram`` has the internals ``observe_many`` updates directly.
+
+    These are private to ``prometheus_client`` (pinned in requirements.txt);
+    ``tests/test_metrics.py`` fails if they stop matching ``observe``.
+    """
+    buckets = getattr(histogram, "_buckets", None)
+    bounds = getattr(histogram, "_upper_bounds", None)
+    return (bounds is not None and buckets is not None and len(buckets) == len(bounds)
+            and hasattr(getattr(histogram, "_sum", None), "inc"))
+
+
+def observe_many(histogram, values):
+    """Observe every value of an array in one pass (per-row ``observe`` is too slow for bulk requests).
+
+    Falls back to per-value ``observe`` when the histogram's internals are
+    not the expected ones.
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    if not len(values) or isinstance(histogram, _NoopMetric):
+        return
+    if not _bulk_supported(histogram):
+        for v in values.tolist():
+            histogram.observe(v)
+        return
+    bounds = histogram._upper_bounds
+    # Same bucket rule as Histogram.observe: first bound with value <= bound
+    counts = np.bincount(np.searchsorted(bounds, values, side="left"), minlength=len(bounds))
+    for i in np.flatnonzero(counts):
+        histogram._buckets[i].inc(int(counts[i]))
+    histogram._sum.inc(float(values.sum()))
+
+
+def observe_scores(namespaces, scores, codes=None):
+    """Record scores in the per-namespace histogram.
+
+    ``namespaces`` is one name for all scores, one name per score, or (with
+    ``codes``) the distinct names that ``codes`` index into.
+    """
+    scores = np.asarray(scores)
+    if isinstance(namespaces, str):
+        observe_many(SCORES.labels(namespaces), scores)
+        return
+    if codes is None:
+        namespaces, codes = np.unique(np.asarray(namespaces, dtype=str), return_inverse=True)
+    for i, ns in enumerate(namespaces):
+        observe_many(SCORES.labels(ns), scores[codes == i])
+
+
+def render():
+    """Current metrics in the Prometheus text format: (body, content type)."""
+    if Histogram is None:
+        return b"# prometheus_client not installed\n", CONTENT_TYPE_LATEST
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
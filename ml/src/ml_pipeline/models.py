@@ -1,6 +1,7 @@
 """Baseline models: Autoencoder, LSTM-AE, and DeepLog-like predictor."""
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 
 class Autoencoder(nn.Module):
@@ -53,3 +54,27 @@ class DeepLogPredictor(nn.Module):
         out, _ = self.lstm(e)
         logits = self.fc(out)
         return logits
+
+    def step(self, tokens, state=None):
+        """Advance each sequence by one token: tokens (B,) -> next-token logits (B, V), new (h, c).
+
+        Feeding a sequence one token at a time through ``step`` gives the
+        same logits as ``forward`` on the whole sequence. The cell is written
+        out because ``nn.LSTM`` costs several times more per call on
+        single-step CPU batches.
+        """
+        x = self.emb(tokens)
+        if state is None:
+            zeros = x.new_zeros(self.lstm.num_layers, len(tokens), self.lstm.hidden_size)
+            state = (zeros, zeros)
+        hs, cs = [], []
+        for layer in range(self.lstm.num_layers):
+            gates = (F.linear(x, getattr(self.lstm, f"weight_ih_l{layer}"), getattr(self.lstm, f"bias_ih_l{layer}"))
+                     + F.linear(state[0][layer], getattr(self.lstm, f"weight_hh_l{layer}"),
+                                getattr(self.lstm, f"bias_hh_l{layer}")))
+            i, f, g, o = gates.chunk(4, dim=1)
+            c = torch.sigmoid(f) * state[1][layer] + torch.sigmoid(i) * torch.tanh(g)
+            x = torch.sigmoid(o) * torch.tanh(c)
+            hs.append(x)
+            cs.append(c)
+        return self.fc(x), (torch.stack(hs), torch.stack(cs))
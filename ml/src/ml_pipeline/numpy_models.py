@@ -0,0 +1,143 @@
+"""Torch-free inference for Autoencoder / LSTM-AE from exported ``.npz`` weights.
+
+``export_npz`` (run where torch is installed, e.g. after training) writes a
+model's parameters plus its architecture name. ``load_npz_model`` rebuilds a
+pure-NumPy forward pass that the slim inference image can run without torch.
+
+Usage:
+  python -m ml_pipeline.numpy_models --which ae --weights models/autoencoder.pt
+"""
+import argparse
+import os
+import re
+
+import numpy as np
+
+
+def export_npz(model, path: str) -> str:
+    """Save a trained ``Autoencoder`` or ``LSTMAE`` as float32 arrays in ``path``."""
+    arch = {"Autoencoder": "autoencoder", "LSTMAE": "lstm_ae"}[type(model).__name__]
+    arrays = {k: v.detach().cpu().numpy().astype(np.float32) for k, v in model.state_dict().items()}
+    np.savez(path, __arch__=np.array(arch), **arrays)
+    return path
+
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+class NumpyAutoencoder:
+    """Linear/ReLU stack of ``models.Autoencoder`` evaluated with NumPy matmuls."""
+
+    def __init__(self, weights):
+        idx = sorted(int(m.group(1)) for k in weights for m in [re.match(r"net\.(\d+)\.weight$", k)] if m)
+        # Pre-transpose so forward is x @ W
+        self.layers = [(np.ascontiguousarray(weights[f"net.{i}.weight"].T), weights[f"net.{i}.bias"]) for i in idx]
+        self.input_dim = self.layers[0][0].shape[0]
+
+    def reconstruct(self, x: np.ndarray) -> np.ndarray:
+        h = np.asarray(x, dtype=np.float32)
+        for i, (w, b) in enumerate(self.layers):
+            h = h @ w + b
+            if i < len(self.layers) - 1:
+                np.maximum(h, 0, out=h)
+        return h
+
+    def score(self, x: np.ndarray) -> np.ndarray:
+        """Per-row mean squared reconstruction error for a (B, F) matrix."""
+        x = np.asarray(x, dtype=np.float32)
+        return ((self.reconstruct(x) - x) ** 2).mean(axis=1)
+
+
+class _NumpyLSTM:
+    """Batch-first multi-layer ``nn.LSTM`` (gate order i, f, g, o)."""
+
+    def __init__(self, weights, prefix):
+        self.layers = []
+        layer = 0
+        while f"{prefix}.weight_ih_l{layer}" in weights:
+            w_ih = weights[f"{prefix}.weight_ih_l{layer}"]
+            w_hh = weights[f"{prefix}.weight_hh_l{layer}"]
+            bias = weights[f"{prefix}.bias_ih_l{layer}"] + weights[f"{prefix}.bias_hh_l{layer}"]
+            self.layers.append((np.ascontiguousarray(w_ih.T), np.ascontiguousarray(w_hh.T), bias))
+            layer += 1
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        out = x
+        for w_ih, w_hh, bias in self.layers:
+            B, T, _ = out.shape
+            H = w_hh.shape[0]
+            # Input projections for all timesteps in one matmul
+            gates_x = out @ w_ih + bias  # (B, T, 4H)
+            h = np.zeros((B, H), dtype=np.float32)
+            c = np.zeros((B, H), dtype=np.float32)
+            seq = np.empty((B, T, H), dtype=np.float32)
+            for t in range(T):
+                gates = gates_x[:, t] + h @ w_hh
+                i = _sigmoid(gates[:, :H])
+                f = _sigmoid(gates[:, H:2 * H])
+                g = np.tanh(gates[:, 2 * H:3 * H])
+                o = _sigmoid(gates[:, 3 * H:])
+                c = f * c + i * g
+                h = o * np.tanh(c)
+                seq[:, t] = h
+            out = seq
+        return out
+
+
+class NumpyLSTMAE:
+    """``models.LSTMAE`` forward pass: encoder LSTM, repeated last output, decoder LSTM."""
+
+    def __init__(self, weights):
+        self.encoder = _NumpyLSTM(weights, "encoder")
+        self.decoder = _NumpyLSTM(weights, "decoder")
+
+    def reconstruct(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        out = self.encoder(x)
+        dec_in = np.repeat(out[:, -1:, :], x.shape[1], axis=1)
+        return self.decoder(dec_in)
+
+    def score(self, x: np.ndarray) -> np.ndarray:
+        """Per-sequence mean squared reconstruction error for a (B, T, F) array."""
+        x = np.asarray(x, dtype=np.float32)
+        return ((self.reconstruct(x) - x) ** 2).reshape(len(x), -1).mean(axis=1)
+
+
+def load_npz_model(path: str):
+    """Load weights written by ``export_npz`` into the matching NumPy model."""
+    with np.load(path) as data:
+        weights = {k: data[k] for k in data.files if k != "__arch__"}
+        arch = str(data["__arch__"])
+    if arch == "autoencoder":
+        return NumpyAutoencoder(weights)
+    if arch == "lstm_ae":
+        return NumpyLSTMAE(weights)
+    raise ValueError(f"Unknown architecture in {path}: {arch}")
+
+
+def main():
+    import torch
+    from ml_pipeline.export import load_weights
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--which", choices=["ae", "lstm"], default="ae")
+    p.add_argument("--weights", required=True, help="Trained state dict (.pt)")
+    p.add_argument("--seq-len", type=int, default=10, help="Sequence length of the parity check for --which lstm")
+    p.add_argument("--out", default=None, help="Output .npz (default: next to --weights)")
+    args = p.parse_args()
+
+    model, make_batch = load_weights(args.which, args.weights, args.seq_len)
+    out = args.out or os.path.splitext(args.weights)[0] + ".npz"
+    export_npz(model, out)
+
+    # Parity check of the NumPy forward pass against torch
+    x = make_batch(64)
+    with torch.no_grad():
+        ref = ((model(x) - x) ** 2).reshape(len(x), -1).mean(dim=1).numpy()
+    diff = float(np.abs(load_npz_model(out).score(x.numpy()) - ref).max())
+    print(f"Exported {out} (max score diff vs torch: {diff:.2e})")
+
+
+if __name__ == "__main__":
+    main()
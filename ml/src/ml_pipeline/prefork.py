@@ -0,0 +1,193 @@
+"""Prefork multi-process serving for the inference service.
+
+The master process loads the model once, moves its tensors to shared memory
+and forks N workers that all accept on one listening socket. Workers inherit
+the weights instead of loading their own copy, so memory stays flat as
+workers are added while CPU-bound forward passes run in parallel instead of
+serializing behind one GIL.
+
+Model updates are picked up by the master (mtime check, or ``SIGHUP``), which
+loads the new version and replaces workers one at a time; a retiring worker
+stops accepting, finishes its in-flight requests and exits.
+
+Threshold calibration state (``thresholds.ThresholdCalibrator``) is saved by
+each worker to its own file and merged by the master as workers exit.
+
+Usage:
+  python -m ml_pipeline.prefork --workers 4 --port 8080
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+from werkzeug.serving import make_server
+
+from ml_pipeline.scoring import TORCH_AVAILABLE
+
+if TORCH_AVAILABLE:
+    import torch
+
+
+def share_model_memory(model):
+    """Move a torch model's parameters/buffers to shared memory (no-op for other models).
+
+    NumPy weights (``.npz`` models) need nothing: forked workers share the
+    master's pages copy-on-write and never write to them.
+    """
+    if TORCH_AVAILABLE and isinstance(model, torch.nn.Module):
+        model.share_memory()
+    return model
+
+
+class PreforkServer:
+    """Master process managing forked WSGI workers.
+
+    Args:
+        app: WSGI application served by each worker
+        model_cache: ``scoring.ModelCache`` used by ``app``; loaded in the
+            master before forking, reloaded only by the master
+        workers: number of worker processes
+        threads_per_worker: torch intra-op threads per worker (default:
+            cores / workers, at least 1)
+        reload_interval: seconds between master checks of the model file
+        calibrator: ``thresholds.ThresholdCalibrator`` used by ``app``, whose
+            per-worker state files the master merges
+    """
+
+    def __init__(self, app, model_cache, host: str = "0.0.0.0", port: int = 8080, workers: int = 2,
+                 threads_per_worker: Optional[int] = None, reload_interval: float = 5.0, calibrator=None):
+        self.app = app
+        self.model_cache = model_cache
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.reload_interval = reload_interval
+        self.calibrator = calibrator
+        self.workers: Dict[int, bool] = {}  # pid -> retiring
+        self._sock = None
+        self._reload_requested = False
+        self._stopping = False
+
+    def serve(self):
+        self._sock = socket.create_server((self.host, self.port), backlog=2048)
+        self._sock.set_inheritable(True)
+        # Workers must never reload on their own: that would give each one a private copy
+        self.model_cache.check_interval = float("inf")
+        self._load_model()
+        self._collect()  # worker files left by a previous run
+
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+        for _ in range(self.num_workers):
+            self._spawn()
+        print(f"Prefork master {os.getpid()}: {self.num_workers} workers x {self.threads_per_worker} "
+              f"threads on {self.host}:{self.port}")
+
+        next_check = time.monotonic() + self.reload_interval
+        while not self._stopping:
+            self._reap()
+            if self._reload_requested or time.monotonic() >= next_check:
+                self._reload_requested = False
+                next_check = time.monotonic() + self.reload_interval
+                if self._load_model():
+                    self._roll_workers()
+            time.sleep(0.2)
+        self._shutdown()
+
+    def _load_model(self) -> bool:
+        changed = self.model_cache.check()
+        if changed:
+            share_model_memory(self.model_cache.get()[0])
+        return changed
+
+    def _collect(self):
+        if self.calibrator is not None:
+            try:
+                self.calibrator.collect(live=self.workers)
+            except (OSError, ValueError) as e:
+                print(f"Error merging worker threshold state: {e}")
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self._worker()
+            finally:
+                os._exit(0)
+        self.workers[pid] = False
+
+    def _worker(self):
+        for sig in (signal.SIGHUP, signal.SIGINT):
+            signal.signal(sig, signal.SIG_IGN)
+        if self.calibrator is not None:
+            self.calibrator.start_worker(peers=[pid for pid, retiring in self.workers.items() if not retiring])
+        if TORCH_AVAILABLE:
+            torch.set_num_threads(self.threads_per_worker)
+        server = make_server(self.host, self.port, self.app, threaded=True, fd=self._sock.fileno())
+        # Let server_close() wait for in-flight requests on graceful stop
+        server.daemon_threads = False
+        server.block_on_close = True
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+        server.serve_forever()
+        server.server_close()
+        if self.calibrator is not None:
+            self.calibrator.save()  # workers exit without running atexit handlers
+
+    def _roll_workers(self):
+        """Replace every current worker with one forked from the freshly loaded model."""
+        print(f"Model version {self.model_cache.version}: restarting workers")
+        for pid in [p for p, retiring in self.workers.items() if not retiring]:
+            self.workers[pid] = True
+            self._spawn()
+            os.kill(pid, signal.SIGTERM)
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            retiring = self.workers.pop(pid, True)
+            self._collect()
+            if not retiring and not self._stopping:
+                print(f"Worker {pid} exited unexpectedly (status {status}); respawning")
+                self._spawn()
+
+    def _shutdown(self):
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(self.workers):
+            os.waitpid(pid, 0)
+        self.workers.clear()
+        self._collect()
+        self._sock.close()
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--workers", type=int, default=int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1))))
+    p.add_argument("--threads-per-worker", type=int, default=None,
+                   help="torch intra-op threads per worker (default: cores / workers)")
+    p.add_argument("--reload-interval", type=float, default=float(os.getenv("MODEL_RELOAD_INTERVAL", "5")))
+    args = p.parse_args()
+
+    from ml_pipeline import inference
+
+    PreforkServer(
+        inference.app, inference.MODEL_CACHE, args.host, args.port, args.workers,
+        args.threads_per_worker, args.reload_interval, calibrator=inference.THRESHOLDS,
+    ).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Model loading and batch scoring shared by the inference service and window scorer.
+
+Supports ``.pt`` Autoencoder state dicts, TorchScript/ONNX artifacts from
+``ml_pipeline.export`` and torch-free ``.npz`` weights from
+``ml_pipeline.numpy_models``. Without a model, a normalized L2-norm heuristic
+is used.
+"""
+import hashlib
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except Exception:
+    TORCH_AVAILABLE = False
+
+from ml_pipeline.numpy_models import load_npz_model
+
+if TORCH_AVAILABLE:
+    from ml_pipeline.models import Autoencoder
+    from ml_pipeline.export import load_artifact
+else:
+    # Lightweight fallbacks when torch is not available in the runtime image
+    Autoencoder = None
+
+
+def _tensor(arr):
+    """Wrap ``arr`` without copying, including the read-only buffer of a binary bulk request."""
+    if arr.flags.writeable:
+        return torch.from_numpy(arr)
+    # Models never write to their input, so torch's warning about the read-only buffer is noise here
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+        return torch.from_numpy(arr)
+
+
+def autoencoder_dims(state):
+    """``Autoencoder`` constructor arguments recovered from a state dict's weight shapes."""
+    shapes = [state[k].shape for k in sorted(
+        (k for k in state if k.startswith("net.") and k.endswith(".weight")),
+        key=lambda k: int(k.split(".")[1]),
+    )]
+    # Encoder layers shrink towards the bottleneck; the decoder mirrors them
+    n_encoder = (len(shapes) + 1) // 2
+    return {"input_dim": shapes[0][1], "hidden_dims": [s[0] for s in shapes[:n_encoder]]}
+
+
+def lstm_ae_dims(state):
+    """``LSTMAE`` constructor arguments recovered from a state dict's weight shapes."""
+    return {
+        "input_dim": state["encoder.weight_ih_l0"].shape[1],
+        "hidden_dim": state["encoder.weight_hh_l0"].shape[1],
+        "num_layers": sum(1 for k in state if k.startswith("encoder.weight_ih_l")),
+    }
+
+
+def load_model(path):
+    """Load trained model."""
+    if not os.path.exists(path):
+        return None
+    if path.endswith(".npz"):
+        # Pure-NumPy forward pass from ml_pipeline.numpy_models (no torch needed)
+        return load_npz_model(path)
+    if not TORCH_AVAILABLE or Autoencoder is None:
+        print("Torch not available in inference image; skipping model load.")
+        return None
+    if path.endswith((".ts", ".onnx")):
+        # TorchScript / ONNX artifacts from ml_pipeline.export (possibly int8-quantized)
+        return load_artifact(path)
+    state = torch.load(path, map_location="cpu")
+    model = Autoencoder(**autoencoder_dims(state))
+    model.load_state_dict(state)
+    model.eval()
+    return model
+
+
+def model_version(path):
+    """Short content hash identifying a model file (None if it does not exist)."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+class ModelCache:
+    """Keeps one loaded model per worker process and hot-swaps it on change.
+
+    The model file's mtime/size is checked at most every ``check_interval``
+    seconds; a missing file keeps the current model. While no model has been
+    loaded yet, callers arriving during a load wait for it instead of scoring
+    without a model. Otherwise a changed file is loaded by whichever caller
+    notices first while the others keep using the current model; the new
+    (model, version) pair then replaces the old one in a single reference
+    assignment, so in-flight requests finish on the model they started with.
+    If the file is missing or loading fails (e.g. the trainer is still
+    writing the file) the old model stays, or callers fall back to the
+    heuristic if there is none, and the file is checked again after the
+    interval.
+    """
+
+    def __init__(self, path, loader=load_model, check_interval=5.0):
+        self.path = path
+        self.loader = loader
+        self.check_interval = check_interval
+        self._entry = (None, None)  # (model, version)
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the current ``(model, version)`` pair, reloading if needed."""
+        if time.monotonic() >= self._next_check:
+            # Before the first model, wait for a load in progress rather than score without it
+            self._refresh(wait=self._stamp is None)
+        return self._entry
+
+    @property
+    def version(self):
+        return self._entry[1]
+
+    def check(self) -> bool:
+        """Check the model file now; returns True if a new version was swapped in."""
+        return self._refresh(wait=True, force=True)
+
+    def _refresh(self, wait=False, force=False) -> bool:
+        if not self._lock.acquire(blocking=wait):
+            return False  # another request is already reloading
+        try:
+            if not force and time.monotonic() < self._next_check:
+                return False  # checked by the caller we waited for
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                # Keep serving the current model (or the heuristic) until a file appears
+                self._next_check = time.monotonic() + self.check_interval
+                return False
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == self._stamp:
+                self._next_check = time.monotonic() + self.check_interval
+                return False
+            try:
+                model = self.loader(self.path)
+                version = model_version(self.path)
+            except Exception as e:
+                print(f"Error loading model from {self.path}: {e}")
+                # Retry after the interval, not on every request while the file is being written
+                self._next_check = time.monotonic() + self.check_interval
+                return False
+            self._entry = (model, version)
+            self._stamp = stamp
+            self._next_check = time.monotonic() + self.check_interval
+            print(f"Loaded model version {version} from {self.path}")
+            return True
+        finally:
+            self._lock.release()
+
+
+def score_batch(model, features):
+    """Compute anomaly scores (per-row reconstruction error) for a (B, F) matrix."""
+    # If model is available use reconstruction error; otherwise use a simple heuristic
+    arr = np.asarray(features, dtype=np.float32)
+    if hasattr(model, "score"):
+        return model.score(arr)
+    if model is not None and TORCH_AVAILABLE:
+        with torch.no_grad():
+            x = _tensor(arr)
+            recon = model(x)
+            return ((recon - x) ** 2).mean(dim=1).numpy()
+    else:
+        # Heuristic anomaly score: normalized L2 norm of features
+        return np.linalg.norm(arr, axis=1) / (np.sqrt(arr.shape[1]) + 1e-6)
+
+
+def feature_errors(model, features):
+    """Per-feature squared reconstruction error, same shape as ``features``.
+
+    Without a model, the squared features themselves (the heuristic score is
+    their normalized L2 norm).
+    """
+    arr = np.asarray(features, dtype=np.float32)
+    if hasattr(model, "reconstruct"):
+        return (model.reconstruct(arr) - arr) ** 2
+    if model is not None and TORCH_AVAILABLE:
+        with torch.no_grad():
+            x = _tensor(arr)
+            return ((model(x) - x) ** 2).numpy()
+    return arr ** 2
+
+
+def score_window(model, window_features):
+    """Compute anomaly score (reconstruction error)."""
+    return float(score_batch(model, np.asarray(window_features, dtype=np.float32)[None, :])[0])
@@ -0,0 +1,113 @@
+"""Reader for the shared-memory window ring written by ``graph_builder.shm_ring``.
+
+Maps the ring read-only; each published window's node and edge tables are
+Arrow views straight into the shared pages, with no copy and no Parquet
+decode. See ``graph_builder.shm_ring`` for the layout (keep in sync).
+
+A window's tables stay valid only until the writer laps the ring and reuses
+its slot; ``RingReader.still_valid`` tells whether that happened while the
+window was being processed.
+"""
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from typing import List
+
+import pyarrow as pa
+
+MAGIC = b"ZDWRING1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QQQqd")
+SLOT_HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 24
+
+
+@dataclass
+class RingWindow:
+    seq: int
+    window_start: int
+    published: float
+    nodes: pa.Table
+    edges: pa.Table
+
+    @property
+    def name(self) -> str:
+        return f"window_{self.window_start}"
+
+
+class RingReader:
+    """Consumes windows from a ring file, oldest unseen first.
+
+    On open, windows still held by the ring are replayed. Windows overwritten
+    before they were read are counted in ``missed``. A restarted writer
+    creates a new ring file, which the reader switches to.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.missed = 0
+        self._open()
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            self._inode = os.fstat(f.fileno()).st_ino
+            # Old mappings are left to the GC: tables handed out may still reference them
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.num_slots, self.slot_size, write_seq = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} window ring")
+        self._view = memoryview(self._mm)
+        self.last_seq = max(0, write_seq - self.num_slots)
+
+    def _replaced(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return False
+
+    def write_seq(self) -> int:
+        return struct.unpack_from("<Q", self._mm, WRITE_SEQ_OFFSET)[0]
+
+    def _slot(self, seq: int) -> int:
+        return HEADER_SIZE + (seq % self.num_slots) * self.slot_size
+
+    def still_valid(self, window: RingWindow) -> bool:
+        """Whether the window's slot has not been reused since it was read."""
+        return struct.unpack_from("<Q", self._mm, self._slot(window.seq))[0] == window.seq
+
+    def read(self) -> List[RingWindow]:
+        """Windows published since the last call (without waiting)."""
+        if self._replaced():
+            self._open()
+        windows = []
+        head = self.write_seq()
+        for seq in range(self.last_seq + 1, head + 1):
+            base = self._slot(seq)
+            slot_seq, nodes_len, edges_len, window_start, published = SLOT_HEADER.unpack_from(self._mm, base)
+            if slot_seq != seq:
+                self.missed += 1  # overwritten (or being rewritten) before we got to it
+                continue
+            start = base + SLOT_HEADER_SIZE
+            nodes = pa.ipc.open_stream(pa.py_buffer(self._view[start:start + nodes_len])).read_all()
+            start += nodes_len
+            edges = pa.ipc.open_stream(pa.py_buffer(self._view[start:start + edges_len])).read_all()
+            window = RingWindow(seq, window_start, published, nodes, edges)
+            if self.still_valid(window):
+                windows.append(window)
+            else:
+                self.missed += 1
+        self.last_seq = max(self.last_seq, head)
+        return windows
+
+    def poll(self, timeout: float, interval: float = 0.001) -> List[RingWindow]:
+        """Wait up to ``timeout`` seconds for new windows."""
+        deadline = time.monotonic() + timeout
+        while self.write_seq() == self.last_seq and time.monotonic() < deadline:
+            if self._replaced():
+                break
+            time.sleep(interval)
+        return self.read()
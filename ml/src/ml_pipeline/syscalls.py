@@ -0,0 +1,204 @@
+"""Syscall vocabulary and tokenized sequence store for the DeepLog models.
+
+A vocabulary is a JSON file ``{"tokens": ["<unk>", "read", "write", ...]}``;
+a syscall's token id is its position in the list and syscalls missing from
+it map to ``<unk>`` (id 0).
+
+``build_store`` tokenizes eBPF syscall JSONL in one streaming pass into a
+store directory:
+
+- ``tokens.u16``: every token as one flat little-endian ``uint16`` array
+- ``offsets.npy``: ``int64`` start of each sequence (plus the end)
+- ``keys.json``: the ``[pod, pid]`` of each sequence
+- ``vocab.json``: the vocabulary, capped to the most frequent syscalls
+
+Each process's syscalls are laid out contiguously; when the per-process
+buffers exceed ``buffer_tokens`` they are flushed, so a long-running process
+may span several sequences. ``TokenStore`` memory-maps the result and hands
+out sequences as zero-copy views.
+
+Usage:
+  python -m ml_pipeline.syscalls --events syscalls-*.jsonl --out syscall-store/ [--max-vocab 512]
+"""
+import argparse
+import json
+import os
+from array import array
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+UNK = "<unk>"
+
+
+class SyscallVocab:
+    def __init__(self, tokens: Iterable[str]):
+        tokens = list(tokens)
+        if not tokens or tokens[0] != UNK:
+            tokens = [UNK] + [t for t in tokens if t != UNK]
+        self.tokens: List[str] = tokens
+        self.index = {t: i for i, t in enumerate(tokens)}
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def encode(self, syscall: str) -> int:
+        return self.index.get(syscall, 0)
+
+    def decode(self, token: int) -> str:
+        return self.tokens[token]
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"tokens": self.tokens}, f, indent=1)
+
+    @classmethod
+    def load(cls, path: str) -> "SyscallVocab":
+        with open(path) as f:
+            return cls(json.load(f)["tokens"])
+
+
+MAX_TOKENS = np.iinfo(np.uint16).max + 1
+
+
+def _events(paths):
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_store(paths, out_dir: str, max_vocab: int = 512, min_count: int = 1,
+                vocab: Optional[SyscallVocab] = None, buffer_tokens: int = 1 << 26) -> "TokenStore":
+    """Tokenize syscall JSONL files into a store in ``out_dir`` in one pass.
+
+    Without ``vocab``, syscalls get provisional ids in order of first
+    appearance while their frequencies are counted; the vocabulary (the
+    ``max_vocab - 1`` most frequent syscalls seen ``min_count`` times, plus
+    ``<unk>``) is chosen at the end and the token file is remapped in place.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ids = dict(vocab.index) if vocab is not None else {UNK: 0}
+    counts = Counter()
+    pending = {}  # (pod, pid) -> array of token ids not yet written
+    buffered = 0
+    offsets, keys = [0], []
+    token_path = os.path.join(out_dir, "tokens.u16")
+    with open(token_path, "wb") as out:
+        def flush():
+            for key, tokens in pending.items():
+                tokens.tofile(out)
+                offsets.append(offsets[-1] + len(tokens))
+                keys.append(list(key))
+            pending.clear()
+
+        for event in _events(paths):
+            name = event.get("syscall")
+            token = ids.get(name)
+            if token is None:
+                if vocab is not None or len(ids) >= MAX_TOKENS:
+                    token = 0
+                else:
+                    token = ids[name] = len(ids)
+            counts[token] += 1
+            key = (event.get("pod"), event.get("pid"))
+            tokens = pending.get(key)
+            if tokens is None:
+                tokens = pending[key] = array("H")
+            tokens.append(token)
+            buffered += 1
+            if buffered >= buffer_tokens:
+                flush()
+                buffered = 0
+        flush()
+
+    if vocab is None:
+        names = {i: n for n, i in ids.items()}
+        frequent = [i for i, c in counts.most_common() if i != 0 and c >= min_count][:max_vocab - 1]
+        vocab = SyscallVocab([names[i] for i in frequent])
+        remap = np.zeros(len(ids), dtype=np.uint16)
+        remap[frequent] = np.arange(1, len(frequent) + 1)
+        if offsets[-1]:
+            tokens = np.memmap(token_path, dtype="<u2", mode="r+")
+            for start in range(0, len(tokens), 1 << 24):
+                chunk = tokens[start:start + (1 << 24)]
+                chunk[:] = remap[chunk]
+            tokens.flush()
+            del tokens
+
+    np.save(os.path.join(out_dir, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(out_dir, "keys.json"), "w") as f:
+        json.dump(keys, f)
+    vocab.save(os.path.join(out_dir, "vocab.json"))
+    return TokenStore(out_dir)
+
+
+class TokenStore:
+    """Read-only view of a ``build_store`` directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        token_path = os.path.join(path, "tokens.u16")
+        # np.memmap cannot map an empty file
+        self.tokens = (np.memmap(token_path, dtype="<u2", mode="r") if self.offsets[-1]
+                       else np.zeros(0, dtype="<u2"))
+        with open(os.path.join(path, "keys.json")) as f:
+            self.keys = [tuple(k) for k in json.load(f)]
+        self.vocab = SyscallVocab.load(os.path.join(path, "vocab.json"))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """Token ids of sequence ``i`` (a view into the mapped file)."""
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    @property
+    def num_tokens(self) -> int:
+        return int(self.offsets[-1])
+
+
+class DeepLogWindows:
+    """Map-style dataset of ``window``-token slices of the store's sequences.
+
+    An item is ``(tokens, next_tokens)``: every position's following syscall
+    is its next-token target. Items are located by binary search over per-sequence window counts, so
+    no index of window positions is materialized.
+    """
+
+    def __init__(self, store: TokenStore, window: int = 10):
+        self.store = store
+        self.window = window
+        lengths = np.diff(store.offsets)
+        self._cum = np.cumsum(np.maximum(lengths - window, 0))
+
+    def __len__(self):
+        return int(self._cum[-1]) if len(self._cum) else 0
+
+    def __getitem__(self, i):
+        import torch
+
+        seq = int(np.searchsorted(self._cum, i, side="right"))
+        start = self.store.offsets[seq] + i - (self._cum[seq - 1] if seq else 0)
+        tokens = torch.from_numpy(self.store.tokens[start:start + self.window + 1].astype(np.int64))
+        return tokens[:-1], tokens[1:]
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--events", nargs="+", required=True, help="eBPF syscall JSONL files")
+    p.add_argument("--out", required=True, help="Store directory")
+    p.add_argument("--max-vocab", type=int, default=512, help="Vocabulary size including <unk>")
+    p.add_argument("--min-count", type=int, default=1)
+    p.add_argument("--vocab", default=None, help="Tokenize with an existing vocabulary (e.g. the training one)")
+    args = p.parse_args()
+    vocab = SyscallVocab.load(args.vocab) if args.vocab else None
+    store = build_store(args.events, args.out, args.max_vocab, args.min_count, vocab)
+    print(f"{store.num_tokens} syscalls in {len(store)} sequences, vocabulary of {len(store.vocab)} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,30 +7,50 @@ Output: anomaly scores per node.
 
 import torch
 import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
 from torch_geometric.nn import GraphSAGE, GATConv, global_mean_pool
 from torch_geometric.data import Data, DataLoader
 import pandas as pd
 import numpy as np
+import os
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
+
+from ml_pipeline.feature_store import CACHE_DIRNAME, open_table
+
+# GraphSAGE depth of the TGNN encoder (one neighbor fan-out per layer)
+ENCODER_LAYERS = 2
 
 
 class TemporalGraphEncoder(nn.Module):
-    """Spatial encoder: applies GraphSAGE/GAT over graph snapshots."""
+    """Spatial encoder: applies GraphSAGE/GAT over graph snapshots.
+
+    With ``checkpoint_activations`` the GraphSAGE activations are recomputed
+    during backward instead of being kept alive for every window.
+    """
     
-    def __init__(self, in_channels: int, hidden_channels: int, num_layers: int = 2):
+    def __init__(self, in_channels: int, hidden_channels: int, num_layers: int = 2,
+                 checkpoint_activations: bool = False):
         super().__init__()
         self.sage_layers = nn.ModuleList()
         self.sage_layers.append(GraphSAGE(in_channels, hidden_channels, num_layers=num_layers))
         self.hidden_channels = hidden_channels
+        self.checkpoint_activations = checkpoint_activations
 
     def forward(self, x, edge_index, batch=None):
         # x: (N, in_channels) node features
         # edge_index: (2, E) edge indices
         # batch: (N,) batch assignment
+        if self.checkpoint_activations and self.training and torch.is_grad_enabled():
+            return checkpoint(self.sage_layers[0], x, edge_index, use_reentrant=False)
         h = self.sage_layers[0](x, edge_index)  # (N, hidden)
         return h
 
+    @property
+    def num_layers(self) -> int:
+        """Number of message-passing hops (one neighbor fan-out per hop)."""
+        return self.sage_layers[0].num_layers
+
 
 class TemporalAggregator(nn.Module):
     """Temporal aggregator: LSTM over node embeddings across time windows."""
@@ -40,23 +60,28 @@ class TemporalAggregator(nn.Module):
         self.lstm = nn.LSTM(hidden_channels, lstm_hidden, num_layers, batch_first=True)
         self.lstm_hidden = lstm_hidden
 
-    def forward(self, embeddings_seq):
+    def forward(self, embeddings_seq, state=None, return_state: bool = False):
         # embeddings_seq: (T, N, hidden) time-windowed node embeddings
+        # state: optional (h, c) carried over from a previous chunk of windows
         # Process each node across time
         T, N, H = embeddings_seq.shape
-        embeddings_seq = embeddings_seq.view(T, N, H)
-        
-        # Simple temporal aggregation: mean over windows (can be expanded to LSTM)
-        temporal_emb = embeddings_seq.mean(dim=0)  # (N, H)
+        # LSTM runs per node, so nodes are the batch dimension: (N, T, H)
+        _, (h, c) = self.lstm(embeddings_seq.transpose(0, 1), state)
+        temporal_emb = h[-1]  # (N, lstm_hidden)
+        if return_state:
+            return temporal_emb, (h, c)
         return temporal_emb
 
 
 class TGNN(nn.Module):
     """Temporal Graph Neural Network for anomaly detection."""
     
-    def __init__(self, in_channels: int, hidden_channels: int = 64, lstm_hidden: int = 32):
+    def __init__(self, in_channels: int, hidden_channels: int = 64, lstm_hidden: int = 32,
+                 checkpoint_activations: bool = False):
         super().__init__()
-        self.encoder = TemporalGraphEncoder(in_channels, hidden_channels, num_layers=2)
+        self.encoder = TemporalGraphEncoder(
+            in_channels, hidden_channels, num_layers=ENCODER_LAYERS, checkpoint_activations=checkpoint_activations
+        )
         self.temporal_agg = TemporalAggregator(hidden_channels, lstm_hidden)
         self.decoder = nn.Sequential(
             nn.Linear(lstm_hidden, 32),
@@ -64,70 +89,451 @@ class TGNN(nn.Module):
             nn.Linear(32, in_channels)
         )
 
-    def forward(self, graphs: List[Data]):
+    def forward(self, graphs: List[Data], num_nodes: Optional[int] = None,
+                state=None, return_state: bool = False):
         """
         Args:
-            graphs: list of Data objects (one per time window)
+            graphs: list of Data objects (one per time window). Windows may
+                carry a ``global_id`` tensor aligning their rows to a shared
+                node index; rows with ``global_id == -1`` only provide context
+                for message passing (e.g. sampled neighbors).
+            num_nodes: size of the shared node index (inferred if omitted)
+            state: LSTM (h, c) from the previous chunk of windows, if any
+            return_state: also return the LSTM state after the last window
         Returns:
             reconstructed node features (for reconstruction loss)
         """
+        if num_nodes is None:
+            num_nodes = count_global_nodes(graphs)
         embeddings_seq = []
         for g in graphs:
             h = self.encoder(g.x, g.edge_index)
-            embeddings_seq.append(h)
+            embeddings_seq.append(scatter_to_global(h, g, num_nodes))
         
         embeddings_seq = torch.stack(embeddings_seq)  # (T, N, H)
-        temporal_emb = self.temporal_agg(embeddings_seq)  # (N, lstm_hidden)
+        temporal_emb, state = self.temporal_agg(embeddings_seq, state, return_state=True)  # (N, lstm_hidden)
         reconstructed = self.decoder(temporal_emb)  # (N, in_channels)
-        
-        # Return reconstruction of initial node features for loss computation
-        initial_features = graphs[0].x if graphs else torch.zeros_like(temporal_emb)
+        if return_state:
+            return reconstructed, temporal_emb, state
         return reconstructed, temporal_emb
 
 
-def load_parquet_graphs(parquet_dir: str) -> List[Data]:
-    """Load time-windowed node/edge Parquet files and convert to PyG Data objects."""
+def _global_ids(g: Data) -> torch.Tensor:
+    global_id = getattr(g, "global_id", None)
+    if global_id is None:
+        return torch.arange(g.num_nodes, device=g.x.device)
+    return global_id
+
+
+def count_global_nodes(graphs: List[Data]) -> int:
+    """Size of the node index shared by a list of windows."""
+    return max((int(_global_ids(g).max()) + 1 for g in graphs if g.num_nodes), default=0)
+
+
+def scatter_to_global(values: torch.Tensor, g: Data, num_nodes: int) -> torch.Tensor:
+    """Place per-window rows at their shared node index; absent nodes stay zero."""
+    global_id = _global_ids(g)
+    mask = global_id >= 0
+    out = values.new_zeros((num_nodes, values.size(1)))
+    out[global_id[mask]] = values[mask]
+    return out
+
+
+def _feature_sums(graphs: List[Data], num_nodes: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    total = graphs[0].x.new_zeros((num_nodes, graphs[0].x.size(1)))
+    count = graphs[0].x.new_zeros((num_nodes, 1))
+    for g in graphs:
+        total += scatter_to_global(g.x, g, num_nodes)
+        count += scatter_to_global(torch.ones_like(g.x[:, :1]), g, num_nodes)
+    return total, count
+
+
+def temporal_target(graphs: List[Data], num_nodes: int) -> torch.Tensor:
+    """Per-node mean of input features over the windows the node appears in."""
+    total, count = _feature_sums(graphs, num_nodes)
+    return total / count.clamp(min=1)
+
+
+def _build_csr(edge_index: torch.Tensor, num_nodes: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """CSR over incoming edges: ``col[rowptr[i]:rowptr[i+1]]`` are sources of i."""
+    src, dst = edge_index
+    order = torch.argsort(dst)
+    deg = torch.bincount(dst, minlength=num_nodes)
+    rowptr = torch.zeros(num_nodes + 1, dtype=torch.long)
+    rowptr[1:] = torch.cumsum(deg, dim=0)
+    return rowptr, src[order]
+
+
+def _sample_neighbors(rowptr: torch.Tensor, col: torch.Tensor, nodes: torch.Tensor, fanout: int):
+    """Sample up to ``fanout`` in-neighbors per node (all of them if fanout < 0).
+
+    Nodes with more than ``fanout`` neighbors are sampled with replacement, so
+    work and output size are O(len(nodes) * fanout) regardless of node degree.
+    """
+    start = rowptr[nodes]
+    deg = rowptr[nodes + 1] - start
+    counts = deg if fanout < 0 else deg.clamp(max=fanout)
+    target = torch.repeat_interleave(torch.arange(len(nodes)), counts)
+    first = torch.cumsum(counts, dim=0) - counts
+    slot = torch.arange(len(target)) - first[target]
+    if fanout >= 0:
+        over = deg[target] > fanout
+        slot[over] = (torch.rand(int(over.sum())) * deg[target][over]).long()
+    return col[start[target] + slot], nodes[target]
+
+
+class TemporalNeighborLoader:
+    """Neighbor-sampled mini-batches over a sequence of aligned graph windows.
+
+    Works like PyG's ``NeighborLoader``, but seed nodes are drawn from the node
+    index shared by all windows and the same seeds are sampled in every window,
+    so the temporal aggregator sees one consistent node set per step. Each
+    yielded item is a list of per-window subgraphs whose ``global_id`` maps the
+    seeds to ``0..len(seeds)-1`` (context neighbors get -1), plus the seeds'
+    shared node ids. Memory per step is bounded by
+    ``batch_size * prod(1 + fanout)`` nodes per window, independent of graph size.
+
+    With ``world_size > 1`` each rank draws its seeds from its own slice of the
+    node index (padded so that all ranks run the same number of steps); call
+    ``set_epoch`` to reshuffle.
+    """
+
+    def __init__(
+        self,
+        graphs: List[Data],
+        num_neighbors: Sequence[int],
+        batch_size: int = 512,
+        shuffle: bool = False,
+        num_workers: int = 0,
+        rank: int = 0,
+        world_size: int = 1,
+    ):
+        self.graphs = graphs
+        self.num_neighbors = list(num_neighbors)
+        self.num_nodes = count_global_nodes(graphs)
+        self._csr = [_build_csr(g.edge_index, g.num_nodes) for g in graphs]
+        # Shared node id -> row in each window (-1 when the node is absent)
+        self._local = []
+        for g in graphs:
+            local = torch.full((self.num_nodes,), -1, dtype=torch.long)
+            local[_global_ids(g)] = torch.arange(g.num_nodes)
+            self._local.append(local)
+        self._sampler = None
+        if world_size > 1:
+            self._sampler = torch.utils.data.distributed.DistributedSampler(
+                range(self.num_nodes), num_replicas=world_size, rank=rank, shuffle=shuffle
+            )
+        self._loader = torch.utils.data.DataLoader(
+            range(self.num_nodes),
+            batch_size=batch_size,
+            shuffle=shuffle and self._sampler is None,
+            sampler=self._sampler,
+            num_workers=num_workers,
+            collate_fn=self._collate,
+        )
+
+    def set_epoch(self, epoch: int):
+        if self._sampler is not None:
+            self._sampler.set_epoch(epoch)
+
+    def __len__(self):
+        return len(self._loader)
+
+    def __iter__(self):
+        return iter(self._loader)
+
+    def _collate(self, seeds: List[int]) -> Tuple[List[Data], torch.Tensor]:
+        seeds = torch.tensor(seeds, dtype=torch.long)
+        subgraphs = [
+            self._sample_window(g, csr, local, seeds)
+            for g, csr, local in zip(self.graphs, self._csr, self._local)
+        ]
+        return subgraphs, seeds
+
+    def _sample_window(self, g: Data, csr, local: torch.Tensor, seeds: torch.Tensor) -> Data:
+        rowptr, col = csr
+        local_seeds = local[seeds]
+        present = local_seeds >= 0
+        frontier = local_seeds[present]
+        nodes, srcs, dsts = [frontier], [], []
+        for fanout in self.num_neighbors:
+            if len(frontier) == 0:
+                break
+            src, dst = _sample_neighbors(rowptr, col, frontier, fanout)
+            srcs.append(src)
+            dsts.append(dst)
+            seen = torch.cat(nodes)
+            frontier = torch.unique(src)
+            frontier = frontier[~torch.isin(frontier, seen)]
+            nodes.append(frontier)
+
+        n_id = torch.unique(torch.cat(nodes))
+        if srcs:
+            edge_index = torch.stack([
+                torch.searchsorted(n_id, torch.cat(srcs)),
+                torch.searchsorted(n_id, torch.cat(dsts)),
+            ])
+        else:
+            edge_index = torch.zeros((2, 0), dtype=torch.long)
+        global_id = torch.full((len(n_id),), -1, dtype=torch.long)
+        global_id[torch.searchsorted(n_id, local_seeds[present])] = torch.nonzero(present).view(-1)
+        return Data(x=g.x[n_id], edge_index=edge_index, global_id=global_id)
+
+
+def load_parquet_graphs(parquet_dir: str, cache_dir: Optional[str] = None) -> List[Data]:
+    """Load time-windowed node/edge Parquet files and convert to PyG Data objects.
+
+    Every window gets a ``global_id`` tensor mapping its rows onto a node index
+    shared across windows (in order of first appearance), so node sets may
+    differ from one window to the next.
+
+    The files are read through ``ml_pipeline.feature_store`` caches in
+    ``cache_dir`` (default ``<parquet_dir>/.feature_store``), so only new
+    windows (or a rewritten window and the ones after it) are parsed; edges
+    are mapped onto node indices with array lookups on the stores' string
+    codes.
+    """
     path = Path(parquet_dir)
+    cache_dir = cache_dir or str(path / CACHE_DIRNAME)
     graphs = []
-    
+
     # Sort files by window timestamp
     node_files = sorted(path.glob("window_*.nodes.parquet"))
     edge_files = sorted(path.glob("window_*.edges.parquet"))
-    
+    if not node_files:
+        return graphs
+    nodes = open_table(node_files, os.path.join(cache_dir, "nodes"))
+    edges = open_table(edge_files, os.path.join(cache_dir, "edges"))
+    node_spans = {p: (s, e) for p, s, e in nodes.spans}
+    edge_spans = {p: (s, e) for p, s, e in edges.spans}
+
+    # Node-id codes are assigned in order of first appearance: they are the global ids
+    node_names = np.array(nodes.categories.get("node_id", []), dtype=object)
+    node_codes = nodes.codes.get("node_id", np.zeros(0, dtype=np.int32))
+    known = pd.Index(node_names)
+    # Edge endpoint code -> node code (-1: not a node; the trailing -1 is for missing endpoints)
+    endpoint_lookup = {
+        col: np.append(known.get_indexer(pd.Index(edges.categories[col])), -1) if col in edges.codes else None
+        for col in ("src", "dst")
+    }
+    local = np.full(len(node_names), -1, dtype=np.int64)  # node code -> row in the current window
+    feature_cols = ['bytes', 'outgoing_unique_dst_count', 'flow_count']
+
     for node_file, edge_file in zip(node_files, edge_files):
-        nodes_df = pd.read_parquet(node_file)
-        edges_df = pd.read_parquet(edge_file)
-        
-        # Create node features
-        feature_cols = ['bytes', 'outgoing_unique_dst_count', 'flow_count']
-        x = torch.tensor(nodes_df[feature_cols].values, dtype=torch.float32)
-        
+        start, end = node_spans[os.path.abspath(node_file)]
+        # Create node features (column-major, as the columns are stored, which fixes the normalization's
+        # reduction order)
+        x = torch.tensor(np.asfortranarray(np.stack([nodes.column(c, start, end) for c in feature_cols], axis=1)),
+                         dtype=torch.float32)
+
         # Normalize features
         x = (x - x.mean(dim=0)) / (x.std(dim=0) + 1e-6)
-        
+
         # Create edge index (map node names to indices)
-        node_map = {name: idx for idx, name in enumerate(nodes_df['node_id'])}
-        edge_list = []
-        for _, row in edges_df.iterrows():
-            src_idx = node_map.get(row['src'], -1)
-            dst_idx = node_map.get(row['dst'], -1)
-            if src_idx >= 0 and dst_idx >= 0:
-                edge_list.append([src_idx, dst_idx])
-        
-        if edge_list:
-            edge_index = torch.tensor(edge_list, dtype=torch.long).t()
+        codes = np.asarray(node_codes[start:end], dtype=np.int64)
+        local[codes] = np.arange(len(codes))
+        estart, eend = edge_spans.get(os.path.abspath(edge_file), (0, 0))
+        if eend > estart and all(lookup is not None for lookup in endpoint_lookup.values()):
+            src, dst = (endpoint_lookup[col][edges.codes[col][estart:eend]] for col in ("src", "dst"))
+            src_idx = np.where(src >= 0, local[src], -1)
+            dst_idx = np.where(dst >= 0, local[dst], -1)
+            keep = (src_idx >= 0) & (dst_idx >= 0)
+            edge_index = torch.from_numpy(np.stack([src_idx[keep], dst_idx[keep]]))
         else:
             edge_index = torch.zeros((2, 0), dtype=torch.long)
-        
-        data = Data(x=x, edge_index=edge_index)
+        local[codes] = -1
+
+        global_id = torch.from_numpy(codes.copy())
+        data = Data(x=x, edge_index=edge_index, global_id=global_id)
+        data.node_id = node_names[codes].tolist()
         graphs.append(data)
-    
+
     return graphs
 
 
-def train_tgnn(parquet_dir: str, output_dir: str, epochs: int = 10):
-    """Train TGNN on Parquet graph windows."""
+class _TGNNHead(nn.Module):
+    """Temporal aggregator + decoder, split out so it can be traced on dense (T, N, H) input."""
+
+    def __init__(self, model: TGNN):
+        super().__init__()
+        self.temporal_agg = model.temporal_agg
+        self.decoder = model.decoder
+
+    def forward(self, embeddings_seq):
+        temporal_emb = self.temporal_agg(embeddings_seq)
+        return self.decoder(temporal_emb), temporal_emb
+
+
+class ExportedTGNN:
+    """TorchScript TGNN (encoder + head artifacts) with the eager ``TGNN`` call signature."""
+
+    def __init__(self, encoder, head):
+        self.encoder = encoder
+        self.head = head
+
+    def __call__(self, graphs: List[Data], num_nodes: Optional[int] = None):
+        if num_nodes is None:
+            num_nodes = count_global_nodes(graphs)
+        embeddings_seq = torch.stack([
+            scatter_to_global(self.encoder(g.x, g.edge_index), g, num_nodes) for g in graphs
+        ])
+        return self.head(embeddings_seq)
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+
+def export_tgnn(model: TGNN, graphs: List[Data], output_dir: str, quantized: bool = False) -> str:
+    """Trace the TGNN into ``tgnn_encoder.ts``/``tgnn_head.ts`` under ``output_dir``.
+
+    With ``quantized`` the head's LSTM/Linear layers get dynamic int8
+    quantization (the GraphSAGE encoder stays float32). The artifacts are
+    written to temporary files and only moved into place once the exported
+    model's scores match the eager model's on ``graphs``.
+    """
+    import os
+    from ml_pipeline.export import quantize
+
+    model = model.cpu().eval()
+    graphs = [g.cpu() for g in graphs]
+    num_nodes = count_global_nodes(graphs)
+    head = _TGNNHead(model)
+    if quantized:
+        head = quantize(head)
+    with torch.no_grad():
+        encoder = torch.jit.trace(model.encoder, (graphs[0].x, graphs[0].edge_index))
+        example_seq = torch.stack([scatter_to_global(model.encoder(g.x, g.edge_index), g, num_nodes) for g in graphs])
+        head = torch.jit.trace(head, example_seq)
+    paths = {name: os.path.join(output_dir, f"tgnn_{name}.ts") for name in ("encoder", "head")}
+    tmp_paths = {name: f"{path[:-3]}.tmp-{os.getpid()}.ts" for name, path in paths.items()}
+    try:
+        encoder.save(tmp_paths["encoder"])
+        head.save(tmp_paths["head"])
+        exported = ExportedTGNN(torch.jit.load(tmp_paths["encoder"], map_location="cpu"),
+                                torch.jit.load(tmp_paths["head"], map_location="cpu"))
+        with torch.no_grad():
+            target = temporal_target(graphs, num_nodes)
+            ref = (model(graphs)[0] - target).abs().mean(dim=1)
+            got = (exported(graphs)[0] - target).abs().mean(dim=1)
+        diff = float((ref - got).abs().max())
+        if diff > 1e-3 + 0.05 * float(ref.abs().max()):
+            raise AssertionError(f"Score parity check failed: max abs diff {diff:.6g}")
+        for name in ("encoder", "head"):
+            os.replace(tmp_paths[name], paths[name])
+    finally:
+        for path in tmp_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+    print(f"Exported TGNN to {output_dir} (max score diff vs eager: {diff:.2e})")
+    return output_dir
+
+
+def load_exported_tgnn(output_dir: str) -> ExportedTGNN:
+    import os
+    return ExportedTGNN(
+        torch.jit.load(os.path.join(output_dir, "tgnn_encoder.ts"), map_location="cpu"),
+        torch.jit.load(os.path.join(output_dir, "tgnn_head.ts"), map_location="cpu"),
+    )
+
+
+def global_node_names(graphs: List[Data]) -> List[str]:
+    """Node names in shared-index order for windows from ``load_parquet_graphs``."""
+    names = [None] * count_global_nodes(graphs)
+    for g in graphs:
+        for gid, name in zip(g.global_id.tolist(), g.node_id):
+            names[gid] = name
+    return names
+
+
+def tbptt_step(model: TGNN, graphs: List[Data], num_nodes: int, optimizer, criterion,
+               bptt_chunk: Optional[int] = None) -> float:
+    """One optimisation pass over a window sequence with truncated BPTT.
+
+    Windows are processed ``bptt_chunk`` at a time; after each chunk the loss
+    against the running per-node feature mean is backpropagated, the optimizer
+    steps, and the LSTM state is detached before being carried into the next
+    chunk. Only one chunk's activations are alive at once. The loss of the last
+    chunk is the full-sequence objective and is returned.
+    """
+    chunk = bptt_chunk or len(graphs)
+    state = None
+    total = count = None
+    for start in range(0, len(graphs), chunk):
+        windows = graphs[start:start + chunk]
+        recon, _, state = model(windows, num_nodes=num_nodes, state=state, return_state=True)
+
+        # Reconstruction target: mean of node features over the windows seen so far
+        chunk_total, chunk_count = _feature_sums(windows, num_nodes)
+        total = chunk_total if total is None else total + chunk_total
+        count = chunk_count if count is None else count + chunk_count
+        loss = criterion(recon, total / count.clamp(min=1))
+
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        state = tuple(s.detach() for s in state)
+    return loss.item()
+
+
+def _window_batches(graphs: List[Data], device, loader: Optional[TemporalNeighborLoader] = None):
+    """(windows, seed global ids) steps: the full graphs at once, or the loader's sampled mini-batches."""
+    if loader is None:
+        return [([g.to(device) for g in graphs], torch.arange(count_global_nodes(graphs)))]
+    return (([g.to(device) for g in subgraphs], seeds) for subgraphs, seeds in loader)
+
+
+def train_tgnn(
+    parquet_dir: str,
+    output_dir: str,
+    epochs: int = 10,
+    batch_size: Optional[int] = None,
+    num_neighbors: Optional[Sequence[int]] = None,
+    num_workers: int = 0,
+    bptt_chunk: Optional[int] = None,
+    checkpoint_activations: bool = False,
+    export: bool = False,
+    quantized: bool = False,
+    hidden_channels: int = 64,
+    lstm_hidden: int = 32,
+    lr: float = 1e-3,
+    val_fraction: float = 0.2,
+    patience: int = 5,
+    resume: bool = False,
+    checkpoint_every: int = 1,
+):
+    """Train TGNN on Parquet graph windows.
+
+    With ``batch_size`` set, training uses neighbor-sampled mini-batches of
+    seed nodes (``num_neighbors`` fan-out per encoder layer, default 10 per
+    layer) sampled by ``num_workers`` loader processes, so memory per step no
+    longer grows with the number of nodes per window.
+
+    ``bptt_chunk`` enables truncated backprop-through-time over chunks of that
+    many windows (see ``tbptt_step``) and ``checkpoint_activations`` recomputes
+    encoder activations in backward; together they keep peak memory roughly
+    independent of the number of windows.
+
+    The latest ``val_fraction`` of the windows (at least one, given three or
+    more windows) is held out for early stopping with ``patience``. Training
+    state is checkpointed to ``tgnn.ckpt`` every ``checkpoint_every`` epochs
+    and continued from there with ``resume``.
+
+    Under ``ml_pipeline.distributed`` every rank trains on its own share of
+    the seed nodes (which requires ``batch_size``) and gradients are
+    all-reduced.
+
+    ``export`` additionally writes TorchScript artifacts for CPU serving
+    (see ``export_tgnn``), optionally int8-quantized.
+    """
     import os
+    from ml_pipeline import distributed
+    from ml_pipeline.checkpoint import run_epochs
+
+    if distributed.is_distributed() and batch_size is None:
+        raise ValueError("Distributed TGNN training shards seed nodes: pass batch_size")
     os.makedirs(output_dir, exist_ok=True)
     
     graphs = load_parquet_graphs(parquet_dir)
@@ -138,34 +544,69 @@ def train_tgnn(parquet_dir: str, output_dir: str, epochs: int = 10):
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     in_channels = graphs[0].x.shape[1]
     
-    model = TGNN(in_channels=in_channels, hidden_channels=64, lstm_hidden=32).to(device)
-    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    model = TGNN(in_channels=in_channels, hidden_channels=hidden_channels, lstm_hidden=lstm_hidden,
+                 checkpoint_activations=checkpoint_activations).to(device)
+    ddp = distributed.wrap(model)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
     criterion = nn.MSELoss()
+
+    n_val = max(1, int(len(graphs) * val_fraction)) if val_fraction > 0 and len(graphs) >= 3 else 0
+    train_graphs, val_graphs = graphs[:len(graphs) - n_val], graphs[len(graphs) - n_val:]
+    loader = val_loader = None
+    if batch_size is not None:
+        if num_neighbors is None:
+            num_neighbors = [10] * model.encoder.num_layers
+        shard = dict(rank=distributed.rank(), world_size=distributed.world_size())
+        loader = TemporalNeighborLoader(
+            train_graphs, num_neighbors, batch_size=batch_size, shuffle=True, num_workers=num_workers, **shard
+        )
+        if val_graphs:
+            val_loader = TemporalNeighborLoader(val_graphs, num_neighbors, batch_size=batch_size,
+                                                num_workers=num_workers, **shard)
+
+    def train_epoch(epoch):
+        if loader is not None:
+            loader.set_epoch(epoch)
+        total, steps = 0.0, 0
+        for graphs_batch, seeds in _window_batches(train_graphs, device, loader):
+            total += tbptt_step(ddp, graphs_batch, len(seeds), optimizer, criterion, bptt_chunk)
+            steps += 1
+        return distributed.all_mean(total, steps)
+
+    def validate():
+        total, steps = 0.0, 0
+        for graphs_batch, seeds in _window_batches(val_graphs, device, val_loader):
+            recon, _ = model(graphs_batch, num_nodes=len(seeds))
+            total += criterion(recon, temporal_target(graphs_batch, len(seeds))).item()
+            steps += 1
+        return distributed.all_mean(total, steps)
+
+    run_epochs(model, optimizer, train_epoch, validate if val_graphs else None, epochs,
+               os.path.join(output_dir, "tgnn.ckpt"), resume, patience, checkpoint_every=checkpoint_every)
     
-    for epoch in range(epochs):
-        model.train()
-        
-        # Use all graphs as one batch (time-series)
-        graphs_batch = [g.to(device) for g in graphs]
-        recon, embeddings = model(graphs_batch)
-        
-        # Reconstruction loss: use mean of node features across windows
-        target = torch.stack([g.x for g in graphs_batch]).mean(dim=0)
-        loss = criterion(recon, target)
-        
-        optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
-        
-        print(f"Epoch {epoch+1}/{epochs} loss={loss.item():.6f}")
-    
-    # Save model
+    if not distributed.is_main():
+        return
+    # Save model (best validation weights)
     torch.save(model.state_dict(), os.path.join(output_dir, "tgnn.pt"))
     print(f"Model saved to {output_dir}/tgnn.pt")
+    if export:
+        export_tgnn(model, graphs, output_dir, quantized=quantized)
+
 
+def score_with_tgnn(
+    parquet_dir: str,
+    model_path: str,
+    batch_size: Optional[int] = None,
+    num_neighbors: Optional[Sequence[int]] = None,
+    num_workers: int = 0,
+) -> dict:
+    """Score a set of graph windows with trained TGNN.
 
-def score_with_tgnn(parquet_dir: str, model_path: str) -> dict:
-    """Score a set of graph windows with trained TGNN."""
+    ``batch_size``/``num_neighbors``/``num_workers`` enable mini-batch
+    inference as in ``train_tgnn``; pass ``num_neighbors=[-1, -1]`` to use
+    every neighbor while still bounding the number of seeds per step.
+    ``model_path`` may also be a directory holding ``export_tgnn`` artifacts.
+    """
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     
     graphs = load_parquet_graphs(parquet_dir)
@@ -173,20 +614,37 @@ def score_with_tgnn(parquet_dir: str, model_path: str) -> dict:
         return {}
     
     in_channels = graphs[0].x.shape[1]
-    model = TGNN(in_channels=in_channels, hidden_channels=64, lstm_hidden=32).to(device)
-    model.load_state_dict(torch.load(model_path, map_location=device))
-    model.eval()
-    
+    if Path(model_path).is_dir():
+        device = torch.device("cpu")
+        model = load_exported_tgnn(model_path)
+    else:
+        state = torch.load(model_path, map_location=device)
+        # Sizes may have been tuned (ml_pipeline.tune): read them from the weights
+        gates, hidden_channels = state["temporal_agg.lstm.weight_ih_l0"].shape
+        model = TGNN(in_channels=in_channels, hidden_channels=hidden_channels, lstm_hidden=gates // 4).to(device)
+        model.load_state_dict(state)
+        model.eval()
+
+    loader = None
+    if batch_size is not None:
+        if num_neighbors is None:
+            num_neighbors = [10] * ENCODER_LAYERS
+        loader = TemporalNeighborLoader(
+            graphs, num_neighbors, batch_size=batch_size, num_workers=num_workers
+        )
+    batches = _window_batches(graphs, device, loader)
+
+    names = global_node_names(graphs)
+    scores = {}
     with torch.no_grad():
-        graphs_batch = [g.to(device) for g in graphs]
-        recon, embeddings = model(graphs_batch)
-        
-        # Compute per-node reconstruction error
-        target = torch.stack([g.x for g in graphs_batch]).mean(dim=0)
-        errors = (recon - target).abs().mean(dim=1)
-    
-    # Map back to node IDs
-    node_ids = pd.read_parquet(list(Path(parquet_dir).glob("window_*.nodes.parquet"))[0])['node_id'].tolist()
-    scores = {node_id: error.item() for node_id, error in zip(node_ids, errors)}
+        for graphs_batch, seeds in batches:
+            num_nodes = len(seeds)
+            recon, embeddings = model(graphs_batch, num_nodes=num_nodes)
+
+            # Compute per-node reconstruction error
+            target = temporal_target(graphs_batch, num_nodes)
+            errors = (recon - target).abs().mean(dim=1)
+            for gid, error in zip(seeds.tolist(), errors.tolist()):
+                scores[names[gid]] = error
     
     return scores
@@ -0,0 +1,275 @@
+"""Per-namespace anomaly thresholds calibrated to a target alert rate.
+
+Each (model version, namespace) pair keeps a ``QuantileSketch`` of its recent
+scores; its threshold is the ``1 - target_rate`` quantile, so a noisy
+namespace gets a higher threshold and a quiet one a lower threshold, each
+alerting on roughly ``target_rate`` of its scores. Until a pair has seen
+``min_count`` scores the static default threshold applies.
+
+Sketches are saved to ``path`` (JSON) by a background thread every
+``save_interval`` seconds while new scores arrive, and on exit, and loaded
+on start; scoring requests never wait for a save. Under the prefork server
+every worker starts from the saved state and the files of the other running
+workers, adds its own share of the traffic, and saves only its own scores to
+``<path>.worker-<pid>``; the master folds those files into ``path`` once
+their worker has exited (``collect``), so no worker's scores are lost or
+counted twice.
+"""
+import atexit
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class QuantileSketch:
+    """Streaming quantiles of non-negative values with exponential forgetting.
+
+    Values are counted in log-spaced buckets (as in DDSketch), so quantiles
+    have relative error ``accuracy`` between ``min_value`` and ``max_value``
+    and memory is fixed. Recent values weigh more: an observation's weight
+    halves every ``half_life`` later observations. Instead of decaying every
+    bucket on each update, new observations are added with growing weights
+    (forward decay) and the buckets are rescaled only occasionally, so an
+    update costs O(1) per value.
+    """
+
+    def __init__(self, accuracy=0.01, half_life=100_000, min_value=1e-9, max_value=1e9):
+        self.accuracy = accuracy
+        self.half_life = half_life
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.floor(math.log(min_value) / self._log_gamma)
+        self.counts = np.zeros(math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1)
+        self.n = 0  # values seen (undecayed)
+        self._t = 0.0  # forward-decay clock: values since the last rescale
+
+    def _index(self, values):
+        idx = np.ceil(np.log(np.maximum(values, 1e-300)) / self._log_gamma) - self._offset
+        return np.clip(idx, 0, len(self.counts) - 1).astype(np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not len(values):
+            return
+        weights = np.exp2((self._t + np.arange(len(values))) / self.half_life)
+        np.add.at(self.counts, self._index(values), weights)
+        self._t += len(values)
+        self.n += len(values)
+        if self._t > 32 * self.half_life:
+            self.counts *= 2.0 ** (-self._t / self.half_life)
+            self._t = 0.0
+
+    def quantile(self, q):
+        """Estimated ``q`` quantile, or None before any update."""
+        cum = np.cumsum(self.counts)
+        if not self.n or cum[-1] <= 0:
+            return None
+        i = min(int(np.searchsorted(cum, q * cum[-1], side="left")), len(cum) - 1)
+        return 2 * self.gamma ** (i + self._offset) / (self.gamma + 1)
+
+    def state_dict(self):
+        nonzero = np.flatnonzero(self.counts)
+        # Stored relative to the current clock so the numbers stay small
+        scale = 2.0 ** (-self._t / self.half_life)
+        return {"n": self.n, "index": nonzero.tolist(), "counts": (self.counts[nonzero] * scale).tolist()}
+
+    def load_state_dict(self, state):
+        self.counts[:] = 0
+        self.counts[np.asarray(state["index"], dtype=np.int64)] = state["counts"]
+        self.n = state["n"]
+        self._t = 0.0
+
+    def merge_state_dict(self, state):
+        """Add the values of another sketch's ``state_dict`` to this one."""
+        scale = 2.0 ** (self._t / self.half_life)
+        np.add.at(self.counts, np.asarray(state["index"], dtype=np.int64), np.asarray(state["counts"]) * scale)
+        self.n += state["n"]
+
+
+class ThresholdCalibrator:
+    """Thread-safe thresholds per (model version, namespace) at ``target_rate`` alerts per score.
+
+    ``target_rate=None`` disables calibration: the default threshold is
+    always used and nothing is recorded. At most ``max_keys`` pairs are
+    tracked (least recently updated dropped first). A threshold is
+    recomputed after every ``refresh_every`` new scores of its namespace.
+    """
+
+    def __init__(self, target_rate=None, min_count=1000, half_life=100_000, accuracy=0.01, path=None,
+                 save_interval=60.0, max_keys=4096, refresh_every=64):
+        self.target_rate = target_rate
+        self.min_count = min_count
+        self.half_life = half_life
+        self.accuracy = accuracy
+        self.path = path
+        self.save_interval = save_interval
+        self.max_keys = max_keys
+        self.refresh_every = refresh_every
+        self._sketches = OrderedDict()
+        self._own = None  # in a prefork worker: sketches of this worker's scores only, which it saves
+        self._cached = {}  # key -> (sketch.n when computed, threshold)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._saver_pid = None  # process running the saver thread (threads do not survive fork)
+        if path and os.path.exists(path):
+            self.load(path)
+        if path and target_rate:
+            atexit.register(self.save)
+
+    @property
+    def enabled(self):
+        return bool(self.target_rate)
+
+    def _sketch(self, key, sketches=None):
+        sketches = self._sketches if sketches is None else sketches
+        sketch = sketches.get(key)
+        if sketch is None:
+            sketch = sketches[key] = QuantileSketch(self.accuracy, self.half_life)
+            while len(sketches) > self.max_keys:
+                self._cached.pop(sketches.popitem(last=False)[0], None)
+        return sketch
+
+    def threshold(self, model, namespace, default):
+        """Calibrated threshold of one namespace (``default`` while it is still warming up)."""
+        if not self.enabled:
+            return default
+        key = (model, namespace)
+        with self._lock:
+            sketch = self._sketches.get(key)
+            if sketch is None or sketch.n < self.min_count:
+                return default
+            n, value = self._cached.get(key, (None, None))
+            if n is None or sketch.n - n >= self.refresh_every:
+                value = sketch.quantile(1 - self.target_rate)
+                self._cached[key] = (sketch.n, value)
+            return value
+
+    def thresholds(self, model, namespaces, default, codes=None):
+        """Per-score thresholds; ``namespaces``/``codes`` as in ``metrics.observe_scores``."""
+        if isinstance(namespaces, str):
+            return np.float64(self.threshold(model, namespaces, default))
+        if codes is None:
+            namespaces, codes = np.unique(np.asarray(namespaces, dtype=str), return_inverse=True)
+        return np.array([self.threshold(model, ns, default) for ns in namespaces])[codes]
+
+    def observe(self, model, namespaces, scores, codes=None):
+        """Add scores to their namespaces' sketches (call after thresholding them)."""
+        if not self.enabled:
+            return
+        scores = np.asarray(scores, dtype=np.float64)
+        if isinstance(namespaces, str):
+            groups = [(namespaces, scores)]
+        else:
+            if codes is None:
+                namespaces, codes = np.unique(np.asarray(namespaces, dtype=str), return_inverse=True)
+            groups = [(ns, scores[codes == i]) for i, ns in enumerate(namespaces)]
+        with self._lock:
+            for ns, values in groups:
+                key = (model, str(ns))
+                for sketches in (self._sketches, self._own) if self._own is not None else (self._sketches,):
+                    self._sketch(key, sketches).update(values)
+                    sketches.move_to_end(key)
+            self._dirty = True
+        if self.path and self._saver_pid != os.getpid():
+            self._start_saver()
+
+    def _start_saver(self):
+        with self._save_lock:
+            if self._saver_pid == os.getpid():
+                return
+            self._saver_pid = os.getpid()
+        threading.Thread(target=self._save_loop, name="threshold-saver", daemon=True).start()
+
+    def _save_loop(self):
+        while True:
+            time.sleep(self.save_interval)
+            if self._dirty:
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"Error saving threshold state to {self.path}: {e}")
+
+    def _worker_files(self):
+        """``(pid, path)`` of the worker files next to ``path``."""
+        directory, base = os.path.split(os.path.abspath(self.path))
+        pattern = re.compile(re.escape(base) + r"\.worker-(\d+)$")
+        matches = (pattern.match(name) for name in os.listdir(directory))
+        return [(int(m.group(1)), os.path.join(directory, m.group(0))) for m in matches if m]
+
+    def start_worker(self, peers=()):
+        """Call in a forked prefork worker: from now on only this worker's scores are saved, to its own file.
+
+        The files of the running ``peers`` are added to the state inherited
+        from the master (not those of retiring workers: the master adds
+        those to ``path`` when they exit).
+        """
+        if not (self.path and self.enabled):
+            return
+        self._own = OrderedDict()
+        self._saver_pid = None
+        for pid, path in self._worker_files():
+            if pid in set(peers) and pid != os.getpid():
+                self.load(path)
+
+    def collect(self, live=()):
+        """Fold the files of exited workers (pids not in ``live``) into ``path``; run by the prefork master."""
+        if not (self.path and self.enabled):
+            return
+        done = [path for pid, path in self._worker_files() if pid not in set(live)]
+        for path in done:
+            self.load(path)
+        if done:
+            self.save()
+            for path in done:
+                os.remove(path)
+
+    def save(self, path=None):
+        if self._own is not None:
+            path, sketches = path or f"{self.path}.worker-{os.getpid()}", self._own
+        else:
+            path, sketches = path or self.path, self._sketches
+        if not path:
+            return
+        with self._save_lock:
+            with self._lock:
+                self._dirty = False
+                state = {
+                    "accuracy": self.accuracy,
+                    "half_life": self.half_life,
+                    "sketches": [{"model": m, "namespace": ns, **s.state_dict()} for (m, ns), s in sketches.items()],
+                }
+            self._write(path, state)
+
+    @staticmethod
+    def _write(path, state):
+        # A unique temporary file per save, renamed into place: readers never see a partial file
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                   dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def load(self, path):
+        """Add the sketches saved in ``path`` to the current ones."""
+        with open(path) as f:
+            state = json.load(f)
+        if (state.get("accuracy"), state.get("half_life")) != (self.accuracy, self.half_life):
+            print(f"Ignoring threshold state in {path}: saved with different sketch parameters")
+            return
+        with self._lock:
+            for entry in state["sketches"]:
+                key = (entry["model"], entry["namespace"])
+                self._sketch(key).merge_state_dict(entry)
+                self._cached.pop(key, None)
@@ -1,71 +1,426 @@
 """Training scripts for baseline models. Simple CLI to train and save models."""
 import argparse
+import json
 import os
+import numpy as np
 import torch
 from torch.utils.data import DataLoader
+from torch.utils.data.distributed import DistributedSampler
 import torch.nn as nn
-from ml_pipeline.data import generate_tabular_normal, generate_sequence_data, SequenceDataset
-from ml_pipeline.models import Autoencoder, LSTMAE
+from ml_pipeline import distributed
+from ml_pipeline.checkpoint import run_epochs
+from ml_pipeline.data import (
+    FEATURE_COLUMNS,
+    SequenceDataset,
+    WindowRowStream,
+    HistorySequences,
+    PodHistory,
+    generate_sequence_data,
+    generate_tabular_normal,
+    load_feature_stats,
+    window_files,
+)
+from ml_pipeline.models import Autoencoder, DeepLogPredictor, LSTMAE
+from ml_pipeline.syscalls import DeepLogWindows, TokenStore
+from ml_pipeline.export import artifact_path, export_model, load_weights
+from ml_pipeline.numpy_models import export_npz
 
 
-def train_autoencoder(output_dir, epochs=10, batch_size=32, lr=1e-3):
-    X = generate_tabular_normal(2000, 16)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = Autoencoder(input_dim=16, hidden_dims=[64, 32]).to(device)
-    opt = torch.optim.Adam(model.parameters(), lr=lr)
-    ds = torch.utils.data.TensorDataset(torch.tensor(X))
-    loader = DataLoader(ds, batch_size=batch_size, shuffle=True)
+def _split(ds, val_fraction, seed=0):
+    """Hold out ``val_fraction`` of a dataset for early stopping (same split on every run with ``seed``)."""
+    n_val = int(len(ds) * val_fraction)
+    if not n_val:
+        return ds, None
+    return torch.utils.data.random_split(ds, [len(ds) - n_val, n_val], generator=torch.Generator().manual_seed(seed))
+
+
+def _mean_loss(model, loader, criterion, device, bf16=False):
+    """Mean loss per sample over ``loader`` (and over all ranks)."""
+    total, n = 0.0, 0
+    for batch in loader:
+        x = (batch[0] if isinstance(batch, (list, tuple)) else batch).float().to(device)
+        with torch.autocast(device.type, dtype=torch.bfloat16, enabled=bf16):
+            loss = criterion(model(x).float(), x)
+        total += loss.item() * len(x)
+        n += len(x)
+    return distributed.all_mean(total, n)
+
+
+def _loader(ds, batch_size, seed):
+    """Shuffled loader; under distributed training each rank gets its own slice of ``ds``."""
+    if not distributed.is_distributed():
+        return DataLoader(ds, batch_size=batch_size, shuffle=True)
+    return DataLoader(ds, batch_size=batch_size, sampler=DistributedSampler(ds, seed=seed))
+
+
+def _fit_reconstruction(model, opt, loader, val_loader, device, epochs, checkpoint_path, resume, patience,
+                        checkpoint_every):
     criterion = nn.MSELoss()
-    for ep in range(epochs):
-        model.train()
+    ddp = distributed.wrap(model)
+
+    def train_epoch(ep):
+        if isinstance(loader.sampler, DistributedSampler):
+            loader.sampler.set_epoch(ep)
         total = 0.0
         for batch in loader:
-            x = batch[0].to(device)
-            recon = model(x)
+            x = (batch[0] if isinstance(batch, (list, tuple)) else batch).float().to(device)
+            recon = ddp(x)
             loss = criterion(recon, x)
             opt.zero_grad()
             loss.backward()
             opt.step()
             total += loss.item()
-        print(f"Epoch {ep+1}/{epochs} loss={total/len(loader):.6f}")
+        return distributed.all_mean(total, len(loader))
+
+    validate = (lambda: _mean_loss(model, val_loader, criterion, device)) if val_loader is not None else None
+    return run_epochs(model, opt, train_epoch, validate, epochs, checkpoint_path, resume, patience,
+                      checkpoint_every=checkpoint_every)
+
+
+def train_autoencoder(output_dir, epochs=10, batch_size=32, lr=1e-3, hidden_dims=(64, 32), val_fraction=0.2,
+                      patience=5, resume=False, checkpoint_every=1, seed=0):
+    """Train on synthetic data, checkpointing to ``autoencoder.ckpt`` and stopping early on the validation split."""
+    # A resumed run must see the same data and split
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    X = generate_tabular_normal(2000, 16)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = Autoencoder(input_dim=16, hidden_dims=list(hidden_dims)).to(device)
+    opt = torch.optim.Adam(model.parameters(), lr=lr)
+    train_ds, val_ds = _split(torch.utils.data.TensorDataset(torch.tensor(X)), val_fraction, seed)
+    loader = _loader(train_ds, batch_size, seed)
+    val_loader = DataLoader(val_ds, batch_size=1024) if val_ds is not None else None
     os.makedirs(output_dir, exist_ok=True)
-    torch.save(model.state_dict(), os.path.join(output_dir, "autoencoder.pt"))
+    _fit_reconstruction(model, opt, loader, val_loader, device, epochs, os.path.join(output_dir, "autoencoder.ckpt"),
+                        resume, patience, checkpoint_every)
+    if distributed.is_main():
+        torch.save(model.state_dict(), os.path.join(output_dir, "autoencoder.pt"))
 
 
-def train_lstm_ae(output_dir, epochs=10, batch_size=16, lr=1e-3):
+def train_lstm_ae(output_dir, epochs=10, batch_size=16, lr=1e-3, hidden_dim=64, val_fraction=0.2,
+                  patience=5, resume=False, checkpoint_every=1, seed=0):
+    """Train on synthetic sequences, checkpointing to ``lstm_ae.ckpt`` and stopping early on the validation split."""
+    np.random.seed(seed)
+    torch.manual_seed(seed)
     seqs = generate_sequence_data(300, seq_len=50, n_features=8)
-    ds = SequenceDataset(seqs)
-    loader = DataLoader(ds, batch_size=batch_size, shuffle=True)
+    train_ds, val_ds = _split(SequenceDataset(seqs), val_fraction, seed)
+    loader = _loader(train_ds, batch_size, seed)
+    val_loader = DataLoader(val_ds, batch_size=256) if val_ds is not None else None
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = LSTMAE(input_dim=8, hidden_dim=64).to(device)
+    model = LSTMAE(input_dim=8, hidden_dim=hidden_dim).to(device)
+    opt = torch.optim.Adam(model.parameters(), lr=lr)
+    os.makedirs(output_dir, exist_ok=True)
+    _fit_reconstruction(model, opt, loader, val_loader, device, epochs, os.path.join(output_dir, "lstm_ae.ckpt"),
+                        resume, patience, checkpoint_every)
+    if distributed.is_main():
+        torch.save(model.state_dict(), os.path.join(output_dir, "lstm_ae.pt"))
+
+
+def fold_standardization(model, mean, std):
+    """Fold input standardization into an ``Autoencoder`` so it takes and reconstructs raw features.
+
+    The model was trained on ``(x - mean) / std``; afterwards
+    ``model(x) == std * trained((x - mean) / std) + mean``, so servers can
+    feed it unscaled features.
+    """
+    mean = torch.as_tensor(mean, dtype=torch.float32)
+    std = torch.as_tensor(std, dtype=torch.float32)
+    linears = [m for m in model.net if isinstance(m, nn.Linear)]
+    first, last = linears[0], linears[-1]
+    with torch.no_grad():
+        first.bias -= first.weight @ (mean / std)
+        first.weight /= std
+        last.weight *= std[:, None]
+        last.bias.mul_(std).add_(mean)
+    return model
+
+
+def train_from_windows(data_dir, output_dir, which="ae", epochs=10, batch_size=256, lr=1e-3,
+                       num_workers=2, seq_len=10, stats_path=None, bf16=False, shuffle_buffer=10000,
+                       val_fraction=0.1, patience=5, resume=False, checkpoint_every=1, hidden_dims=(16, 8),
+                       hidden_dim=64):
+    """Train on stored graph-builder windows.
+
+    Features are standardized with precomputed statistics (``stats_path``,
+    computed on first use). Node feature rows (``ae``) are streamed from disk
+    by ``num_workers`` DataLoader workers and shuffled within a bounded
+    buffer, so memory does not grow with the dataset. Per-pod sequences over
+    ``seq_len`` consecutive windows (``lstm``) are views into a
+    ``PodHistory`` and are shuffled globally; memory does grow with the
+    dataset there, as every rank holds its share of the training windows'
+    features (about N x F float32 for N node rows), but not with ``seq_len``. The latest ``val_fraction`` of the windows is
+    held out for early stopping; checkpoints go to ``<which>.ckpt`` in
+    ``output_dir``. Under distributed training every rank reads its own
+    shard of the windows (``ae``) or pods (``lstm``).
+    """
+    files = window_files(data_dir)
+    if not files:
+        raise FileNotFoundError(f"No window_*.nodes.parquet files under {data_dir}")
+    stats_path = stats_path or os.path.join(data_dir, "feature_stats.json")
+    if distributed.is_main():
+        load_feature_stats(stats_path, files)
+    distributed.barrier()  # the other ranks read the stats rank 0 computed
+    stats = load_feature_stats(stats_path, files)
+    # Hold out the most recent windows; an LSTM-AE validation sequence needs seq_len of them
+    n_val = int(len(files) * val_fraction)
+    if which == "lstm" and n_val:
+        n_val = seq_len if len(files) >= 2 * seq_len else 0
+    train_files, val_files = (files[:-n_val], files[-n_val:]) if n_val else (files, [])
+    n_features = len(FEATURE_COLUMNS)
+    shard = dict(rank=distributed.rank(), world_size=distributed.world_size())
+    if which == "ae":
+        ds = WindowRowStream(train_files, stats=stats, shuffle_buffer=shuffle_buffer, **shard)
+        val_ds = WindowRowStream(val_files, stats=stats, shuffle_buffer=0, **shard)
+        model = Autoencoder(input_dim=n_features, hidden_dims=list(hidden_dims))
+        name = "autoencoder.pt"
+        loader = DataLoader(ds, batch_size=batch_size, num_workers=num_workers,
+                            persistent_workers=num_workers > 0, pin_memory=torch.cuda.is_available())
+        val_workers = min(num_workers, len(val_files))
+        val_loader = DataLoader(val_ds, batch_size=batch_size, num_workers=val_workers,
+                                persistent_workers=val_workers > 0) if val_files else None
+    else:
+        # Every rank holds the histories of its own pods, so the loaders need no sampler
+        ds = HistorySequences(PodHistory.from_files(train_files, stats, **shard), seq_len)
+        val_ds = HistorySequences(PodHistory.from_files(val_files, stats, **shard), seq_len)
+        model = LSTMAE(input_dim=n_features, hidden_dim=hidden_dim)
+        name = "lstm_ae.pt"
+        # Slicing in-memory histories is cheaper than handing batches over from worker processes
+        shuffle = torch.Generator()
+        loader = DataLoader(ds, batch_size=batch_size, shuffle=True, generator=shuffle, collate_fn=ds.collate,
+                            pin_memory=torch.cuda.is_available())
+        val_loader = DataLoader(val_ds, batch_size=batch_size, collate_fn=val_ds.collate) if val_files else None
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = model.to(device)
+    ddp = distributed.wrap(model)
     opt = torch.optim.Adam(model.parameters(), lr=lr)
     criterion = nn.MSELoss()
-    for ep in range(epochs):
-        model.train()
+    if distributed.is_main():
+        source = f"{num_workers} workers" if which == "ae" else f"{len(ds)} sequences"
+        print(f"Training on {len(train_files)} windows ({len(val_files)} held out) from {data_dir} "
+              f"with {source} x {distributed.world_size()} ranks{' (bf16 autocast)' if bf16 else ''}")
+
+    def train_epoch(ep):
+        if which == "ae":
+            ds.set_epoch(ep)
+        else:
+            shuffle.manual_seed(ep)  # a resumed run shuffles each epoch as the original did
+        total, batches = 0.0, 0
+        # Shards differ in size: ranks that run out early keep joining the others' all-reduces
+        with distributed.join(ddp):
+            for batch in loader:
+                x = batch.float().to(device, non_blocking=True)
+                with torch.autocast(device.type, dtype=torch.bfloat16, enabled=bf16):
+                    recon = ddp(x)
+                    loss = criterion(recon.float(), x)
+                opt.zero_grad()
+                loss.backward()
+                opt.step()
+                total += loss.item()
+                batches += 1
+        return distributed.all_mean(total, batches)
+
+    validate = (lambda: _mean_loss(model, val_loader, criterion, device, bf16)) if val_loader is not None else None
+    os.makedirs(output_dir, exist_ok=True)
+    run_epochs(model, opt, train_epoch, validate, epochs, os.path.join(output_dir, f"{which}.ckpt"), resume,
+               patience, checkpoint_every=checkpoint_every)
+
+    model = model.cpu().eval()
+    if not distributed.is_main():
+        return model
+    if which == "ae":
+        fold_standardization(model, stats["mean"], stats["std"])
+    else:
+        # LSTM-AE outputs stay in standardized space: consumers apply these stats
+        with open(os.path.join(output_dir, "lstm_ae.stats.json"), "w") as f:
+            json.dump(stats, f, indent=2)
+    torch.save(model.state_dict(), os.path.join(output_dir, name))
+    return model
+
+
+def train_deeplog(store_dir, output_dir, epochs=10, batch_size=256, lr=1e-3, window=10, emb_dim=64,
+                  hidden_dim=128, val_fraction=0.1, patience=5, resume=False, checkpoint_every=1, seed=0):
+    """Train ``DeepLogPredictor`` on a ``syscalls.build_store`` token store.
+
+    Windows are sliced straight from the memory-mapped tokens each epoch;
+    writes ``deeplog.pt`` and the store's ``vocab.json`` for ``ml_pipeline.deeplog``.
+    """
+    torch.manual_seed(seed)
+    store = TokenStore(store_dir)
+    ds = DeepLogWindows(store, window)
+    if not len(ds):
+        raise ValueError(f"No sequence in {store_dir} is longer than the window ({window})")
+    train_ds, val_ds = _split(ds, val_fraction, seed)
+    loader = _loader(train_ds, batch_size, seed)
+    val_loader = DataLoader(val_ds, batch_size=1024) if val_ds is not None else None
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = DeepLogPredictor(len(store.vocab), emb_dim, hidden_dim).to(device)
+    opt = torch.optim.Adam(model.parameters(), lr=lr)
+    criterion = nn.CrossEntropyLoss()
+    ddp = distributed.wrap(model)
+    if distributed.is_main():
+        print(f"{len(ds)} windows from {store.num_tokens} syscalls in {len(store)} sequences, "
+              f"vocabulary of {len(store.vocab)}")
+
+    def loss_of(net, x, y):
+        logits = net(x.to(device))
+        return criterion(logits.reshape(-1, logits.shape[-1]), y.to(device).reshape(-1))
+
+    def train_epoch(ep):
+        if isinstance(loader.sampler, DistributedSampler):
+            loader.sampler.set_epoch(ep)
         total = 0.0
-        for batch in loader:
-            x = batch.float().to(device)
-            recon = model(x)
-            loss = criterion(recon, x)
+        for x, y in loader:
+            loss = loss_of(ddp, x, y)
             opt.zero_grad()
             loss.backward()
             opt.step()
             total += loss.item()
-        print(f"Epoch {ep+1}/{epochs} loss={total/len(loader):.6f}")
+        return distributed.all_mean(total, len(loader))
+
+    def validate():
+        total, n = 0.0, 0
+        with torch.no_grad():
+            for x, y in val_loader:
+                total += loss_of(model, x, y).item() * len(x)
+                n += len(x)
+        return distributed.all_mean(total, n)
+
     os.makedirs(output_dir, exist_ok=True)
-    torch.save(model.state_dict(), os.path.join(output_dir, "lstm_ae.pt"))
+    run_epochs(model, opt, train_epoch, validate if val_loader is not None else None, epochs,
+               os.path.join(output_dir, "deeplog.ckpt"), resume, patience, checkpoint_every=checkpoint_every)
+    model = model.cpu().eval()
+    if distributed.is_main():
+        torch.save(model.state_dict(), os.path.join(output_dir, "deeplog.pt"))
+        store.vocab.save(os.path.join(output_dir, "vocab.json"))
+    return model
+
+
+# Model/optimizer settings each model accepts (from --params or flags)
+MODEL_PARAMS = {
+    "ae": ("lr", "hidden_dims", "batch_size"),
+    "lstm": ("lr", "hidden_dim", "batch_size"),
+    "tgnn": ("lr", "hidden_channels", "lstm_hidden", "batch_size"),
+    "deeplog": ("lr", "hidden_dim", "batch_size"),
+}
+
+
+def model_params(which, params_path=None, **overrides):
+    """Settings for ``which``: ``train_params`` of an ``ml_pipeline.tune`` result, then non-None ``overrides``."""
+    params = {}
+    if params_path:
+        with open(params_path) as f:
+            best = json.load(f)
+        if best.get("which", which) != which:
+            raise ValueError(f"{params_path} holds parameters tuned for {best['which']}, not {which}")
+        params = dict(best["train_params"])
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    return {k: v for k, v in params.items() if k in MODEL_PARAMS[which]}
+
+
+def _run(args):
+    stopping = dict(patience=args.patience, resume=args.resume, checkpoint_every=args.checkpoint_every)
+    if args.val_fraction is not None:
+        stopping["val_fraction"] = args.val_fraction
+    params = model_params(args.which, args.params, lr=args.lr, hidden_dims=args.hidden_dims,
+                          hidden_dim=args.hidden_dim, hidden_channels=args.hidden_channels,
+                          lstm_hidden=args.lstm_hidden, batch_size=args.batch_size)
+    if distributed.is_main() and params:
+        print(f"Model parameters: {params}")
+    if args.which == "tgnn":
+        from ml_pipeline.tgnn import train_tgnn
+
+        train_tgnn(args.data_dir, args.out_dir, args.epochs, num_workers=args.num_workers,
+                   export=args.export == "torchscript", quantized=args.quantize, **params, **stopping)
+        return
+    if args.which == "deeplog":
+        params.setdefault("batch_size", 256)
+        train_deeplog(args.data_dir, args.out_dir, args.epochs, window=args.seq_len, **params, **stopping)
+        return
+    if args.data_dir:
+        params.setdefault("batch_size", 256)
+        model = train_from_windows(args.data_dir, args.out_dir, args.which, args.epochs,
+                                   num_workers=args.num_workers, seq_len=args.seq_len,
+                                   stats_path=args.stats, bf16=args.bf16, **params, **stopping)
+        weights = os.path.join(args.out_dir, "autoencoder.pt" if args.which == "ae" else "lstm_ae.pt")
+        if args.export and distributed.is_main():
+            # Window-feature models differ from the synthetic defaults: export this exact instance
+            shape = (len(FEATURE_COLUMNS),) if args.which == "ae" else (args.seq_len, len(FEATURE_COLUMNS))
+            if args.export == "npz":
+                print(f"Exported {export_npz(model, os.path.splitext(weights)[0] + '.npz')}")
+            else:
+                export_model(model, lambda n: torch.randn(n, *shape), artifact_path(weights, args.export, args.quantize),
+                             args.export, args.quantize)
+        return
+    if args.which == "ae":
+        train_autoencoder(args.out_dir, epochs=args.epochs, **params, **stopping)
+        weights = os.path.join(args.out_dir, "autoencoder.pt")
+    else:
+        train_lstm_ae(args.out_dir, epochs=args.epochs, **params, **stopping)
+        weights = os.path.join(args.out_dir, "lstm_ae.pt")
+    if args.export and distributed.is_main():
+        # Synthetic sequences are 50 steps long
+        model, make_batch = load_weights(args.which, weights, seq_len=50)
+        if args.export == "npz":
+            print(f"Exported {export_npz(model, os.path.splitext(weights)[0] + '.npz')}")
+            return
+        export_model(model, make_batch, artifact_path(weights, args.export, args.quantize),
+                     args.export, args.quantize)
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--out-dir", required=True)
-    parser.add_argument("--which", choices=["ae","lstm"], default="ae")
+    parser.add_argument("--which", choices=["ae", "lstm", "tgnn", "deeplog"], default="ae")
     parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--data-dir", default=None,
+                        help="Train on stored graph-builder windows (streamed) instead of synthetic data; "
+                             "a syscalls token store for deeplog")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Batch size (default 256 for --data-dir and deeplog); seed nodes per step for tgnn "
+                             "(default: full graph)")
+    parser.add_argument("--num-workers", type=int, default=2, help="DataLoader workers for --data-dir")
+    parser.add_argument("--params", default=None,
+                        help="Model settings tuned by ml_pipeline.tune (<which>_best_params.json); flags override them")
+    parser.add_argument("--lr", type=float, default=None, help="Learning rate (default 1e-3)")
+    parser.add_argument("--hidden-dims", type=lambda v: [int(h) for h in v.split(",")], default=None,
+                        help="Autoencoder encoder sizes, comma-separated (e.g. 64,32)")
+    parser.add_argument("--hidden-dim", type=int, default=None, help="LSTM-AE / DeepLog LSTM size")
+    parser.add_argument("--hidden-channels", type=int, default=None, help="TGNN graph encoder size")
+    parser.add_argument("--lstm-hidden", type=int, default=None, help="TGNN temporal LSTM size")
+    parser.add_argument("--seq-len", type=int, default=10,
+                        help="Windows per sequence for --data-dir --which lstm; syscalls per window for deeplog")
+    parser.add_argument("--stats", default=None,
+                        help="Feature stats JSON (default: <data-dir>/feature_stats.json, computed if missing)")
+    parser.add_argument("--bf16", action="store_true", help="CPU/GPU bfloat16 autocast for --data-dir")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint in --out-dir if present")
+    parser.add_argument("--patience", type=int, default=5,
+                        help="Stop after this many epochs without validation improvement (0: never)")
+    parser.add_argument("--val-fraction", type=float, default=None,
+                        help="Held-out share for early stopping (default 0.2, or 0.1 of the windows for --data-dir)")
+    parser.add_argument("--checkpoint-every", type=int, default=1, help="Epochs between checkpoints")
+    parser.add_argument("--nproc", type=int, default=1,
+                        help="Local data-parallel processes (gloo); use torchrun instead for several nodes")
+    parser.add_argument("--export", choices=["torchscript", "onnx", "npz"], default=None,
+                        help="Also write a CPU inference artifact next to the weights")
+    parser.add_argument("--quantize", action="store_true", help="Dynamic int8 quantization for --export")
     args = parser.parse_args()
-    if args.which == "ae":
-        train_autoencoder(args.out_dir, epochs=args.epochs)
-    else:
-        train_lstm_ae(args.out_dir, epochs=args.epochs)
+    if args.which in ("tgnn", "deeplog") and not args.data_dir:
+        parser.error(f"--which {args.which} needs --data-dir")
+    for key in ("hidden_dims", "hidden_dim", "hidden_channels", "lstm_hidden"):
+        if getattr(args, key) is not None and key not in MODEL_PARAMS[args.which]:
+            parser.error(f"--{key.replace('_', '-')} does not apply to --which {args.which}")
+    if args.which == "deeplog" and args.export:
+        parser.error("DeepLog models are served from their state dict (ml_pipeline.deeplog); --export is not supported")
+    if args.which == "tgnn" and args.export not in (None, "torchscript"):
+        parser.error("the TGNN exports to torchscript only")
+    if args.nproc > 1:
+        distributed.spawn(_run, args.nproc, args)
+        return
+    distributed.init()  # under torchrun
+    try:
+        _run(args)
+    finally:
+        distributed.shutdown()
 
 
 if __name__ == "__main__":
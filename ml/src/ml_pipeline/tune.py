@@ -0,0 +1,277 @@
+"""Parallel Optuna hyperparameter search for the baseline models.
+
+Trials run in a pool of worker processes sharing one SQLite study, so a
+sweep can be stopped and resumed, or inspected with ``optuna-dashboard``.
+Every trial reports its validation loss after each epoch and is pruned when
+it falls behind the median of earlier trials. Datasets are preprocessed once
+into ``<out-dir>/cache`` and memory-mapped by every trial instead of being
+regenerated per trial; the cache is keyed on the input data and settings.
+
+Usage:
+  python -m ml_pipeline.tune --which ae --trials 40 --jobs 4 --out-dir tune/
+  python -m ml_pipeline.tune --which tgnn --data-dir ./graphs --trials 20 --jobs 2 --out-dir tune/
+  python -m ml_pipeline.train --which ae --params tune/ae_best_params.json --out-dir models/
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import optuna
+import torch
+import torch.nn as nn
+
+from ml_pipeline.data import (
+    WindowRowStream,
+    WindowSequenceStream,
+    generate_sequence_data,
+    generate_tabular_normal,
+    load_feature_stats,
+    window_files,
+)
+from ml_pipeline.models import Autoencoder, LSTMAE
+
+
+def suggest(trial, which):
+    """Search space per model."""
+    lr = trial.suggest_float("lr", 1e-4, 1e-2, log=True)
+    if which == "ae":
+        h1 = trial.suggest_categorical("hidden1", [16, 32, 64, 128])
+        h2 = trial.suggest_categorical("hidden2", [4, 8, 16, 32])
+        return {"lr": lr, "hidden_dims": [h1, min(h1, h2)],
+                "batch_size": trial.suggest_categorical("batch_size", [32, 64, 128, 256])}
+    if which == "lstm":
+        return {"lr": lr, "hidden_dim": trial.suggest_categorical("hidden_dim", [16, 32, 64, 128]),
+                "batch_size": trial.suggest_categorical("batch_size", [8, 16, 32, 64])}
+    return {"lr": lr, "hidden_channels": trial.suggest_categorical("hidden_channels", [16, 32, 64, 128]),
+            "lstm_hidden": trial.suggest_categorical("lstm_hidden", [8, 16, 32, 64])}
+
+
+def _dataset_key(which, data_dir, seq_len, max_rows, seed):
+    """Digest of everything the prepared dataset depends on, including the input files' names and mtimes."""
+    files = []
+    if data_dir:
+        root = Path(data_dir).resolve()
+        paths = sorted(root.rglob("window_*.parquet")) + sorted(root.glob("feature_stats.json"))
+        files = [(str(p.relative_to(root)), os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths]
+    key = {"which": which, "data_dir": str(Path(data_dir).resolve()) if data_dir else None, "files": files,
+           "seq_len": seq_len, "max_rows": max_rows, "seed": seed}
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()[:16]
+
+
+def _sample(items, k, rng):
+    """Uniform sample of at most ``k`` items from a stream (reservoir sampling), in stream order."""
+    rows, positions = [], []
+    for i, item in enumerate(items):
+        if i < k:
+            rows.append(item)
+            positions.append(i)
+            continue
+        j = rng.integers(i + 1)
+        if j < k:
+            rows[j], positions[j] = item, i
+    return [rows[j] for j in np.argsort(positions)]
+
+
+def prepare_dataset(which, cache_dir, data_dir=None, seq_len=10, max_rows=200_000, seed=0):
+    """Preprocess the tuning data once; returns the cached file paths.
+
+    The data is cached under ``cache_dir/<which>-<digest>``, keyed on the
+    data directory, its window files (names and mtimes), ``seq_len``,
+    ``max_rows`` and ``seed``, so changing any of them prepares a new
+    dataset. At most ``max_rows`` rows (sequences) are sampled uniformly
+    from all windows.
+    """
+    if data_dir and which != "tgnn":
+        files = window_files(data_dir)
+        # Written on first use: load before keying the cache on the directory's files
+        stats = load_feature_stats(os.path.join(data_dir, "feature_stats.json"), files)
+    cache_dir = os.path.join(cache_dir, f"{which}-{_dataset_key(which, data_dir, seq_len, max_rows, seed)}")
+    os.makedirs(cache_dir, exist_ok=True)
+    if which == "tgnn":
+        from ml_pipeline.tgnn import load_parquet_graphs
+
+        path = os.path.join(cache_dir, "graphs.pt")
+        if not os.path.exists(path):
+            if not data_dir:
+                raise ValueError("--data-dir is required for tgnn")
+            graphs = load_parquet_graphs(data_dir)
+            if len(graphs) < 3:
+                raise ValueError(f"Need at least 3 windows to tune the TGNN, found {len(graphs)}")
+            torch.save(graphs, path)
+        return {"graphs": path}
+
+    paths = {"train": os.path.join(cache_dir, f"{which}_train.npy"), "val": os.path.join(cache_dir, f"{which}_val.npy")}
+    if all(os.path.exists(p) for p in paths.values()):
+        return paths
+    if data_dir:
+        stream = WindowRowStream(files, stats=stats) if which == "ae" else WindowSequenceStream(
+            files, seq_len=seq_len, stats=stats)
+        X = np.stack(_sample(stream, max_rows, np.random.default_rng(seed))).astype(np.float32)
+    else:
+        np.random.seed(seed)
+        X = generate_tabular_normal(2000, 16) if which == "ae" else generate_sequence_data(300, seq_len=50, n_features=8)
+    perm = np.random.default_rng(seed).permutation(len(X))
+    n_val = max(1, len(X) // 5)
+    np.save(paths["val"], X[perm[:n_val]])
+    np.save(paths["train"], X[perm[n_val:]])
+    return paths
+
+
+def _batches(X, batch_size, rng=None):
+    idx = rng.permutation(len(X)) if rng is not None else np.arange(len(X))
+    for start in range(0, len(X), batch_size):
+        # Sorted indices keep reads from the memory-mapped array sequential
+        yield torch.from_numpy(np.asarray(X[np.sort(idx[start:start + batch_size])], dtype=np.float32))
+
+
+def _reconstruction_objective(trial, which, paths, epochs):
+    params = suggest(trial, which)
+    train = np.load(paths["train"], mmap_mode="r")
+    val = np.load(paths["val"], mmap_mode="r")
+    if which == "ae":
+        model = Autoencoder(input_dim=train.shape[1], hidden_dims=params["hidden_dims"])
+    else:
+        model = LSTMAE(input_dim=train.shape[2], hidden_dim=params["hidden_dim"])
+    opt = torch.optim.Adam(model.parameters(), lr=params["lr"])
+    criterion = nn.MSELoss()
+    rng = np.random.default_rng(trial.number)
+    best = float("inf")
+    for epoch in range(epochs):
+        model.train()
+        for x in _batches(train, params["batch_size"], rng):
+            loss = criterion(model(x), x)
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+        model.eval()
+        with torch.no_grad():
+            total = sum(criterion(model(x), x).item() * len(x) for x in _batches(val, 1024))
+        val_loss = total / len(val)
+        best = min(best, val_loss)
+        trial.report(val_loss, epoch)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    return best
+
+
+def _tgnn_objective(trial, paths, epochs):
+    from ml_pipeline.tgnn import TGNN, count_global_nodes, tbptt_step, temporal_target
+
+    params = suggest(trial, "tgnn")
+    graphs = torch.load(paths["graphs"], weights_only=False)
+    # Train on the earlier windows, validate on how well the model summarizes the later ones
+    split = max(2, int(len(graphs) * 0.8))
+    train, val = graphs[:split], graphs[split:] or graphs[-1:]
+    n_train, n_val = count_global_nodes(train), count_global_nodes(val)
+    model = TGNN(in_channels=graphs[0].x.shape[1], hidden_channels=params["hidden_channels"],
+                 lstm_hidden=params["lstm_hidden"])
+    opt = torch.optim.Adam(model.parameters(), lr=params["lr"])
+    criterion = nn.MSELoss()
+    target = temporal_target(val, n_val)
+    best = float("inf")
+    for epoch in range(epochs):
+        model.train()
+        tbptt_step(model, train, n_train, opt, criterion)
+        model.eval()
+        with torch.no_grad():
+            val_loss = criterion(model(val, num_nodes=n_val)[0], target).item()
+        best = min(best, val_loss)
+        trial.report(val_loss, epoch)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    return best
+
+
+def _storage(url):
+    # Several processes write to one SQLite file: wait for locks instead of failing
+    return optuna.storages.RDBStorage(url, engine_kwargs={"connect_args": {"timeout": 60}})
+
+
+def _pruner(prune, n_startup_trials):
+    if not prune:
+        return optuna.pruners.NopPruner()
+    return optuna.pruners.MedianPruner(n_startup_trials=n_startup_trials, n_warmup_steps=1)
+
+
+def _run_trials(storage_url, study_name, which, paths, epochs, n_trials, threads, seed, pruner):
+    """Worker process: run ``n_trials`` trials of the shared study."""
+    torch.set_num_threads(threads)
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    # Samplers and pruners are not stored with the study: every worker passes its own
+    study = optuna.load_study(study_name=study_name, storage=_storage(storage_url),
+                              sampler=optuna.samplers.TPESampler(seed=seed), pruner=pruner)
+    if which == "tgnn":
+        objective = lambda trial: _tgnn_objective(trial, paths, epochs)  # noqa: E731
+    else:
+        objective = lambda trial: _reconstruction_objective(trial, which, paths, epochs)  # noqa: E731
+    study.optimize(objective, n_trials=n_trials)
+
+
+def run_study(which, out_dir, trials=20, jobs=2, epochs=10, data_dir=None, seq_len=10,
+              storage=None, study_name=None, seed=0, prune=True):
+    """Run (or resume) a study; writes ``<which>_best_params.json`` and returns the study.
+
+    Its ``train_params`` are the model/optimizer settings of the best trial,
+    as read by ``python -m ml_pipeline.train --params``.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    storage = storage or f"sqlite:///{os.path.abspath(os.path.join(out_dir, 'optuna.db'))}"
+    study_name = study_name or f"{which}-tuning"
+    paths = prepare_dataset(which, os.path.join(out_dir, "cache"), data_dir, seq_len, seed=seed)
+    jobs = max(1, min(jobs, trials))
+    pruner = _pruner(prune, max(2, jobs))
+    study = optuna.create_study(
+        study_name=study_name, storage=_storage(storage), direction="minimize", load_if_exists=True,
+        sampler=optuna.samplers.TPESampler(seed=seed), pruner=pruner,
+    )
+
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    shares = [trials // jobs + (i < trials % jobs) for i in range(jobs)]
+    if jobs == 1:
+        _run_trials(storage, study_name, which, paths, epochs, trials, threads, seed, pruner)
+    else:
+        # spawn: torch/OpenMP state in the parent must not leak into forked workers
+        with ProcessPoolExecutor(jobs, mp_context=get_context("spawn")) as pool:
+            futures = [pool.submit(_run_trials, storage, study_name, which, paths, epochs, n, threads,
+                                   seed + i, pruner)
+                       for i, n in enumerate(shares)]
+            for f in futures:
+                f.result()
+
+    states = [t.state for t in study.trials]
+    print(f"{len(states)} trials: {states.count(optuna.trial.TrialState.COMPLETE)} complete, "
+          f"{states.count(optuna.trial.TrialState.PRUNED)} pruned")
+    print(f"Best {which} val loss {study.best_value:.6f} with {study.best_params}")
+    # Replaying the best trial through the search space gives the keyword arguments ml_pipeline.train takes
+    train_params = suggest(optuna.trial.FixedTrial(study.best_params), which)
+    with open(os.path.join(out_dir, f"{which}_best_params.json"), "w") as f:
+        json.dump({"which": which, "value": study.best_value, "params": study.best_params,
+                   "train_params": train_params}, f, indent=2)
+    return study
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--which", choices=["ae", "lstm", "tgnn"], default="ae")
+    p.add_argument("--out-dir", required=True, help="Study database, dataset cache and best params")
+    p.add_argument("--trials", type=int, default=20)
+    p.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    p.add_argument("--epochs", type=int, default=10, help="Maximum epochs per trial")
+    p.add_argument("--data-dir", default=None, help="Graph-builder windows (default: synthetic data; required for tgnn)")
+    p.add_argument("--seq-len", type=int, default=10)
+    p.add_argument("--storage", default=None, help="Optuna storage URL (default: sqlite in --out-dir)")
+    p.add_argument("--study-name", default=None)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--no-prune", action="store_true")
+    args = p.parse_args()
+    run_study(args.which, args.out_dir, args.trials, args.jobs, args.epochs, args.data_dir, args.seq_len,
+              args.storage, args.study_name, args.seed, prune=not args.no_prune)
+
+
+if __name__ == "__main__":
+    main()
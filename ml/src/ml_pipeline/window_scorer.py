@@ -0,0 +1,319 @@
+"""Scoring worker for graph-builder output: scores each new window as soon as it is published.
+
+Watches the window directory with inotify (polling when inotify is not
+available, and rescanning periodically and after lost events), scores all
+nodes of every new ``window_*.nodes.parquet`` in one batched pass and
+writes next to it:
+
+- ``window_<ts>.scores.parquet``: node_id, pod_name, namespace, score, anomaly
+- ``window_<ts>.alert.json``: the nodes above threshold
+
+With ``--shm-ring``, windows are instead read zero-copy from the
+shared-memory ring a co-located graph builder publishes to
+(``ml_pipeline.shm_ring``); outputs are still written to ``--window-dir``.
+
+A window that fails to score is retried with backoff a few times, then
+skipped until its file changes.
+
+Window-to-score latency (publish time to scores written) is exported as
+a Prometheus histogram when ``--metrics-port`` is set.
+
+Usage:
+  python -m ml_pipeline.window_scorer --window-dir ./graphs --model /models/nodes_ae.pt
+"""
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml_pipeline.features import node_features
+from ml_pipeline.scoring import ModelCache, load_model, score_batch
+from ml_pipeline.shm_ring import RingReader
+
+try:
+    from prometheus_client import Histogram, start_http_server
+except ImportError:
+    Histogram = None
+    start_http_server = None
+
+NODES_SUFFIX = ".nodes.parquet"
+
+if Histogram is not None:
+    WINDOW_LATENCY = Histogram(
+        "window_scorer_latency_seconds",
+        "Time from a window file being published to its scores being written",
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+    )
+else:
+    WINDOW_LATENCY = None
+
+
+def _output_paths(nodes_path: Path):
+    stem = nodes_path.name[: -len(NODES_SUFFIX)]
+    return nodes_path.with_name(stem + ".scores.parquet"), nodes_path.with_name(stem + ".alert.json")
+
+
+class _Inotify:
+    """Minimal ctypes inotify watch for files closed after writing or moved into a directory."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+
+    def read(self, timeout: float) -> Tuple[List[str], bool]:
+        """File names written/moved in since the last call (waits up to ``timeout``).
+
+        The flag is True if the kernel's event queue overflowed, i.e. some
+        events were lost.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        buf = os.read(self.fd, 64 * 1024)
+        names, overflow, offset = [], False, 0
+        while offset < len(buf):
+            _, mask, _, length = self._EVENT.unpack_from(buf, offset)
+            offset += self._EVENT.size
+            if mask & self.IN_Q_OVERFLOW:
+                overflow = True
+            elif length:
+                names.append(buf[offset:offset + length].rstrip(b"\0").decode())
+            offset += length
+        return names, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WindowScorer:
+    """Scores graph-builder windows in ``window_dir`` as they appear.
+
+    Args:
+        window_dir: directory the graph builder writes Parquet windows to
+        model_path: model file (any format ``scoring.load_model`` accepts);
+            hot-reloaded on change. Without one, a heuristic score is used.
+        threshold: score above which a node is reported in ``.alert.json``
+        poll_interval: seconds between directory scans when polling
+        settle_seconds: when scanning, files younger than this are assumed to
+            still be written and are picked up on a later scan
+        max_attempts: a window that fails to score is retried with
+            exponential backoff (``poll_interval * 2**attempt``), and given
+            up after this many attempts unless its file changes
+        rescan_every: with inotify, the directory is also scanned every this
+            many ``poll_interval``s (and after an event queue overflow), so
+            lost events and retries are not missed
+    """
+
+    def __init__(self, window_dir: str, model_path: Optional[str] = None, threshold: float = 0.5,
+                 poll_interval: float = 1.0, settle_seconds: float = 0.5, max_attempts: int = 5,
+                 rescan_every: int = 30):
+        self.window_dir = Path(window_dir)
+        self.model_cache = ModelCache(model_path, loader=load_model) if model_path else None
+        self.threshold = threshold
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.max_attempts = max_attempts
+        self.rescan_every = rescan_every
+        self._failures = {}  # path -> (mtime_ns, failed attempts, monotonic time of the next attempt)
+        self._ring = None
+
+    def pending_windows(self) -> List[Path]:
+        """Published windows that have no scores yet, oldest first."""
+        return sorted(
+            p for p in self.window_dir.glob("window_*" + NODES_SUFFIX)
+            if not _output_paths(p)[0].exists()
+        )
+
+    def score_window(self, nodes_path) -> pd.DataFrame:
+        """Score every node of one window and write ``.scores.parquet``/``.alert.json``."""
+        nodes_path = Path(nodes_path)
+        published = nodes_path.stat().st_mtime
+        return self._score_nodes(pd.read_parquet(nodes_path), nodes_path, published)
+
+    def score_ring_window(self, window) -> Optional[pd.DataFrame]:
+        """Score a window read from the shared-memory ring (``shm_ring.RingWindow``).
+
+        Outputs go to ``window_dir`` under the window's name. Returns None if
+        the writer reused the slot before the window was copied out.
+        """
+        nodes_df = window.nodes.to_pandas()
+        if not self._ring.still_valid(window):
+            print(f"Ring slot of {window.name} was overwritten while reading; skipped")
+            return None
+        return self._score_nodes(nodes_df, self.window_dir / (window.name + NODES_SUFFIX), window.published)
+
+    def _score_nodes(self, nodes_df: pd.DataFrame, nodes_path: Path, published: float) -> pd.DataFrame:
+        model, version = self.model_cache.get() if self.model_cache else (None, None)
+        scores = score_batch(model, node_features(nodes_df)) if len(nodes_df) else np.zeros(0)
+
+        out = pd.DataFrame({
+            "node_id": nodes_df.get("node_id"),
+            "pod_name": nodes_df.get("pod_name"),
+            "namespace": nodes_df.get("namespace"),
+            "score": np.asarray(scores, dtype=np.float64),
+        })
+        out["anomaly"] = out["score"] > self.threshold
+        scores_path, alert_path = _output_paths(nodes_path)
+        alerts = out[out["anomaly"]]
+        # Both files are renamed into place complete, so directory watchers never read a partial file
+        tmp = alert_path.with_name(f"{alert_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "window": nodes_path.name,
+                "model_version": version,
+                "threshold": self.threshold,
+                "alerts": alerts.to_dict(orient="records"),
+            }, f, indent=2)
+        os.replace(tmp, alert_path)
+        # Scores last: their presence marks the window as done
+        tmp = scores_path.with_name(f"{scores_path.name}.{os.getpid()}.tmp")
+        out.to_parquet(tmp, index=False)
+        os.replace(tmp, scores_path)
+
+        latency = time.time() - published
+        if WINDOW_LATENCY is not None:
+            WINDOW_LATENCY.observe(max(latency, 0.0))
+        print(f"Scored {nodes_path.name}: {len(out)} nodes, {len(alerts)} alerts, latency {latency*1000:.1f} ms")
+        return out
+
+    def _settled_windows(self) -> List[Path]:
+        cutoff = time.time() - self.settle_seconds
+        return [p for p in self.pending_windows() if p.stat().st_mtime <= cutoff]
+
+    def _new_windows(self) -> Iterator[List[Path]]:
+        """Yield lists of newly published (or unscored, on a rescan) window files, forever."""
+        try:
+            watch = _Inotify(str(self.window_dir))
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling {self.window_dir} every {self.poll_interval}s")
+            watch = None
+
+        yield self.pending_windows()  # catch up on windows published while we were down
+        if watch is None:
+            while True:
+                time.sleep(self.poll_interval)
+                yield self._settled_windows()
+        try:
+            waits = 0
+            while True:
+                names, overflow = watch.read(self.poll_interval)
+                yield [self.window_dir / n for n in names if n.startswith("window_") and n.endswith(NODES_SUFFIX)]
+                waits += 1
+                if overflow:
+                    print(f"inotify event queue overflowed; rescanning {self.window_dir}")
+                if overflow or waits >= self.rescan_every:
+                    waits = 0
+                    yield self._settled_windows()
+        finally:
+            watch.close()
+
+    def _due(self, path: Path) -> bool:
+        """False while a failed window waits for its retry, or once it has failed ``max_attempts`` times."""
+        failure = self._failures.get(path)
+        if failure is None:
+            return True
+        mtime_ns, attempts, retry_at = failure
+        try:
+            changed = path.stat().st_mtime_ns != mtime_ns
+        except OSError:
+            del self._failures[path]  # removed: nothing left to retry
+            return False
+        if changed:
+            del self._failures[path]  # rewritten: start over
+            return True
+        return attempts < self.max_attempts and time.monotonic() >= retry_at
+
+    def _failed(self, path: Path, error: Exception):
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        attempts = self._failures.get(path, (None, 0, 0.0))[1] + 1
+        delay = self.poll_interval * 2 ** attempts
+        self._failures[path] = (mtime_ns, attempts, time.monotonic() + delay)
+        if attempts >= self.max_attempts:
+            print(f"Error scoring {path}: {error}; giving up after {attempts} attempts")
+        else:
+            print(f"Error scoring {path}: {error}; retrying in {delay:.0f}s")
+
+    def run_ring(self, ring_path: str, max_windows: Optional[int] = None):
+        """Score windows published to a shared-memory ring (``graph_builder.shm_ring``)."""
+        while not os.path.exists(ring_path):
+            time.sleep(self.poll_interval)  # writer not started yet
+        self._ring = RingReader(ring_path)
+        done = 0
+        while True:
+            for window in self._ring.poll(self.poll_interval):
+                try:
+                    self.score_ring_window(window)
+                except Exception as e:
+                    print(f"Error scoring {window.name}: {e}")
+                done += 1
+                if max_windows is not None and done >= max_windows:
+                    return
+            sys.stdout.flush()
+
+    def run(self, max_windows: Optional[int] = None):
+        """Score windows as they are published (stops after ``max_windows`` if given)."""
+        done = 0
+        for paths in self._new_windows():
+            for path in paths:
+                if _output_paths(path)[0].exists() or not self._due(path):
+                    continue  # already scored (seen by both a scan and inotify), or waiting to be retried
+                try:
+                    self.score_window(path)
+                    self._failures.pop(path, None)
+                except Exception as e:
+                    self._failed(path, e)
+                done += 1
+                if max_windows is not None and done >= max_windows:
+                    return
+            sys.stdout.flush()
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--window-dir", required=True, help="Graph builder output directory")
+    p.add_argument("--model", default=os.getenv("MODEL_PATH"), help="Model file (default: $MODEL_PATH)")
+    p.add_argument("--threshold", type=float, default=float(os.getenv("ANOMALY_THRESHOLD", "0.5")))
+    p.add_argument("--poll-interval", type=float, default=1.0)
+    p.add_argument("--shm-ring", default=os.getenv("SHM_RING_PATH"),
+                   help="Read windows from this shared-memory ring instead of watching --window-dir")
+    p.add_argument("--metrics-port", type=int, default=None, help="Expose Prometheus metrics on this port")
+    args = p.parse_args()
+
+    if args.metrics_port is not None:
+        if start_http_server is None:
+            print("prometheus_client not installed; metrics disabled")
+        else:
+            start_http_server(args.metrics_port)
+    os.makedirs(args.window_dir, exist_ok=True)
+    scorer = WindowScorer(args.window_dir, args.model, args.threshold, args.poll_interval)
+    if args.shm_ring:
+        scorer.run_ring(args.shm_ring)
+    else:
+        scorer.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Binary request/response formats for bulk scoring.
+
+Two content types are accepted besides JSON:
+
+- ``application/vnd.apache.arrow.stream``: an Arrow IPC stream with a
+  ``features`` column (``fixed_size_list<float32>``) and optional
+  ``pod_name``/``namespace`` string columns. Responses carry ``score``
+  (float32) and ``anomaly`` (bool) columns.
+- ``application/octet-stream``: a little-endian float32 row-major matrix;
+  the feature count is given by the ``X-Num-Features`` header. Responses are
+  the float32 scores, one per row.
+
+Decoding does not copy the feature values: the returned matrix is a view
+into the request body.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+RAW_FLOAT32 = "application/octet-stream"
+BINARY_TYPES = (ARROW_STREAM, RAW_FLOAT32)
+NUM_FEATURES_HEADER = "X-Num-Features"
+
+
+def media_type(header: Optional[str]) -> str:
+    """Media type of a Content-Type/Accept header value without parameters."""
+    return (header or "").split(";")[0].split(",")[0].strip().lower()
+
+
+def response_type(content_type: str, accept: Optional[str]) -> str:
+    """Format to answer in: the ``Accept`` type if it is a binary one, else the request's."""
+    accepted = media_type(accept)
+    return accepted if accepted in BINARY_TYPES else content_type
+
+
+def decode_features(body, content_type: str, num_features: Optional[int] = None) -> Tuple[np.ndarray, dict]:
+    """Feature matrix (B, F) and optional row metadata columns from a binary body.
+
+    Metadata columns are left in Arrow form; read the rows you need with ``take``.
+    """
+    if content_type == RAW_FLOAT32:
+        if not num_features:
+            raise ValueError(f"{NUM_FEATURES_HEADER} header is required for {RAW_FLOAT32}")
+        if len(body) % (4 * num_features):
+            raise ValueError(f"Body of {len(body)} bytes is not a whole number of {num_features}-float32 rows")
+        return np.frombuffer(body, dtype="<f4").reshape(-1, num_features), {}
+
+    if content_type == ARROW_STREAM:
+        if pa is None:
+            raise ValueError("pyarrow is not installed; send raw float32 instead")
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        column = table.column("features")
+        if column.num_chunks != 1:
+            column = column.combine_chunks()  # several record batches: one copy
+        else:
+            column = column.chunk(0)
+        if not pa.types.is_fixed_size_list(column.type):
+            raise ValueError(f"features column must be fixed_size_list<float32>, got {column.type}")
+        width = column.type.list_size
+        values = column.flatten()
+        features = values.to_numpy(zero_copy_only=values.type == pa.float32() and values.null_count == 0)
+        meta = {name: table.column(name) for name in ("pod_name", "namespace") if name in table.column_names}
+        return np.asarray(features, dtype=np.float32).reshape(-1, width), meta
+
+    raise ValueError(f"Unsupported content type: {content_type}")
+
+
+def take(column, rows: np.ndarray, default: str) -> list:
+    """Values of a metadata column at ``rows`` (``default`` when the column is absent)."""
+    if column is None:
+        return [default] * len(rows)
+    return [v if v is not None else default for v in column.take(pa.array(rows)).to_pylist()]
+
+
+def categories(column, default: str):
+    """Distinct values of a metadata column and each row's index into them."""
+    encoded = column.fill_null(default).combine_chunks().dictionary_encode()
+    return encoded.dictionary.to_pylist(), encoded.indices.to_numpy(zero_copy_only=False)
+
+
+def encode_scores(scores: np.ndarray, anomaly: np.ndarray, content_type: str) -> bytes:
+    """Serialize per-row scores (and anomaly flags, for Arrow) in ``content_type``."""
+    scores = np.ascontiguousarray(scores, dtype="<f4")
+    if content_type == RAW_FLOAT32:
+        return scores.tobytes()
+    if content_type == ARROW_STREAM:
+        if pa is None:
+            raise ValueError("pyarrow is not installed; request raw float32 instead")
+        batch = pa.record_batch([pa.array(scores), pa.array(anomaly)], names=["score", "anomaly"])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+    raise ValueError(f"Unsupported content type: {content_type}")
+
+
+def encode_features(features: np.ndarray, content_type: str, pod_names=None, namespaces=None) -> bytes:
+    """Client-side counterpart of ``decode_features`` (e.g. for graph-builder traffic)."""
+    features = np.ascontiguousarray(features, dtype="<f4")
+    if content_type == RAW_FLOAT32:
+        return features.tobytes()
+    if content_type == ARROW_STREAM:
+        if pa is None:
+            raise ValueError("pyarrow is not installed")
+        columns = {"features": pa.FixedSizeListArray.from_arrays(pa.array(features.ravel()), features.shape[1])}
+        if pod_names is not None:
+            columns["pod_name"] = pa.array(pod_names, type=pa.string())
+        if namespaces is not None:
+            columns["namespace"] = pa.array(namespaces, type=pa.string())
+        table = pa.table(columns)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    raise ValueError(f"Unsupported content type: {content_type}")
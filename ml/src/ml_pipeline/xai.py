@@ -4,10 +4,17 @@ Uses SHAP for tabular features and a simplified feature attribution for graph mo
 Produces human-readable explanations for detected anomalies.
 """
 
-import torch
+import hashlib
+import threading
+from collections import OrderedDict
+
 import numpy as np
-import pandas as pd
 from typing import Dict, List, Tuple
+try:
+    import torch
+except ImportError:
+    # The slim inference image only uses the torch-free parts (attributions, cache)
+    torch = None
 try:
     import shap
 except ImportError:
@@ -107,6 +114,54 @@ class ExplanationGenerator:
         return explanation
 
 
+def reconstruction_attributions(errors: np.ndarray, top_k: int = 3) -> Dict:
+    """Share of the reconstruction error contributed by each feature of one sample."""
+    errors = np.asarray(errors, dtype=np.float64).ravel()
+    total = errors.sum()
+    shares = errors / total if total > 0 else np.zeros_like(errors)
+    return {
+        "feature_contributions": shares.tolist(),
+        "feature_errors": errors.tolist(),
+        "top_features": np.argsort(-shares)[:top_k].tolist(),
+    }
+
+
+class ExplanationCache:
+    """Thread-safe LRU of explanations keyed by (model version, feature hash)."""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_version, features: np.ndarray) -> Tuple:
+        digest = hashlib.blake2b(np.ascontiguousarray(features, dtype=np.float32).tobytes(), digest_size=16)
+        return model_version, digest.digest()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: Dict):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
 class MitreMapper:
     """Maps detected patterns to MITRE ATT&CK techniques."""
     
@@ -0,0 +1,51 @@
+from ml_pipeline.alerts import AlertDispatcher, FakeCustomObjectsApi, alert_name
+
+
+def test_repeated_alerts_are_deduplicated_and_rising_scores_update():
+    api = FakeCustomObjectsApi()
+    dispatcher = AlertDispatcher(api, suppression_window=60, rate_limit=1000)
+    for score in (0.6, 0.6, 0.55):
+        dispatcher.submit("web-1", "dev", score, "x")
+    assert dispatcher.flush()
+    dispatcher.submit("web-1", "dev", 0.5, "lower")
+    dispatcher.submit("web-1", "dev", 0.8, "higher")
+    assert dispatcher.flush()
+
+    assert [c[0] for c in api.calls] == ["create", "patch"]
+    obj = api.objects[("dev", alert_name("web-1"))]
+    assert obj["spec"]["confidence"] == 0.8
+    assert obj["spec"]["explanation"] == "higher"
+
+
+def test_failed_writes_are_retried_with_backoff():
+    api = FakeCustomObjectsApi(fail_next=2)
+    dispatcher = AlertDispatcher(api, rate_limit=1000, backoff=0.01)
+    dispatcher.submit("web-1", "dev", 0.9, "x")
+    assert dispatcher.flush()
+    assert len(api.calls) == 3
+    assert ("dev", alert_name("web-1")) in api.objects
+
+
+def test_full_queue_rejects_new_keys():
+    api = FakeCustomObjectsApi()
+    dispatcher = AlertDispatcher(api, max_queue=1, rate_limit=0.5, burst=1)
+    accepted = [dispatcher.submit(f"web-{i}", "dev", 0.9, "x") for i in range(5)]
+    assert accepted.count(False) >= 1
+    assert dispatcher.dropped >= 1
+
+
+def test_callable_explanation_is_only_evaluated_for_sent_alerts():
+    api = FakeCustomObjectsApi()
+    dispatcher = AlertDispatcher(api, suppression_window=60, rate_limit=1000)
+    evaluated = []
+
+    def explanation(text):
+        return lambda: evaluated.append(text) or text
+
+    dispatcher.submit("web-1", "dev", 0.9, explanation("first"))
+    assert dispatcher.flush()
+    dispatcher.submit("web-1", "dev", 0.5, explanation("suppressed"))
+    assert dispatcher.flush()
+
+    assert evaluated == ["first"]
+    assert api.objects[("dev", alert_name("web-1"))]["spec"]["explanation"] == "first"
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+
+os.environ.setdefault("ALERT_CLIENT", "fake")
+os.environ.setdefault("MODEL_PATH", "/nonexistent/model.pt")
+
+from ml_pipeline import inference, wire  # noqa: E402
+from ml_pipeline.asgi import InferenceASGI  # noqa: E402
+
+
+def _call(app, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({"type": "http", "method": method, "path": path}, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def _call_raw(app, path, body, headers):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({"type": "http", "method": "POST", "path": path, "headers": headers}, receive, send))
+    return sent[0]["status"], dict(sent[0]["headers"])[b"content-type"].decode(), sent[1]["body"]
+
+
+def test_routes_match_flask_handlers():
+    app = InferenceASGI(model_threads=1, max_pending=4)
+    status, body = _call(app, "GET", "/health")
+    assert status == 200 and body["status"] == "ok"
+
+    status, body = _call(app, "POST", "/score", {"pod_name": "p", "namespace": "ns", "features": [0.0, 0.0]})
+    assert status == 200 and body["anomaly"] is False
+
+    status, body = _call(app, "POST", "/score/batch", {"rows": [{"features": [0.0]}, {"features": [0.1]}]})
+    assert status == 200 and len(body["results"]) == 2
+
+    assert _call(app, "POST", "/score", {"namespace": "ns"})[0] == 400
+    assert _call(app, "GET", "/nope")[0] == 404
+
+
+def test_health_and_metrics_run_off_the_event_loop(monkeypatch):
+    import threading
+
+    threads = []
+    monkeypatch.setattr(inference, "health_payload", lambda: threads.append(threading.current_thread()) or {})
+    monkeypatch.setattr(inference, "metrics_payload",
+                        lambda: threads.append(threading.current_thread()) or (b"{}", "application/json"))
+    app = InferenceASGI(model_threads=1, max_pending=4)
+    assert _call(app, "GET", "/health")[0] == 200 and _call(app, "GET", "/metrics")[0] == 200
+    assert [t.name.startswith("model") for t in threads] == [True, True]
+
+
+def test_binary_bulk_roundtrip():
+    X = np.random.default_rng(0).normal(size=(100, 4)).astype(np.float32)
+    expected, _ = inference.score_rows({"rows": [{"features": r} for r in X.tolist()]})
+    expected = np.array([r["score"] for r in expected["results"]], dtype=np.float32)
+    app = InferenceASGI(model_threads=1, max_pending=4)
+
+    headers = [(b"content-type", wire.RAW_FLOAT32.encode()), (b"x-num-features", b"4")]
+    status, content_type, body = _call_raw(app, "/score/batch", wire.encode_features(X, wire.RAW_FLOAT32), headers)
+    assert status == 200 and content_type == wire.RAW_FLOAT32
+    np.testing.assert_allclose(np.frombuffer(body, dtype="<f4"), expected, rtol=1e-6)
+
+    headers = [(b"content-type", wire.ARROW_STREAM.encode())]
+    payload = wire.encode_features(X, wire.ARROW_STREAM, pod_names=[f"p{i}" for i in range(100)])
+    status, content_type, body = _call_raw(app, "/score/batch", payload, headers)
+    table = pa.ipc.open_stream(body).read_all()
+    assert status == 200 and content_type == wire.ARROW_STREAM
+    np.testing.assert_allclose(table.column("score").to_numpy(), expected, rtol=1e-6)
+    assert table.column("anomaly").to_pylist() == (expected > inference.anomaly_threshold()).tolist()
+
+
+def test_raw_body_without_feature_count_is_rejected():
+    headers = [(b"content-type", wire.RAW_FLOAT32.encode())]
+    status, _, body = _call_raw(InferenceASGI(), "/score/batch", b"\0" * 16, headers)
+    assert status == 400 and b"X-Num-Features" in body
+
+
+def test_metrics_record_phases_batch_sizes_and_namespaces():
+    app = InferenceASGI(model_threads=1, max_pending=4)
+    rows = [{"namespace": "metrics-a", "features": [0.0]}, {"namespace": "metrics-b", "features": [9.0]}]
+    _call(app, "POST", "/score/batch", {"rows": rows})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app({"type": "http", "method": "GET", "path": "/metrics"}, None, send))
+    text = sent[1]["body"].decode()
+    assert 'inference_phase_duration_seconds_count{endpoint="score_batch",phase="forward"}' in text
+    assert 'inference_batch_size_bucket{endpoint="score_batch",le="2.0"}' in text
+    assert 'inference_score_bucket{le="5.0",namespace="metrics-b"} 0.0' in text
+    assert 'inference_score_bucket{le="10.0",namespace="metrics-b"} 1.0' in text
+    assert 'inference_score_bucket{le="0.01",namespace="metrics-a"} 1.0' in text
+    assert "inference_alert_queue_depth" in text
+
+
+def test_explain_attributes_error_and_caches_repeats():
+    app = InferenceASGI(model_threads=1, max_pending=4)
+    status, first = _call(app, "POST", "/explain", {"features": [3.0, 0.0, 4.0]})
+    assert status == 200 and not first["cached"]
+    assert first["top_features"][:2] == ["feature_2", "feature_0"]
+    assert abs(first["attributions"]["feature_2"] - 16 / 25) < 1e-6
+
+    status, second = _call(app, "POST", "/explain", {"features": [3.0, 0.0, 4.0]})
+    assert second["cached"] and second["explanation"] == first["explanation"]
+
+
+def test_microbatched_requests_fill_a_batch_beyond_the_pool_size(monkeypatch):
+    from ml_pipeline.batching import MicroBatcher
+
+    sizes = []
+
+    def score_fn(X):
+        sizes.append(len(X))
+        return np.linalg.norm(X, axis=1)
+
+    monkeypatch.setattr(inference, "MICROBATCHER", MicroBatcher(score_fn, max_batch_size=8, max_wait_ms=500))
+    app = InferenceASGI(model_threads=1, max_pending=4)
+
+    async def call(i):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": json.dumps({"features": [float(i), 0.0]}).encode()}
+
+        async def send(message):
+            sent.append(message)
+
+        await app({"type": "http", "method": "POST", "path": "/score"}, receive, send)
+        return sent[0]["status"], json.loads(sent[1]["body"])
+
+    async def main():
+        return await asyncio.gather(*(call(i) for i in range(8)))
+
+    results = asyncio.run(main())
+    assert sizes == [8]  # one batch, though the pool has a single thread
+    assert [body["score"] for _, body in results] == [float(i) for i in range(8)]
+    assert all(status == 200 for status, _ in results)
+    assert _call(app, "POST", "/score", {"features": [[1.0], [2.0, 3.0]]})[0] == 400
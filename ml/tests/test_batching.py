@@ -0,0 +1,36 @@
+import threading
+
+import numpy as np
+from ml_pipeline.batching import MicroBatcher
+
+
+def test_concurrent_rows_are_merged_into_one_call():
+    calls = []
+
+    def score_fn(X):
+        calls.append(len(X))
+        return X.sum(axis=1)
+
+    batcher = MicroBatcher(score_fn, max_batch_size=64, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.score([i, 1.0])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: i + 1.0 for i in range(16)}
+    assert sum(calls) == 16
+    assert len(calls) < 16
+
+
+def test_rows_of_different_lengths_are_scored_separately():
+    batcher = MicroBatcher(lambda X: X.mean(axis=1), max_wait_ms=20)
+    a = batcher.submit(np.ones(3))
+    b = batcher.submit(np.ones(5) * 2)
+    assert a.result() == 1.0
+    assert b.result() == 2.0
@@ -0,0 +1,30 @@
+import pytest
+import torch
+
+from ml_pipeline.checkpoint import EarlyStopping
+from ml_pipeline.train import train_autoencoder
+
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path):
+    train_autoencoder(str(tmp_path / "full"), epochs=4, patience=0)
+    train_autoencoder(str(tmp_path / "resumed"), epochs=2, patience=0)
+    # Same out dir: the second call starts from the epoch-2 checkpoint (model, optimizer and RNG state)
+    train_autoencoder(str(tmp_path / "resumed"), epochs=4, patience=0, resume=True)
+    full = torch.load(tmp_path / "full" / "autoencoder.pt")
+    resumed = torch.load(tmp_path / "resumed" / "autoencoder.pt")
+    for name, value in full.items():
+        assert torch.equal(value, resumed[name]), name
+    assert torch.load(tmp_path / "resumed" / "autoencoder.ckpt", weights_only=False)["epoch"] == 4
+
+
+def test_early_stopping_keeps_best_weights():
+    model = torch.nn.Linear(2, 1)
+    stopper = EarlyStopping(patience=2)
+    stops = []
+    for epoch, loss in enumerate([1.0, 0.5, 0.6, 0.4, 0.45, 0.41]):
+        with torch.no_grad():
+            model.bias.fill_(loss)
+        stops.append(stopper.step(epoch, loss, model))
+    assert stops == [False, False, False, False, False, True]
+    assert stopper.best_epoch == 3
+    assert stopper.restore(model).bias.item() == pytest.approx(0.4)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader
+
+from ml_pipeline.data import (
+    HistorySequences,
+    PodHistory,
+    WindowRowStream,
+    WindowSequenceStream,
+    compute_feature_stats,
+    window_files,
+)
+from ml_pipeline.models import Autoencoder
+from ml_pipeline.train import fold_standardization
+
+
+def _windows(tmp_path, nodes_per_window):
+    for w, nodes in enumerate(nodes_per_window):
+        pd.DataFrame({
+            "node_id": nodes,
+            "bytes": [100 * (w + 1)] * len(nodes),
+            "outgoing_unique_dst_count": [w] * len(nodes),
+            "flow_count": [i + 1 for i in range(len(nodes))],
+        }).to_parquet(tmp_path / f"window_{1000 + 30 * w}.nodes.parquet", index=False)
+    return window_files(tmp_path)
+
+
+def test_row_stream_workers_read_every_row_once(tmp_path):
+    files = _windows(tmp_path, [[f"pod-{i}" for i in range(5)]] * 6)
+    stats = compute_feature_stats(files)
+    loader = DataLoader(WindowRowStream(files, stats=stats, shuffle_buffer=7), batch_size=4, num_workers=2)
+    rows = torch.cat(list(loader))
+    assert rows.shape == (30, 3)
+    np.testing.assert_allclose(rows.mean(dim=0), 0, atol=1e-5)
+
+
+def test_sequences_follow_nodes_across_consecutive_windows(tmp_path):
+    # pod-b is missing from the third window, so its history restarts
+    files = _windows(tmp_path, [["pod-a", "pod-b"], ["pod-a", "pod-b"], ["pod-a"], ["pod-a", "pod-b"]])
+    single = list(WindowSequenceStream(files, seq_len=2))
+    assert len(single) == 4  # pod-a: 3, pod-b: 1
+    sharded = torch.cat(list(DataLoader(WindowSequenceStream(files, seq_len=2), batch_size=8, num_workers=2)))
+    assert sorted(map(tuple, sharded.reshape(4, -1).tolist())) == sorted(map(tuple, np.stack(single).reshape(4, -1).tolist()))
+
+
+def test_pod_history_sequences_are_views_matching_the_stream(tmp_path):
+    files = _windows(tmp_path, [["pod-a", "pod-b"], ["pod-a", "pod-b", "pod-c"], ["pod-a", "pod-c"],
+                                ["pod-a", "pod-b", "pod-c"], ["pod-a", "pod-b"]])
+    stats = compute_feature_stats(files)
+    history = PodHistory.from_files(files, stats)
+    # pod-b misses the third window: two segments
+    assert history.pods == ["pod-a", "pod-b", "pod-b", "pod-c"]
+    assert history.first_windows.tolist() == [0, 0, 3, 1]
+
+    seqs = history.sequences(0, 2, stride=2)
+    assert seqs.shape == (2, 2, 3) and np.shares_memory(seqs, history.features)
+
+    ds = HistorySequences(history, seq_len=2)
+    expected = np.stack(list(WindowSequenceStream(files, seq_len=2, stats=stats)))
+    items = np.stack([ds[i] for i in range(len(ds))])
+    assert len(ds) == len(expected) == 8
+    assert np.shares_memory(ds[3], history.features)
+    assert sorted(map(tuple, items.reshape(8, -1).tolist())) == sorted(map(tuple, expected.reshape(8, -1).tolist()))
+    batches = list(DataLoader(ds, batch_size=3, collate_fn=ds.collate))
+    np.testing.assert_array_equal(torch.cat(batches).numpy(), items)
+
+
+def test_folded_standardization_takes_raw_features():
+    model = Autoencoder(input_dim=3, hidden_dims=[8, 4]).eval()
+    mean, std = np.array([1.0, -2.0, 5.0]), np.array([0.5, 3.0, 2.0])
+    x = torch.randn(10, 3) * torch.tensor(std, dtype=torch.float32) + torch.tensor(mean, dtype=torch.float32)
+    m, s = torch.tensor(mean, dtype=torch.float32), torch.tensor(std, dtype=torch.float32)
+    with torch.no_grad():
+        expected = model((x - m) / s) * s + m
+        folded = fold_standardization(model, mean, std)(x)
+    torch.testing.assert_close(folded, expected, rtol=1e-5, atol=1e-5)
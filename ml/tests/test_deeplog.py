@@ -0,0 +1,52 @@
+import numpy as np
+import torch
+
+from ml_pipeline.deeplog import DeepLogScorer
+from ml_pipeline.models import DeepLogPredictor
+from ml_pipeline.syscalls import SyscallVocab
+
+SYSCALLS = ["read", "write", "open", "close", "mmap", "connect", "sendto", "execve"]
+
+
+def _reference_flags(model, tokens, top_k):
+    """Anomaly flags from full-sequence forward passes (what the scorer must reproduce)."""
+    with torch.no_grad():
+        first = model.fc(torch.zeros(1, model.lstm.hidden_size))[0]
+        logits = torch.cat([first[None], model(torch.tensor([tokens]))[0, :-1]])
+    topk = logits.topk(top_k, dim=1).indices
+    return ~(topk == torch.tensor(tokens)[:, None]).any(dim=1).numpy()
+
+
+def test_incremental_scoring_matches_full_sequence_for_interleaved_processes():
+    torch.manual_seed(0)
+    vocab = SyscallVocab(SYSCALLS)
+    model = DeepLogPredictor(len(vocab), emb_dim=8, hidden_dim=16).eval()
+    rng = np.random.default_rng(0)
+    streams = {("pod-a", 1): list(rng.choice(SYSCALLS, 40)), ("pod-b", 2): list(rng.choice(SYSCALLS, 25))}
+    # Interleave the two processes' events
+    order = rng.permutation([key for key, calls in streams.items() for _ in calls])
+    cursors = {key: 0 for key in streams}
+    events = []
+    for pod, pid in order:
+        key = (pod, int(pid))
+        events.append((pod, int(pid), streams[key][cursors[key]]))
+        cursors[key] += 1
+
+    scorer = DeepLogScorer(model, vocab, top_k=3)
+    flags = np.concatenate([scorer.score_events(events[i:i + 7]) for i in range(0, len(events), 7)])
+    for key, calls in streams.items():
+        mine = [i for i, e in enumerate(events) if (e[0], e[1]) == key]
+        expected = _reference_flags(model, [vocab.encode(c) for c in calls], 3)
+        np.testing.assert_array_equal(flags[mine], expected)
+
+
+def test_least_recently_active_process_is_evicted_and_exits_free_slots():
+    vocab = SyscallVocab(SYSCALLS)
+    scorer = DeepLogScorer(DeepLogPredictor(len(vocab), emb_dim=4, hidden_dim=8), vocab, max_processes=2)
+    scorer.score("pod", 1, "read")
+    scorer.score("pod", 2, "read")
+    scorer.score("pod", 1, "write")
+    scorer.score("pod", 3, "open")  # evicts pid 2
+    assert scorer.evicted == 1 and set(scorer._slots) == {("pod", 1), ("pod", 3)}
+    scorer.score("pod", 3, "exit_group")
+    assert len(scorer) == 1
@@ -0,0 +1,40 @@
+import json
+
+import pandas as pd
+import torch
+
+from ml_pipeline import distributed
+from ml_pipeline.models import Autoencoder
+from ml_pipeline.train import fold_standardization, train_from_windows
+
+
+def _train_rank(data_dir, out_dir):
+    model = train_from_windows(data_dir, out_dir, "ae", epochs=2, batch_size=8, num_workers=0,
+                               val_fraction=0, shuffle_buffer=16)
+    torch.save(model.state_dict(), f"{out_dir}/rank{distributed.rank()}.pt")
+
+
+def test_two_ranks_on_uneven_shards_end_with_the_same_model(tmp_path):
+    data = tmp_path / "windows"
+    data.mkdir()
+    # 5 windows over 2 ranks: one rank gets 3 files and more steps than the other
+    for w in range(5):
+        n = 10 + 7 * w
+        pd.DataFrame({
+            "node_id": [f"pod-{i}" for i in range(n)],
+            "bytes": [100.0 * (i + w) for i in range(n)],
+            "outgoing_unique_dst_count": [i % 4 for i in range(n)],
+            "flow_count": [w + 1] * n,
+        }).to_parquet(data / f"window_{1000 + 30 * w}.nodes.parquet", index=False)
+
+    distributed.spawn(_train_rank, 2, str(data), str(tmp_path))
+
+    stats = json.loads((data / "feature_stats.json").read_text())
+    other = Autoencoder(input_dim=3, hidden_dims=[16, 8])
+    other.load_state_dict(torch.load(tmp_path / "rank1.pt"))
+    # Rank 0 returns the model with standardization folded in; rank 1 returns the raw weights
+    fold_standardization(other, stats["mean"], stats["std"])
+    main = torch.load(tmp_path / "rank0.pt")
+    for name, value in other.state_dict().items():
+        assert torch.allclose(value, main[name], atol=1e-5), name
+    assert (tmp_path / "autoencoder.pt").exists()
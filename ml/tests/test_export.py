@@ -0,0 +1,53 @@
+import pytest
+import torch
+from ml_pipeline.export import check_parity, export_model, load_artifact, load_weights
+from ml_pipeline.models import Autoencoder, LSTMAE
+
+
+def _trained(which, tmp_path):
+    """A model with non-default sizes, reloaded from its state dict as the export CLI does."""
+    torch.manual_seed(0)
+    model = Autoencoder(input_dim=5, hidden_dims=[24, 6]) if which == "ae" else LSTMAE(input_dim=3, hidden_dim=12)
+    torch.save(model.state_dict(), tmp_path / "weights.pt")
+    return load_weights(which, str(tmp_path / "weights.pt"), seq_len=7)
+
+
+@pytest.mark.parametrize("which", ["ae", "lstm"])
+@pytest.mark.parametrize("quantized", [False, True])
+def test_torchscript_export_matches_eager_scores(tmp_path, which, quantized):
+    model, make_batch = _trained(which, tmp_path)
+    path = export_model(model, make_batch, str(tmp_path / "model.ts"), "torchscript", quantized)
+    check_parity(model, load_artifact(path), make_batch(32))
+
+
+def test_onnx_export_matches_eager_scores(tmp_path):
+    pytest.importorskip("onnxruntime")
+    model, make_batch = _trained("ae", tmp_path)
+    path = export_model(model, make_batch, str(tmp_path / "model.onnx"), "onnx")
+    check_parity(model, load_artifact(path), make_batch(32), rtol=1e-4, atol=1e-6)
+
+
+def test_load_weights_infers_sizes(tmp_path):
+    model, make_batch = _trained("lstm", tmp_path)
+    assert model.hidden_dim == 12 and make_batch(2).shape == (2, 7, 3)
+    model, make_batch = _trained("ae", tmp_path)
+    assert [m.out_features for m in model.net if hasattr(m, "out_features")] == [24, 6, 24, 5]
+
+
+def test_failed_parity_keeps_the_existing_artifact(tmp_path, monkeypatch):
+    from ml_pipeline import export
+
+    model, make_batch = _trained("ae", tmp_path)
+    path = export_model(model, make_batch, str(tmp_path / "model.ts"))
+    before = (tmp_path / "model.ts").read_bytes()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Score parity check failed")
+
+    monkeypatch.setattr(export, "check_parity", fail)
+    with torch.no_grad():
+        model.net[0].weight.add_(1.0)
+    with pytest.raises(AssertionError):
+        export_model(model, make_batch, path)
+    assert (tmp_path / "model.ts").read_bytes() == before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["model.ts", "weights.pt"]
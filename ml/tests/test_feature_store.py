@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+
+from ml_pipeline.feature_store import open_table
+from ml_pipeline.tgnn import load_parquet_graphs
+
+
+def test_table_reconciles_columns_and_round_trips_frames(tmp_path):
+    one = pd.DataFrame({"pod": ["a", "b", None], "bytes": [1, 2, 3]})
+    two = pd.DataFrame({"bytes": [4.5, np.nan], "flows": [7, 8], "pod": ["c", "a"]})
+    one.to_csv(tmp_path / "one.csv", index=False)
+    two.to_parquet(tmp_path / "two.parquet")
+    table = open_table([tmp_path / "one.csv", tmp_path / "two.parquet"], str(tmp_path / "cache"), chunk_rows=2)
+
+    assert table.numeric_columns == ["bytes", "flows"] and table.string_columns == ["pod"]
+    assert table.numeric.flags.f_contiguous and table.numeric.shape == (5, 2)
+    np.testing.assert_array_equal(table.column("flows"), [np.nan, np.nan, np.nan, 7, 8])
+    assert table.categories["pod"] == ["a", "b", "c"]
+    assert list(table.column("pod")) == ["a", "b", None, "c", "a"]
+    pd.testing.assert_frame_equal(table.frame(str(tmp_path / "two.parquet")), two, check_dtype=False)
+    assert list(table.frame(0).columns) == ["pod", "bytes"]
+
+
+def test_cache_is_reused_until_a_source_changes(tmp_path, capsys):
+    src = tmp_path / "data.csv"
+    pd.DataFrame({"x": [1, 2]}).to_csv(src, index=False)
+    open_table([src], str(tmp_path / "cache"))
+    assert "Building" in capsys.readouterr().out
+    assert open_table([src], str(tmp_path / "cache")).n_rows == 2
+    assert "Building" not in capsys.readouterr().out
+
+    pd.DataFrame({"x": [1, 2, 3]}).to_csv(src, index=False)
+    os.utime(src, ns=(1, 1))
+    assert open_table([src], str(tmp_path / "cache")).n_rows == 3
+    assert "Building" in capsys.readouterr().out
+
+
+def _write_windows(directory, windows, first=0):
+    for w, (nodes, edges) in enumerate(windows, first):
+        pd.DataFrame({
+            "node_id": nodes,
+            "bytes": [10 * (i + w) for i in range(len(nodes))],
+            "outgoing_unique_dst_count": [i for i in range(len(nodes))],
+            "flow_count": [w + 1] * len(nodes),
+        }).to_parquet(directory / f"window_{1000 + 30 * w}.nodes.parquet", index=False)
+        pd.DataFrame(edges, columns=["src", "dst"]).to_parquet(
+            directory / f"window_{1000 + 30 * w}.edges.parquet", index=False)
+
+
+def test_tgnn_windows_from_the_store(tmp_path):
+    windows = [(["a", "b", "c"], [("a", "b"), ("b", "10.0.0.1"), ("c", "a")]), (["c", "d"], [("d", "c")]), (["a"], [])]
+    _write_windows(tmp_path, windows)
+    for graphs in (load_parquet_graphs(str(tmp_path)), load_parquet_graphs(str(tmp_path))):
+        assert [g.node_id for g in graphs] == [nodes for nodes, _ in windows]
+        assert [g.global_id.tolist() for g in graphs] == [[0, 1, 2], [2, 3], [0]]
+        assert graphs[0].edge_index.tolist() == [[0, 2], [1, 0]]  # the edge to an IP is dropped
+        assert graphs[1].edge_index.tolist() == [[1], [0]]
+        assert graphs[2].edge_index.shape == (2, 0)
+        assert torch.allclose(graphs[0].x.mean(dim=0), torch.zeros(3), atol=1e-6)
+
+
+def test_file_failing_half_way_leaves_no_columns_or_categories(tmp_path):
+    pd.DataFrame({"pod": ["a", "b"], "bytes": [1, 2]}).to_csv(tmp_path / "good.csv", index=False)
+    # The third line is not JSON: parsing fails after the first chunk was stored
+    (tmp_path / "bad.jsonl").write_text('{"pod": "z", "extra": 1, "bytes": 5}\n{"pod": "y", "extra": 2, "bytes": 6}\n'
+                                        '{not json\n')
+    table = open_table([tmp_path / "good.csv", tmp_path / "bad.jsonl"], str(tmp_path / "cache"), chunk_rows=2)
+
+    assert table.n_rows == 2 and table.columns == ["pod", "bytes"]
+    assert table.categories["pod"] == ["a", "b"]
+    assert [s["path"] for s in table.sources] == [str(tmp_path / "good.csv")]
+    assert sorted(os.listdir(tmp_path / "cache")) == ["categories.json", "codes", "manifest.json", "numeric.npy"]
+
+
+def test_new_window_is_the_only_file_parsed(tmp_path, monkeypatch):
+    from ml_pipeline import feature_store
+
+    windows = [(["a", "b", "c"], [("a", "b"), ("c", "a")]), (["c", "d"], [("d", "c")]), (["a"], [])]
+    _write_windows(tmp_path, windows)
+    load_parquet_graphs(str(tmp_path))
+
+    parsed = []
+    iter_chunks = feature_store.iter_chunks
+    monkeypatch.setattr(feature_store, "iter_chunks", lambda path, *a: parsed.append(path) or iter_chunks(path, *a))
+    _write_windows(tmp_path, [(["e", "b"], [("e", "b")])], first=3)
+    graphs = load_parquet_graphs(str(tmp_path))
+    assert sorted(os.path.basename(p) for p in parsed) == ["window_1090.edges.parquet", "window_1090.nodes.parquet"]
+
+    fresh = load_parquet_graphs(str(tmp_path), cache_dir=str(tmp_path / "fresh"))
+    assert [g.global_id.tolist() for g in graphs] == [g.global_id.tolist() for g in fresh] == [[0, 1, 2], [2, 3], [0],
+                                                                                             [4, 1]]
+    for g, f in zip(graphs, fresh):
+        assert g.node_id == f.node_id and torch.equal(g.edge_index, f.edge_index)
+        np.testing.assert_array_equal(g.x.numpy(), f.x.numpy())
+
+
+def test_changed_file_reparses_it_and_the_files_after_it(tmp_path, capsys):
+    paths = [tmp_path / f"{i}.csv" for i in range(3)]
+    frames = [pd.DataFrame({"pod": ["a", "b"], "x": [1, 2]}), pd.DataFrame({"pod": ["c"], "new": ["n"]}),
+              pd.DataFrame({"pod": ["d", "a"], "x": [5, 6]})]
+    for path, df in zip(paths, frames):
+        df.to_csv(path, index=False)
+    open_table(paths, str(tmp_path / "cache"))
+
+    pd.DataFrame({"pod": ["z"], "x": [9]}).to_csv(paths[1], index=False)
+    os.utime(paths[1], ns=(1, 1))
+    capsys.readouterr()
+    table = open_table(paths, str(tmp_path / "cache"))
+    assert "1 files unchanged, parsing 2" in capsys.readouterr().out
+    # The column and category of the old second file are gone, as in a fresh build
+    fresh = open_table(paths, str(tmp_path / "fresh"))
+    assert table.columns == fresh.columns == ["pod", "x"]
+    assert table.categories == fresh.categories == {"pod": ["a", "b", "z", "d"]}
+    np.testing.assert_array_equal(table.numeric, fresh.numeric)
+    np.testing.assert_array_equal(table.codes["pod"], fresh.codes["pod"])
+    assert table.sources == fresh.sources
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+from ml_pipeline.metrics import SCORE_BUCKETS, _bulk_supported, observe_many  # noqa: E402
+
+
+def _histograms():
+    registry = prometheus_client.CollectorRegistry()
+    make = lambda name: prometheus_client.Histogram(name, "test", ["ns"], buckets=SCORE_BUCKETS,  # noqa: E731
+                                                    registry=registry)
+    return registry, make("bulk").labels("a"), make("single").labels("a")
+
+
+def test_observe_many_matches_per_value_observe():
+    registry, bulk, single = _histograms()
+    # Fails on a prometheus_client upgrade that changes the internals observe_many writes to
+    assert _bulk_supported(bulk)
+    values = np.concatenate([np.random.default_rng(0).exponential(2.0, 1000), SCORE_BUCKETS, [0.0, 1e6]])
+    observe_many(bulk, values)
+    for v in values:
+        single.observe(v)
+
+    samples = lambda name: {(s.name.replace(name, ""), tuple(sorted(s.labels.items()))): s.value  # noqa: E731
+                            for m in registry.collect() if m.name == name
+                            for s in m.samples if not s.name.endswith("_created")}
+    assert samples("bulk") == pytest.approx(samples("single"))
+    assert registry.get_sample_value("bulk_count", {"ns": "a"}) == len(values)
@@ -0,0 +1,25 @@
+import numpy as np
+import torch
+from ml_pipeline.models import Autoencoder, LSTMAE
+from ml_pipeline.numpy_models import export_npz, load_npz_model
+
+
+def _torch_scores(model, x):
+    with torch.no_grad():
+        return ((model(x) - x) ** 2).reshape(len(x), -1).mean(dim=1).numpy()
+
+
+def test_numpy_forward_matches_torch(tmp_path):
+    torch.manual_seed(0)
+    for which, model, x in (("ae", Autoencoder(input_dim=16), torch.randn(16, 16)),
+                            ("lstm", LSTMAE(input_dim=8), torch.randn(16, 50, 8))):
+        model.eval()
+        path = export_npz(model, str(tmp_path / f"{which}.npz"))
+        np.testing.assert_allclose(load_npz_model(path).score(x.numpy()), _torch_scores(model, x), rtol=1e-4, atol=1e-6)
+
+
+def test_multi_layer_lstm_ae(tmp_path):
+    model = LSTMAE(input_dim=4, hidden_dim=8, num_layers=2).eval()
+    path = export_npz(model, str(tmp_path / "lstm2.npz"))
+    x = torch.randn(3, 7, 4)
+    np.testing.assert_allclose(load_npz_model(path).score(x.numpy()), _torch_scores(model, x), rtol=1e-4, atol=1e-6)
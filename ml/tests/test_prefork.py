@@ -0,0 +1,88 @@
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import urllib.request
+
+from ml_pipeline.prefork import PreforkServer
+from ml_pipeline.scoring import ModelCache
+from ml_pipeline.thresholds import ThresholdCalibrator
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(tmp_path, port):
+    def loader(path):
+        with open(tmp_path / "loads.log", "a") as f:
+            f.write(f"{os.getpid()}\n")
+        return {"weights": open(path).read()}
+
+    cache = ModelCache(str(tmp_path / "model.pt"), loader=loader)
+    calibrator = ThresholdCalibrator(target_rate=0.01, path=str(tmp_path / "thresholds.json"), save_interval=3600)
+
+    def app(environ, start_response):
+        model, _ = cache.get()
+        calibrator.observe("v", "ns", [1.0])
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return [json.dumps({"pid": os.getpid(), "model": model["weights"], "model_id": id(model)}).encode()]
+
+    PreforkServer(app, cache, "127.0.0.1", port, workers=2, reload_interval=0.2, calibrator=calibrator).serve()
+
+
+def _get(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as r:
+                return json.loads(r.read())
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def test_workers_share_the_master_model_roll_on_reload_and_merge_thresholds(tmp_path):
+    (tmp_path / "model.pt").write_text("v1")
+    port = _free_port()
+    master = multiprocessing.get_context("fork").Process(target=_serve, args=(tmp_path, port))
+    master.start()
+    try:
+        first = [_get(port) for _ in range(20)]
+        assert {r["model"] for r in first} == {"v1"}
+        assert master.pid not in {r["pid"] for r in first}
+        # Loaded once, by the master: every worker serves that same object
+        assert (tmp_path / "loads.log").read_text().split() == [str(master.pid)]
+        assert len({r["model_id"] for r in first}) == 1
+
+        (tmp_path / "model.pt").write_text("v2 (retrained)")
+        polls, deadline = [_get(port)], time.monotonic() + 20
+        while polls[-1]["model"] != "v2 (retrained)":
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+            polls.append(_get(port))
+        time.sleep(1)  # let the old workers drain and exit
+        rolled = [_get(port) for _ in range(10)]
+        assert {r["model"] for r in rolled} == {"v2 (retrained)"}
+        assert not {r["pid"] for r in rolled} & {r["pid"] for r in first}
+
+        # A crashed worker is replaced
+        victim = rolled[0]["pid"]
+        os.kill(victim, signal.SIGKILL)
+        later = [_get(port) for _ in range(10)]
+        assert victim not in {r["pid"] for r in later}
+    finally:
+        os.kill(master.pid, signal.SIGTERM)
+        master.join(20)
+    assert master.exitcode == 0
+
+    # Every worker's scores end up in the merged file, except those the killed worker had not saved yet
+    responses = first + polls + rolled + later
+    saved = ThresholdCalibrator(target_rate=0.01, path=str(tmp_path / "thresholds.json"))._sketches[("v", "ns")].n
+    assert saved == sum(r["pid"] != victim for r in responses)
+    assert [p.name for p in tmp_path.iterdir() if ".worker-" in p.name] == []
@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+
+from ml_pipeline.scoring import ModelCache
+
+
+def _slow_loader(path):
+    time.sleep(0.2)
+    with open(path) as f:
+        return f.read()
+
+
+def test_concurrent_cold_start_waits_for_the_first_load(tmp_path):
+    path = tmp_path / "model.pt"
+    path.write_text("v1")
+    cache = ModelCache(str(path), loader=_slow_loader, check_interval=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [model for model, _ in results] == ["v1"] * 4
+    assert len({version for _, version in results}) == 1
+
+
+def test_hot_reload_swaps_in_a_changed_file(tmp_path):
+    path = tmp_path / "model.pt"
+    path.write_text("v1")
+    loads = []
+    cache = ModelCache(str(path), loader=lambda p: loads.append(p) or open(p).read(), check_interval=0)
+    model, version = cache.get()
+    assert model == "v1" and cache.get() == (model, version) and len(loads) == 1  # unchanged: no reload
+
+    path.write_text("v2 longer")
+    os.utime(path, ns=(1, 1))
+    assert cache.get()[0] == "v2 longer" and cache.version != version
+
+    path.unlink()
+    assert cache.get()[0] == "v2 longer"  # a missing file keeps the current model
+
+
+def test_broken_file_is_loaded_once_per_interval(tmp_path):
+    path = tmp_path / "model.pt"
+    path.write_text("half-written")
+    loads = []
+
+    def broken_loader(p):
+        loads.append(p)
+        time.sleep(0.1)
+        raise EOFError("truncated file")
+
+    cache = ModelCache(str(path), loader=broken_loader, check_interval=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results += [cache.get() for _ in range(10)]
+    assert results == [(None, None)] * 14  # callers fall back to the heuristic
+    assert len(loads) == 1
+
+    missing = ModelCache(str(tmp_path / "missing.pt"), check_interval=60)
+    assert missing.get() == (None, None)
+    assert missing._next_check > time.monotonic()  # not stat'ed again on every request
+
+
+def test_read_only_request_buffer_is_scored_without_a_global_warning_filter():
+    import warnings
+
+    import numpy as np
+
+    from ml_pipeline.models import Autoencoder
+    from ml_pipeline.scoring import feature_errors, score_batch
+
+    model = Autoencoder(input_dim=4, hidden_dims=(3, 2)).eval()
+    body = np.arange(8, dtype="<f4").tobytes()
+    rows = np.frombuffer(body, dtype="<f4").reshape(-1, 4)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        assert score_batch(model, rows).shape == (2,)
+        assert feature_errors(model, rows).shape == (2, 4)
+        assert not caught
+    # The suppression is local to scoring: importing it installs no process-wide filter
+    assert not [f for f in warnings.filters if f[1] is not None and "not writable" in f[1].pattern]
@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+
+from ml_pipeline.syscalls import UNK, DeepLogWindows, SyscallVocab, TokenStore, build_store
+
+
+def _write_events(path, events):
+    with open(path, "w") as f:
+        for pod, pid, syscall in events:
+            f.write(json.dumps({"pod": pod, "pid": pid, "syscall": syscall, "ret": 0}) + "\n")
+
+
+def test_store_caps_vocabulary_and_groups_processes(tmp_path):
+    events = [("a", 1, "read"), ("b", 2, "write"), ("a", 1, "read"), ("a", 1, "mmap"),
+              ("b", 2, "read"), ("b", 2, "execve"), ("a", 1, "write")]
+    _write_events(tmp_path / "e.jsonl", events)
+    store = build_store([str(tmp_path / "e.jsonl")], str(tmp_path / "store"), max_vocab=3)
+
+    # read (3) and write (2) are kept; mmap and execve fall back to <unk>
+    assert store.vocab.tokens == [UNK, "read", "write"]
+    assert store.keys == [("a", 1), ("b", 2)]
+    assert [store.vocab.decode(t) for t in store[0]] == ["read", "read", UNK, "write"]
+    assert [store.vocab.decode(t) for t in store[1]] == ["write", "read", UNK]
+    assert store[0].dtype == np.uint16 and isinstance(store[0], np.memmap)
+
+    reopened = TokenStore(str(tmp_path / "store"))
+    np.testing.assert_array_equal(reopened.tokens, store.tokens)
+
+
+def test_existing_vocab_and_buffer_flushes(tmp_path):
+    events = [("a", 1, "read"), ("a", 1, "open"), ("b", 2, "write"), ("a", 1, "close")]
+    _write_events(tmp_path / "e.jsonl", events)
+    vocab = SyscallVocab(["read", "write", "close"])
+    store = build_store([str(tmp_path / "e.jsonl")], str(tmp_path / "store"), vocab=vocab, buffer_tokens=2)
+
+    assert store.vocab.tokens == vocab.tokens
+    # Flushed after every 2 events, so process a spans two sequences
+    assert store.keys == [("a", 1), ("b", 2), ("a", 1)]
+    assert [list(store[i]) for i in range(len(store))] == [[1, 0], [2], [3]]
+
+
+def test_windows_slice_every_sequence(tmp_path):
+    events = [("a", 1, s) for s in ["read", "write", "read", "write", "close"]] + [("b", 2, "read")]
+    _write_events(tmp_path / "e.jsonl", events)
+    store = build_store([str(tmp_path / "e.jsonl")], str(tmp_path / "store"))
+    ds = DeepLogWindows(store, window=3)
+
+    # Only process a is longer than the window: 5 - 3 windows
+    assert len(ds) == 2
+    x, y = ds[1]
+    np.testing.assert_array_equal(x.numpy(), store[0][1:4])
+    np.testing.assert_array_equal(y.numpy(), store[0][2:5])
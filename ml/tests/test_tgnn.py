@@ -0,0 +1,75 @@
+import pytest
+import torch
+from torch_geometric.data import Data
+from ml_pipeline.tgnn import TGNN, TemporalNeighborLoader, count_global_nodes, temporal_target
+
+
+def _windows(n_windows=3, n_total=60):
+    torch.manual_seed(0)
+    graphs = []
+    for t in range(n_windows):
+        n = 40 + 5 * t
+        global_id = torch.randperm(n_total)[:n]
+        graphs.append(Data(x=torch.randn(n, 3), edge_index=torch.randint(0, n, (2, 200)), global_id=global_id))
+    return graphs
+
+
+def test_full_fanout_minibatch_matches_full_graph():
+    graphs = _windows()
+    model = TGNN(in_channels=3).eval()
+    num_nodes = count_global_nodes(graphs)
+    loader = TemporalNeighborLoader(graphs, [-1, -1], batch_size=16)
+    with torch.no_grad():
+        full, _ = model(graphs)
+        full_target = temporal_target(graphs, num_nodes)
+        for subgraphs, seeds in loader:
+            recon, _ = model(subgraphs, num_nodes=len(seeds))
+            assert torch.allclose(recon, full[seeds], atol=1e-5)
+            assert torch.allclose(temporal_target(subgraphs, len(seeds)), full_target[seeds])
+
+
+def test_sampled_subgraphs_are_bounded_by_fanout():
+    graphs = _windows()
+    batch_size, fanout = 4, [2, 2]
+    loader = TemporalNeighborLoader(graphs, fanout, batch_size=batch_size, shuffle=True)
+    for subgraphs, seeds in loader:
+        assert len(seeds) <= batch_size
+        for sub in subgraphs:
+            assert sub.num_nodes <= batch_size * (1 + 2 + 2 * 2)
+            assert int((sub.global_id >= 0).sum()) <= len(seeds)
+
+
+def test_chunked_forward_with_carried_state_matches_full_sequence():
+    graphs = _windows(n_windows=5)
+    model = TGNN(in_channels=3).eval()
+    num_nodes = count_global_nodes(graphs)
+    with torch.no_grad():
+        full, _ = model(graphs)
+        state = None
+        for start in range(0, len(graphs), 2):
+            recon, _, state = model(graphs[start:start + 2], num_nodes=num_nodes, state=state, return_state=True)
+    assert torch.allclose(recon, full, atol=1e-5)
+
+
+def test_export_moves_artifacts_into_place_only_after_parity(tmp_path, monkeypatch):
+    from ml_pipeline import tgnn
+    from ml_pipeline.tgnn import export_tgnn, load_exported_tgnn
+
+    graphs = _windows()
+    model = TGNN(in_channels=3, hidden_channels=8, lstm_hidden=4)
+    (tmp_path / "ok").mkdir()
+    export_tgnn(model, graphs, str(tmp_path / "ok"))
+    assert sorted(p.name for p in (tmp_path / "ok").iterdir()) == ["tgnn_encoder.ts", "tgnn_head.ts"]
+    with torch.no_grad():
+        assert torch.allclose(load_exported_tgnn(str(tmp_path / "ok"))(graphs)[0], model(graphs)[0], atol=1e-5)
+
+    class Broken(tgnn.ExportedTGNN):
+        def __call__(self, graphs, num_nodes=None):
+            recon, emb = super().__call__(graphs, num_nodes)
+            return recon + 10, emb
+
+    monkeypatch.setattr(tgnn, "ExportedTGNN", Broken)
+    (tmp_path / "bad").mkdir()
+    with pytest.raises(AssertionError, match="parity"):
+        export_tgnn(model, graphs, str(tmp_path / "bad"))
+    assert list((tmp_path / "bad").iterdir()) == []
@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+import pytest
+
+from ml_pipeline.thresholds import QuantileSketch, ThresholdCalibrator
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    values = np.random.default_rng(0).lognormal(mean=-2, sigma=1.5, size=200_000)
+    sketch = QuantileSketch(accuracy=0.01, half_life=1e12)
+    for chunk in np.array_split(values, 100):
+        sketch.update(chunk)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.03)
+
+
+def test_sketch_follows_a_shift_in_recent_scores():
+    rng = np.random.default_rng(1)
+    sketch = QuantileSketch(half_life=1000)
+    sketch.update(rng.uniform(0, 1, 50_000))
+    sketch.update(rng.uniform(10, 11, 20_000))
+    assert 10 < sketch.quantile(0.5) < 11
+
+
+def test_thresholds_per_namespace_hit_target_rate_and_persist(tmp_path):
+    rng = np.random.default_rng(2)
+    path = str(tmp_path / "thresholds.json")
+    cal = ThresholdCalibrator(target_rate=0.01, min_count=1000, path=path)
+    noisy, quiet = rng.exponential(5.0, 50_000), rng.exponential(0.1, 50_000)
+    assert cal.threshold("v1", "noisy", default=0.5) == 0.5  # warming up
+    names = np.array(["noisy", "quiet"])
+    codes = np.repeat([0, 1], 50_000)
+    cal.observe("v1", names, np.concatenate([noisy, quiet]), codes)
+
+    thresholds = cal.thresholds("v1", names, 0.5, codes)
+    assert (noisy > thresholds[:50_000]).mean() == pytest.approx(0.01, abs=0.002)
+    assert (quiet > thresholds[50_000:]).mean() == pytest.approx(0.01, abs=0.002)
+    assert cal.threshold("v2", "noisy", default=0.5) == 0.5  # a new model calibrates from scratch
+
+    cal.save()
+    restored = ThresholdCalibrator(target_rate=0.01, path=path)
+    assert restored.threshold("v1", "quiet", 0.5) == pytest.approx(cal.threshold("v1", "quiet", 0.5))
+
+
+def test_scores_are_saved_in_the_background(tmp_path):
+    path = tmp_path / "thresholds.json"
+    cal = ThresholdCalibrator(target_rate=0.01, path=str(path), save_interval=0.05)
+    cal.observe("v1", "ns", np.ones(10))
+    assert not path.exists()  # not written by the scoring call
+    for _ in range(100):
+        if path.exists():
+            break
+        time.sleep(0.02)
+    assert ThresholdCalibrator(target_rate=0.01, path=str(path))._sketches[("v1", "ns")].n == 10
+    assert [p.name for p in tmp_path.iterdir()] == ["thresholds.json"]  # no temporary file left behind
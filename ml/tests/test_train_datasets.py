@@ -0,0 +1,39 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+_spec = importlib.util.spec_from_file_location("train_datasets", Path(__file__).parents[1] / "train_datasets.py")
+train_datasets = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(train_datasets)
+
+
+def test_trains_on_every_file_with_reconciled_columns(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    rng = np.random.default_rng(0)
+    pd.DataFrame({"a": rng.normal(size=50), "b": rng.normal(size=50), "name": "x"}).to_csv(data / "one.csv", index=False)
+    pd.DataFrame({"b": rng.normal(size=30), "c": rng.integers(0, 5, 30)}).to_parquet(data / "two.parquet")
+    (data / "broken.jsonl").write_text("{not json\n")
+
+    X, columns, spans = train_datasets.build_feature_matrix(
+        train_datasets.discover_files(str(data)), str(tmp_path / "features"), chunk_rows=7)
+    assert isinstance(X, np.memmap) and X.shape == (80, 3)
+    assert columns == ["a", "b", "c"]
+    assert [(Path(p).name, s, e) for p, s, e in spans] == [("one.csv", 0, 50), ("two.parquet", 50, 80)]
+    # Columns a file lacks are missing (scored as 0)
+    assert np.isnan(X[50:, 0]).all() and np.isnan(X[:50, 2]).all()
+    np.testing.assert_allclose(X[50:, 1], pd.read_parquet(data / "two.parquet")["b"], rtol=1e-6)
+
+    out = tmp_path / "out"
+    report = train_datasets.train_isolation(X, columns, spans, str(out), name="t", n_jobs=2, fit_rows=40,
+                                            chunk_rows=16, data_dir=str(data))
+    assert report["n_fit_samples"] == 40
+    bundle = joblib.load(report["model_path"])
+    assert bundle["columns"] == columns and bundle["version"] == report["model_version"]
+    scores = pd.concat([pd.read_parquet(p) for p in report["score_files"]])
+    np.testing.assert_allclose(scores["score"], -bundle["model"].decision_function(np.nan_to_num(X).astype(np.float32)))
+    assert json.loads((out / "t_report.json").read_text())["n_samples"] == 80
@@ -0,0 +1,67 @@
+import json
+
+import optuna
+
+from ml_pipeline.tune import run_study
+
+
+def test_study_writes_best_params_and_resumes(tmp_path):
+    study = run_study("ae", str(tmp_path), trials=3, jobs=1, epochs=2)
+    assert len(study.trials) == 3
+    assert len(list((tmp_path / "cache").glob("ae-*/ae_train.npy"))) == 1
+    best = json.loads((tmp_path / "ae_best_params.json").read_text())
+    assert set(best["params"]) == {"lr", "hidden1", "hidden2", "batch_size"}
+
+    study = run_study("ae", str(tmp_path), trials=2, jobs=1, epochs=2, prune=False)
+    assert len(study.trials) == 5
+    assert all(t.state == optuna.trial.TrialState.COMPLETE for t in study.trials[3:])
+
+
+def test_best_params_feed_training(tmp_path):
+    from ml_pipeline.train import model_params, train_autoencoder
+    from ml_pipeline.export import load_weights
+
+    run_study("ae", str(tmp_path), trials=2, jobs=1, epochs=1)
+    path = str(tmp_path / "ae_best_params.json")
+    best = json.loads((tmp_path / "ae_best_params.json").read_text())["params"]
+    params = model_params("ae", path, hidden_dims=None, hidden_dim=48)  # not an autoencoder setting
+    assert params == {"lr": best["lr"], "hidden_dims": [best["hidden1"], min(best["hidden1"], best["hidden2"])],
+                      "batch_size": best["batch_size"]}
+    assert model_params("ae", path, lr=0.5)["lr"] == 0.5
+
+    train_autoencoder(str(tmp_path / "model"), epochs=1, **params)
+    model, _ = load_weights("ae", str(tmp_path / "model" / "autoencoder.pt"))
+    assert model.net[0].out_features == params["hidden_dims"][0]
+
+
+def test_dataset_cache_is_keyed_on_the_data_and_samples_every_window(tmp_path):
+    import os
+
+    import numpy as np
+    import pandas as pd
+
+    from ml_pipeline.tune import prepare_dataset
+
+    data_dir = tmp_path / "graphs"
+    data_dir.mkdir()
+
+    def write_window(t):
+        pd.DataFrame({"node_id": [f"pod-{i}" for i in range(50)], "bytes": float(t),
+                      "outgoing_unique_dst_count": 1.0, "flow_count": 1.0}).to_parquet(
+            data_dir / f"window_{t}.nodes.parquet")
+
+    for t in range(4):
+        write_window(t)
+    cache = str(tmp_path / "cache")
+    paths = prepare_dataset("ae", cache, str(data_dir), max_rows=40)
+    assert prepare_dataset("ae", cache, str(data_dir), max_rows=40) == paths
+    X = np.concatenate([np.load(paths["train"]), np.load(paths["val"])])
+    assert len(X) == 40
+    assert len(np.unique(X[:, 0])) > 1  # not just the rows of the first window
+
+    assert prepare_dataset("lstm", cache, str(data_dir), seq_len=2)["train"] != \
+        prepare_dataset("lstm", cache, str(data_dir), seq_len=3)["train"]
+    assert prepare_dataset("ae", cache)["train"] != paths["train"]  # synthetic data is cached separately
+    write_window(4)
+    assert prepare_dataset("ae", cache, str(data_dir), max_rows=40)["train"] != paths["train"]
+    assert len(os.listdir(cache)) == 5
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+from ml_pipeline import shm_ring
+from ml_pipeline.window_scorer import WindowScorer
+
+
+def _write_window(path, flows):
+    pd.DataFrame({
+        "node_id": [f"svc-{i}" for i in range(len(flows))],
+        "pod_name": [f"svc-{i}" for i in range(len(flows))],
+        "namespace": "dev",
+        "bytes": [100 * f for f in flows],
+        "outgoing_unique_dst_count": [1] * len(flows),
+        "flow_count": flows,
+    }).to_parquet(path, index=False)
+
+
+def test_score_window_writes_scores_and_alerts(tmp_path):
+    nodes = tmp_path / "window_100.nodes.parquet"
+    _write_window(nodes, [1, 2, 50000])
+    scorer = WindowScorer(str(tmp_path), threshold=5.0)
+    assert scorer.pending_windows() == [nodes]
+
+    scorer.score_window(nodes)
+
+    scores = pd.read_parquet(tmp_path / "window_100.scores.parquet")
+    assert list(scores["node_id"]) == ["svc-0", "svc-1", "svc-2"]
+    alerts = json.loads((tmp_path / "window_100.alert.json").read_text())["alerts"]
+    assert [a["node_id"] for a in alerts] == ["svc-2"]
+    assert scorer.pending_windows() == []
+    assert not list(tmp_path.glob("*.tmp"))  # outputs are renamed into place
+
+
+def _ipc(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as w:
+        w.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _ring(path, windows, num_slots=4, slot_size=256 * 1024):
+    """Ring file in the graph_builder.shm_ring layout holding ``windows`` [(window_start, nodes_df)]."""
+    buf = bytearray(shm_ring.HEADER_SIZE + num_slots * slot_size)
+    edges = _ipc(pd.DataFrame({"src": ["svc-0"], "dst": ["10.0.0.1"]}))
+    for seq, (window_start, nodes_df) in enumerate(windows, start=1):
+        nodes = _ipc(nodes_df)
+        base = shm_ring.HEADER_SIZE + (seq % num_slots) * slot_size
+        shm_ring.SLOT_HEADER.pack_into(buf, base, seq, len(nodes), len(edges), window_start, time.time())
+        start = base + shm_ring.SLOT_HEADER_SIZE
+        buf[start:start + len(nodes) + len(edges)] = nodes + edges
+    shm_ring.HEADER.pack_into(buf, 0, shm_ring.MAGIC, shm_ring.VERSION, num_slots, slot_size, len(windows))
+    path.write_bytes(bytes(buf))
+
+
+def test_ring_windows_are_scored(tmp_path):
+    nodes = pd.DataFrame({
+        "node_id": ["svc-0", "svc-1"], "pod_name": ["svc-0", "svc-1"], "namespace": "dev",
+        "bytes": [100, 10 ** 9], "outgoing_unique_dst_count": [1, 1], "flow_count": [1, 50000],
+    })
+    _ring(tmp_path / "ring", [(100, nodes), (130, nodes)])
+    scorer = WindowScorer(str(tmp_path), threshold=5.0)
+
+    scorer.run_ring(str(tmp_path / "ring"), max_windows=2)
+
+    for ts in (100, 130):
+        alerts = json.loads((tmp_path / f"window_{ts}.alert.json").read_text())["alerts"]
+        assert [a["node_id"] for a in alerts] == ["svc-1"]
+    assert scorer._ring.missed == 0
+
+
+def test_failed_window_is_retried_with_backoff_then_given_up(tmp_path, monkeypatch):
+    nodes = tmp_path / "window_100.nodes.parquet"
+    nodes.write_text("not parquet yet")
+    scorer = WindowScorer(str(tmp_path), poll_interval=0.01, max_attempts=3)
+    attempts = []
+    score_window = scorer.score_window
+    monkeypatch.setattr(scorer, "score_window", lambda path: attempts.append(path) or score_window(path))
+
+    def scans(n):
+        for _ in range(n):
+            time.sleep(0.002)
+            yield [nodes]
+
+    monkeypatch.setattr(scorer, "_new_windows", lambda: scans(200))
+    scorer.run()
+    assert len(attempts) == 3  # backoff between attempts, then given up
+    assert not (tmp_path / "window_100.scores.parquet").exists()
+
+    _write_window(nodes, [1, 2])  # a rewritten file is retried
+    os.utime(nodes, ns=(1, 1))
+    monkeypatch.setattr(scorer, "_new_windows", lambda: scans(1))
+    scorer.run()
+    assert len(attempts) == 4 and (tmp_path / "window_100.scores.parquet").exists()
+
+
+def test_inotify_mode_rescans_for_missed_windows(tmp_path, monkeypatch):
+    from ml_pipeline import window_scorer
+
+    class LossyWatch:
+        """Delivers no events, as after an event queue overflow."""
+
+        def __init__(self, path):
+            self.reads = 0
+
+        def read(self, timeout):
+            self.reads += 1
+            return [], self.reads == 2
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(window_scorer, "_Inotify", LossyWatch)
+    scorer = WindowScorer(str(tmp_path), settle_seconds=0, rescan_every=1000)
+    windows = scorer._new_windows()
+    assert next(windows) == []  # catch-up scan
+    _write_window(tmp_path / "window_100.nodes.parquet", [1])
+    assert next(windows) == []  # the event was lost
+    assert next(windows) == []
+    assert next(windows) == [tmp_path / "window_100.nodes.parquet"]  # rescanned after the overflow
@@ -2,10 +2,18 @@
 """Lightweight dataset loader and IsolationForest baseline.
 
 Usage:
-  python ml/train_datasets.py --data-dir ./graphs --out-dir ./ml_artifacts --model isolation
-
-The script looks for CSV/Parquet/JSONL files under `--data-dir`, extracts numeric columns,
-fits an IsolationForest, and writes a simple report and model file.
+  python ml/train_datasets.py --data-dir ./graphs --out-dir ./ml_artifacts --model isolation [--n-jobs 8]
+
+The script looks for CSV/Parquet/JSONL files under `--data-dir` and streams every one of them in chunks
+of `--chunk-rows` rows. Numeric columns are reconciled across files (the union of all columns, 0 where a
+file lacks one) into a memory-mapped matrix in the `ml_pipeline.feature_store` cache (`--cache-dir`,
+default `<out-dir>/<name>_features`), so no file is ever fully loaded into pandas, and later runs over
+unchanged files skip parsing altogether. An IsolationForest is fitted on up to `--fit-rows` sampled rows with `--n-jobs`
+workers, then every row is scored in parallel chunks. Outputs in `--out-dir`:
+
+- `<name>_isoforest-<version>.joblib`: {"model", "columns", "version"}; version is a hash of model and columns
+- `<name>_report.json`: data/model summary, pointing at the latest version
+- `scores/<file>.scores.parquet`: per-file `row`, `score` (higher = more anomalous) and `anomaly`
 """
 import argparse
 import os
@@ -32,47 +40,139 @@ def load_table(path):
         return pd.read_json(path, lines=True)
     raise RuntimeError(f"Unsupported file: {path}")
 
-def train_isolation(df, out_dir, name="baseline"):
+def build_feature_matrix(files, cache_dir, chunk_rows=100_000):
+    """Numeric features of ``files`` from the feature store in ``cache_dir`` (built on first use).
+
+    Returns ``(X, columns, spans)`` where ``X`` is a memory-mapped float64
+    matrix (NaN where a file lacks a column) and ``spans`` lists
+    ``(file, first_row, end_row)`` for every file used. Unreadable files are skipped.
+    """
+    from ml_pipeline.feature_store import open_table
+
+    table = open_table(files, cache_dir, chunk_rows, strings=False)
+    for path, start, end in table.spans:
+        print(f"Loaded {path}: {end - start} rows")
+    return table.numeric, table.numeric_columns, table.spans
+
+def _finite32(X):
+    """float32 copy with missing and non-finite values set to 0."""
+    import numpy as np
+
+    X = np.array(X, dtype=np.float32)
+    X[~np.isfinite(X)] = 0.0
+    return X
+
+def _score_chunk(clf, X, scores, start, end):
+    scores[start:end] = -clf.decision_function(_finite32(X[start:end]))  # higher = more anomalous
+
+def score_matrix(clf, X, n_jobs=-1, chunk_rows=100_000):
+    """Scores of every row of ``X``, computed in parallel chunks (threads share ``X`` and ``clf``)."""
+    import numpy as np
+    from joblib import Parallel, delayed
+
+    scores = np.empty(len(X), dtype=np.float64)
+    # Tree traversal releases the GIL; each thread scores its chunks with a single-threaded forest
+    params = clf.get_params()
+    clf.set_params(n_jobs=1)
+    try:
+        Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_score_chunk)(clf, X, scores, start, min(start + chunk_rows, len(X)))
+            for start in range(0, len(X), chunk_rows)
+        )
+    finally:
+        clf.set_params(n_jobs=params["n_jobs"])
+    return scores
+
+def _score_name(path, data_dir):
+    try:
+        rel = os.path.relpath(path, data_dir) if data_dir else os.path.basename(path)
+    except ValueError:
+        rel = os.path.basename(path)
+    if rel.startswith(".."):
+        rel = os.path.basename(path)
+    return rel.replace(os.sep, "__") + ".scores.parquet"
+
+def train_isolation(X, columns, spans, out_dir, name="baseline", n_jobs=-1, fit_rows=1_000_000,
+                    max_samples="auto", n_estimators=100, contamination=0.01, seed=42, chunk_rows=100_000,
+                    data_dir=None):
     from sklearn.ensemble import IsolationForest
     import joblib
     import numpy as np
+    import pandas as pd
 
-    numeric = df.select_dtypes(include=["number"]).fillna(0)
-    if numeric.shape[1] == 0 or numeric.shape[0] < 10:
+    if X.shape[1] == 0 or X.shape[0] < 10:
         raise RuntimeError("Not enough numeric data to train baseline")
 
-    clf = IsolationForest(n_estimators=100, contamination=0.01, random_state=42)
-    clf.fit(numeric.values)
-    scores = -clf.decision_function(numeric.values)  # higher = more anomalous
+    rng = np.random.default_rng(seed)
+    if X.shape[0] > fit_rows:
+        # Sorted so the sample is read from the memory map front to back
+        sample = _finite32(X[np.sort(rng.choice(X.shape[0], fit_rows, replace=False))])
+    else:
+        sample = _finite32(X)
+    clf = IsolationForest(n_estimators=n_estimators, max_samples=max_samples, contamination=contamination,
+                          n_jobs=n_jobs, random_state=seed)
+    clf.fit(sample)
+    print(f"Fitted IsolationForest on {len(sample)} of {X.shape[0]} rows x {X.shape[1]} features")
+    scores = score_matrix(clf, X, n_jobs, chunk_rows)
 
     os.makedirs(out_dir, exist_ok=True)
-    model_path = os.path.join(out_dir, f"{name}_isoforest.joblib")
-    joblib.dump(clf, model_path)
+    version = joblib.hash({"model": clf, "columns": columns})[:12]
+    model_path = os.path.join(out_dir, f"{name}_isoforest-{version}.joblib")
+    tmp_path = model_path + ".tmp"
+    joblib.dump({"model": clf, "columns": columns, "version": version}, tmp_path)
+    os.replace(tmp_path, model_path)
+
+    score_dir = os.path.join(out_dir, "scores")
+    os.makedirs(score_dir, exist_ok=True)
+    score_files = []
+    for path, start, end in spans:
+        s = scores[start:end]
+        score_path = os.path.join(score_dir, _score_name(path, data_dir))
+        pd.DataFrame({"row": np.arange(end - start), "score": s, "anomaly": s > 0}).to_parquet(score_path, index=False)
+        score_files.append(score_path)
 
     report = {
-        "n_samples": int(numeric.shape[0]),
-        "n_features": int(numeric.shape[1]),
+        "n_samples": int(X.shape[0]),
+        "n_features": int(X.shape[1]),
+        "n_fit_samples": int(len(sample)),
+        "features": columns,
+        "files": [{"path": p, "rows": e - s} for p, s, e in spans],
         "model": "IsolationForest",
+        "model_version": version,
         "model_path": model_path,
+        "score_files": score_files,
+        "n_anomalies": int((scores > 0).sum()),
         "scores_sample": scores[:10].tolist(),
     }
     with open(os.path.join(out_dir, f"{name}_report.json"), "w") as f:
         json.dump(report, f, indent=2)
 
     print(f"Trained IsolationForest saved to {model_path}")
+    print(f"Scores for {len(score_files)} files saved to {score_dir}")
     print(f"Report saved to {os.path.join(out_dir, name + '_report.json')}")
+    return report
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--data-dir", default="./data", help="Directory with datasets or graph files")
     p.add_argument("--out-dir", default="./ml_artifacts", help="Output directory for models/reports")
     p.add_argument("--model", choices=["isolation"], default="isolation")
-    p.add_argument("--file", default=None, help="Optional single file to train on")
+    p.add_argument("--file", action="append", default=None, help="Train on this file instead (repeatable)")
+    p.add_argument("--name", default=None, help="Artifact name prefix (default: the data dir or file name)")
+    p.add_argument("--cache-dir", default=None,
+                   help="Feature store directory (default: <out-dir>/<name>_features); rebuilt when sources change")
+    p.add_argument("--chunk-rows", type=int, default=100_000, help="Rows parsed and scored per chunk")
+    p.add_argument("--n-jobs", type=int, default=-1, help="Parallel workers for fitting and scoring (-1: all cores)")
+    p.add_argument("--fit-rows", type=int, default=1_000_000, help="Rows sampled to fit the forest")
+    p.add_argument("--max-samples", default="auto", help="Rows per tree (IsolationForest max_samples)")
+    p.add_argument("--n-estimators", type=int, default=100)
+    p.add_argument("--contamination", type=float, default=0.01)
+    p.add_argument("--seed", type=int, default=42)
     args = p.parse_args()
 
     files = []
     if args.file:
-        files = [args.file]
+        files = args.file
     else:
         files = discover_files(args.data_dir)
 
@@ -80,23 +180,24 @@ def main():
         print("No dataset files found. Use --file or put CSV/Parquet/JSONL under --data-dir")
         return
 
-    # pick the first reasonable file
-    for f in files:
-        try:
-            print(f"Loading {f}...")
-            df = load_table(f)
-            print(f"Loaded {len(df)} rows, {len(df.columns)} columns")
-            break
-        except Exception as e:
-            print(f"Skipping {f}: {e}")
-            df = None
-    if df is None:
+    name = args.name or (Path(files[0]).stem if args.file else Path(os.path.abspath(args.data_dir)).name)
+    os.makedirs(args.out_dir, exist_ok=True)
+    X, columns, spans = build_feature_matrix(files, args.cache_dir or os.path.join(args.out_dir, f"{name}_features"),
+                                             args.chunk_rows)
+    if not spans:
         print("No usable files found.")
         return
+    print(f"Feature matrix: {X.shape[0]} rows x {X.shape[1]} columns from {len(spans)} files")
 
+    max_samples = args.max_samples
+    if max_samples != "auto":
+        max_samples = float(max_samples) if "." in max_samples else int(max_samples)
     if args.model == "isolation":
         try:
-            train_isolation(df, args.out_dir, name=Path(f).stem)
+            train_isolation(X, columns, spans, args.out_dir, name=name, n_jobs=args.n_jobs,
+                            fit_rows=args.fit_rows, max_samples=max_samples, n_estimators=args.n_estimators,
+                            contamination=args.contamination, seed=args.seed, chunk_rows=args.chunk_rows,
+                            data_dir=None if args.file else args.data_dir)
         except Exception as e:
             print(f"Training failed: {e}")
 
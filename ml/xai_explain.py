@@ -5,16 +5,24 @@ This script is intentionally simple and dependency-light: it uses pandas/numpy
 to compute per-node feature deviations from a baseline mean and reports a
 proportional contribution per numeric feature. It's a demonstrative XAI step
 for the PoC (not a production SHAP implementation).
+
+The parquet is read through ``ml_pipeline.feature_store``: the first run caches
+it as memory-mapped columns (``<dir>/.feature_store/<file>``), later runs on the
+unchanged file skip parsing.
 """
 import argparse
 import json
 import os
-import pandas as pd
 import numpy as np
 
+from ml_pipeline.feature_store import default_cache_dir, open_table
+
 
-def explain_nodes(nodes_parquet_path, out_path=None, top_k=5):
-    df = pd.read_parquet(nodes_parquet_path)
+def explain_nodes(nodes_parquet_path, out_path=None, top_k=5, cache_dir=None):
+    table = open_table([nodes_parquet_path], cache_dir or default_cache_dir(nodes_parquet_path))
+    if not table.sources:
+        raise RuntimeError(f"Could not read {nodes_parquet_path}")
+    df = table.frame(0)
     # Select numeric columns only
     num_cols = df.select_dtypes(include=[np.number]).columns.tolist()
     if not num_cols:
@@ -79,8 +87,9 @@ def main():
     p.add_argument("nodes", help="Path to nodes parquet file")
     p.add_argument("--out", help="Output JSON path (optional)")
     p.add_argument("--top-k", type=int, default=5)
+    p.add_argument("--cache-dir", default=None, help="Feature store directory (default: <dir>/.feature_store/<file>)")
     args = p.parse_args()
-    explain_nodes(args.nodes, args.out, args.top_k)
+    explain_nodes(args.nodes, args.out, args.top_k, args.cache_dir)
 
 
 if __name__ == '__main__':